@@ -0,0 +1,229 @@
+"""
+Serving Mode Concurrency Benchmark
+Compares the sync gunicorn workers with the ASGI mode (web_asgi.py under
+uvicorn) under 50-200 concurrent clients.
+
+Both servers are started on a free local port with the same number of worker
+processes and the same database. Every client is a thread with its own
+keep-alive connection that requests the dashboard endpoints (the rankings
+variants of benchmark_queries.BENCHMARK_REQUESTS plus /api/stats) in a loop
+for a fixed time. Throughput, latency percentiles and errors are reported per
+mode and concurrency level.
+
+The response cache is disabled by default so every request reaches the
+database; pass --cache to measure with it.
+
+Uses the same database as benchmark_queries.py (seed it there first).
+
+Usage:
+    python benchmark_concurrency.py
+    python benchmark_concurrency.py --workers 4 --clients 50 100 200 --duration 20
+    python benchmark_concurrency.py --backend mariadb --modes asgi
+
+Reports are written to data/reports/concurrency_benchmark_<timestamp>.txt and .json.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import config
+from benchmark_queries import BASE_DIR, BENCHMARK_DIR, BENCHMARK_REQUESTS
+from query_stats import percentile
+
+# Requests the clients cycle through
+LOAD_PATHS = [path for route, path in BENCHMARK_REQUESTS if route == '/api/rankings'] + ['/api/stats']
+
+
+def server_command(mode: str, port: int, workers: int) -> List[str]:
+    """Command line that starts the web API in a serving mode"""
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                '--timeout', '120', '--backlog', '2048', 'web_api:app']
+    return [sys.executable, '-m', 'uvicorn', 'web_asgi:application', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', str(workers), '--backlog', '2048',
+            '--no-access-log', '--log-level', 'warning']
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port: int, process: subprocess.Popen, timeout: float = 60) -> bool:
+    """Poll /api/health until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run_client(port: int, offset: int, stop_at: float, latencies: List[float], errors: List[str]):
+    """Request LOAD_PATHS in a loop over one keep-alive connection until stop_at"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    index = offset
+    while time.monotonic() < stop_at:
+        path = LOAD_PATHS[index % len(LOAD_PATHS)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers={'Accept-Encoding': 'identity'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(f"{path}: HTTP {response.status}")
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(f"{path}: {e!r}")
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    connection.close()
+
+
+def run_load(port: int, clients: int, duration: float) -> Dict:
+    """Drive the server with concurrent clients for duration seconds"""
+    latencies: List[float] = []
+    errors: List[str] = []
+    stop_at = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=run_client, args=(port, i, stop_at, latencies, errors), daemon=True)
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'throughput': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 1) if latencies else None,
+        'max_ms': round(max(latencies), 1) if latencies else None,
+    }
+
+
+def benchmark_mode(mode: str, args, env: Dict[str, str]) -> List[Dict]:
+    """Start one serving mode and run every concurrency level against it"""
+    port = free_port()
+    process = subprocess.Popen(server_command(mode, port, args.workers), cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(port, process):
+            print(f"  {mode}: server did not start")
+            return []
+        # Warm up: fill the destination catalog, mappings and per-thread connections
+        run_load(port, min(args.clients), 2)
+
+        results = []
+        for clients in args.clients:
+            result = {'mode': mode, 'workers': args.workers, **run_load(port, clients, args.duration)}
+            results.append(result)
+            print(f"  {mode:<5} {clients:>4} clients: {result['throughput']:>7} req/s, "
+                  f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, {result['errors']} errors")
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def format_report(results: List[Dict], args) -> str:
+    """Text table of the results"""
+    def value(number, fmt, width):
+        return (format(number, fmt) if number is not None else '-').rjust(width)
+
+    lines = [
+        f"CONCURRENCY BENCHMARK - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Backend: {args.backend}; {args.workers} worker processes; {args.duration:.0f}s per level; "
+        f"response cache {'enabled' if args.cache else 'disabled'}; "
+        f"ASGI threads: {config.ASYNC_SETTINGS['request_threads']} request / "
+        f"{config.ASYNC_SETTINGS['query_threads']} query",
+        "=" * 88,
+        f"{'Mode':<6} {'Clients':>8} {'Requests':>9} {'Errors':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}",
+        "-" * 88,
+    ]
+    for r in results:
+        lines.append(
+            f"{r['mode']:<6} {r['clients']:>8} {r['requests']:>9} {r['errors']:>7} {r['throughput']:>8.1f} "
+            f"{value(r['p50_ms'], '.1f', 8)} {value(r['p95_ms'], '.1f', 8)} "
+            f"{value(r['p99_ms'], '.1f', 8)} {value(r['max_ms'], '.1f', 8)}"
+        )
+    lines.append("-" * 88)
+    lines.append("Latencies in ms, measured by the clients (including queueing).")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Sync vs ASGI serving mode benchmark for the web API')
+    parser.add_argument('--backend', choices=['sqlite', 'mariadb'], default='sqlite',
+                        help='Database the servers read from (default: benchmark SQLite file)')
+    parser.add_argument('--db', default=os.path.join(BENCHMARK_DIR, 'benchmark.db'),
+                        help='SQLite benchmark database file (seed with benchmark_queries.py)')
+    parser.add_argument('--modes', nargs='+', choices=['sync', 'asgi'], default=['sync', 'asgi'],
+                        help='Serving modes to compare')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes per server')
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 100, 200],
+                        help='Concurrency levels')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per concurrency level')
+    parser.add_argument('--cache', action='store_true', help='Keep the response cache enabled')
+    args = parser.parse_args()
+
+    env = dict(os.environ, STORAGE_BACKEND=args.backend, FLASK_DEBUG='False',
+               RESPONSE_CACHE_ENABLED='true' if args.cache else 'false')
+    if args.backend == 'sqlite':
+        if not os.path.exists(args.db):
+            print(f"Benchmark database not found: {args.db} (run benchmark_queries.py first)")
+            return 2
+        env['SQLITE_PATH'] = os.path.abspath(args.db)
+
+    results = []
+    for mode in args.modes:
+        print(f"Benchmarking {mode} mode...")
+        results.extend(benchmark_mode(mode, args, env))
+
+    report = format_report(results, args)
+    print()
+    print(report)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    text_path = os.path.join(config.REPORTS_DIR, f"concurrency_benchmark_{timestamp}.txt")
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(report + "\n")
+    with open(text_path[:-4] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved benchmark report to {text_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,408 @@
+"""
+Query Plan Regression Benchmark
+Seeds a local database with a synthetic year of flights, calls every web API
+endpoint with representative parameters and checks each SQL statement they run.
+
+For every statement the EXPLAIN access path and the latency percentiles are
+recorded. The run fails (exit code 1) when
+    - a statement does a full table scan of a table that is not allowed to be
+      scanned (see benchmark_budgets.json),
+    - an endpoint or statement p95 exceeds its latency budget, or
+    - an /api endpoint exists that the benchmark does not cover.
+
+Usage:
+    python benchmark_queries.py                       # SQLite file in data/benchmark/
+    python benchmark_queries.py --reseed --days 365 --flights-per-day 1300
+    python benchmark_queries.py --backend mariadb     # configured MariaDB (seed with --reseed on an empty scratch DB only)
+
+Reports are written to data/reports/query_benchmark_<timestamp>.txt and .json.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+import query_stats
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(config.DATA_DIR, 'benchmark')
+DEFAULT_BUDGETS = os.path.join(BASE_DIR, 'benchmark_budgets.json')
+
+# Endpoints with representative parameters; every /api route must be listed
+BENCHMARK_REQUESTS = [
+    ('/api/rankings', '/api/rankings'),
+    ('/api/rankings', '/api/rankings?flight_type=departures&days=7'),
+    ('/api/rankings', '/api/rankings?days=90&min_flights=50'),
+    ('/api/rankings', '/api/rankings?destination=LHR'),
+    ('/api/rankings', '/api/rankings?country=Spain&flight_type=departures'),
+    ('/api/rankings', '/api/rankings?continent=Europe'),
+    ('/api/stats', '/api/stats'),
+    ('/api/stats', '/api/stats?days=365'),
+    ('/api/airlines/<airline_code>/flights', '/api/airlines/KL/flights'),
+    ('/api/airlines/<airline_code>/flights', '/api/airlines/KL/flights?days=7&flight_type=departures&limit=500'),
+    ('/api/airlines/<airline_code>/flights', '/api/airlines/HV/flights?days=30&country=Spain'),
+    ('/api/stats/destinations', '/api/stats/destinations'),
+    ('/api/stats/destinations', '/api/stats/destinations?period=month&limit=25'),
+    ('/api/stats/aircraft', '/api/stats/aircraft'),
+    ('/api/stats/aircraft', '/api/stats/aircraft?period=month'),
+    ('/api/stats/aircraft/<aircraft_code>/airlines', '/api/stats/aircraft/73H/airlines'),
+    ('/api/destinations', '/api/destinations'),
+    ('/api/airports', '/api/airports'),
+    ('/api/logs/collection', '/api/logs/collection?limit=50'),
+    ('/api/health', '/api/health'),
+]
+
+# Routes that are not part of the public dashboard API, that stream without queries,
+# or that only combine other routes
+EXCLUDED_ROUTES = ('/api/internal/', '/api/events', '/api/batch', '/api/export/')
+
+_TABLE_REFERENCES = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SQL_KEYWORDS = {
+    'where', 'left', 'right', 'inner', 'outer', 'join', 'on', 'group', 'order', 'limit',
+    'having', 'union', 'as', 'cross', 'natural', 'using', 'partition', 'set'
+}
+
+
+def table_aliases(query: str) -> Dict[str, str]:
+    """Map table names and aliases used in a query to table names"""
+    aliases = {}
+    for table, alias in _TABLE_REFERENCES.findall(query):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def access_paths(plan: List[Dict], query: str, dialect: str) -> List[Tuple[str, str, bool]]:
+    """
+    Summarize an EXPLAIN plan
+
+    Args:
+        plan: EXPLAIN rows (MariaDB) or EXPLAIN QUERY PLAN rows (SQLite)
+        query: The explained statement (to resolve aliases)
+        dialect: 'mariadb' or 'sqlite'
+
+    Returns:
+        List of (table, access description, is_full_scan), where a full scan
+        reads every row of the table or of one of its indexes
+    """
+    aliases = table_aliases(query)
+    paths = []
+    for step in plan or []:
+        if 'error' in step:
+            paths.append(('?', f"explain failed: {step['error']}", False))
+        elif dialect == 'sqlite':
+            detail = str(step.get('detail', ''))
+            match = re.match(r"(SCAN|SEARCH) (\w+)(.*)", detail)
+            if not match or match.group(2).lower() not in aliases:
+                continue
+            table = aliases[match.group(2).lower()]
+            # SCAN reads the whole table or index (the SQLite 'ALL'/'index' access types)
+            paths.append((table, detail, match.group(1) == 'SCAN'))
+        else:
+            alias = str(step.get('table') or '')
+            table = aliases.get(alias.lower(), alias)
+            access = f"type={step.get('type')} key={step.get('key')} rows={step.get('rows')}"
+            paths.append((table, access, step.get('type') in ('ALL', 'index')))
+    return paths
+
+
+def seed_database(db, days: int, flights_per_day: int, seed: int = 42):
+    """
+    Fill the database with a synthetic period of flights ending a few days
+    from today, plus reference data and collection log entries
+
+    Airlines, destinations and aircraft types follow long-tailed
+    distributions like the real Schiphol traffic (KLM-heavy, a few hundred
+    destinations, some multi-stop routes).
+    """
+    rng = np.random.default_rng(seed)
+
+    with open(os.path.join(BASE_DIR, 'airline_mapping.json'), 'r', encoding='utf-8') as f:
+        airline_codes = sorted(code for code in json.load(f) if len(code) == 2)
+    with open(os.path.join(BASE_DIR, 'aircraft_types.json'), 'r', encoding='utf-8') as f:
+        aircraft_items = json.load(f)
+    destinations_path = os.path.join(BASE_DIR, 'destinations_full.json')
+    if not os.path.exists(destinations_path):
+        destinations_path += '.bak'
+    with open(destinations_path, 'r', encoding='utf-8') as f:
+        destination_items = json.load(f)
+
+    db.create_tables()
+    db.create_reference_tables()
+    db.load_reference_data(destination_items, aircraft_items)
+
+    # Long-tailed choices: KL and HV first, then a Zipf-like tail
+    preferred = [code for code in ('KL', 'HV', 'U2', 'BA', 'LH', 'AF', 'DL', 'TK') if code in airline_codes]
+    airlines = preferred + [code for code in rng.permutation(airline_codes) if code not in preferred][:150 - len(preferred)]
+    airline_weights = 1.0 / np.arange(1, len(airlines) + 1) ** 1.1
+    airline_weights /= airline_weights.sum()
+
+    preferred_destinations = ['LHR', 'BCN', 'CDG', 'JFK', 'MAD', 'DXB']
+    destination_codes = preferred_destinations + [
+        code for code in rng.permutation([item['code'] for item in destination_items])
+        if code not in preferred_destinations
+    ][:300 - len(preferred_destinations)]
+    destination_weights = 1.0 / np.arange(1, len(destination_codes) + 1) ** 0.9
+    destination_weights /= destination_weights.sum()
+
+    aircraft_codes = [item['iataSub'] for item in aircraft_items if item.get('iataSub')][:40]
+    aircraft_weights = 1.0 / np.arange(1, len(aircraft_codes) + 1)
+    aircraft_weights /= aircraft_weights.sum()
+
+    today = date.today()
+    first_day = today - timedelta(days=days - 1)
+    flight_id = 100000000000000000
+    threshold = config.RELIABILITY_SETTINGS['on_time_threshold_minutes']
+
+    for offset in range(days + 3):
+        day = first_day + timedelta(days=offset)
+        n = int(rng.poisson(flights_per_day))
+        airline = rng.choice(airlines, n, p=airline_weights)
+        direction = rng.choice(['A', 'D'], n)
+        stops = rng.choice(destination_codes, (n, 2), p=destination_weights)
+        multi_stop = rng.random(n) < 0.08
+        minutes = rng.integers(6 * 60, 23 * 60, n)
+        delay = np.where(rng.random(n) < 0.7, rng.normal(2, 5, n), rng.exponential(25, n)).round(0)
+        completed = (day < today) & (rng.random(n) > 0.01)
+
+        scheduled = [datetime.combine(day, datetime.min.time()) + timedelta(minutes=int(m)) for m in minutes]
+        rows = {
+            'flight_id': np.arange(flight_id, flight_id + n),
+            'flight_number': [f"{code}{number}" for code, number in zip(airline, rng.integers(100, 9999, n))],
+            'airline_code': airline,
+            'flight_direction': direction,
+            'schedule_date': day.isoformat(),
+            'schedule_time': [s.strftime('%H:%M:%S') for s in scheduled],
+            'actual_time': [
+                (s + timedelta(minutes=float(d))).isoformat() if done else None
+                for s, d, done in zip(scheduled, delay, completed)
+            ],
+            'estimated_time': None,
+            'delay_minutes': np.where(completed, delay, np.nan),
+            'on_time': np.where(completed, delay <= threshold, None),
+            'flight_status': np.where(completed, np.where(direction == 'D', 'DEP', 'ARR'), 'SCH'),
+            'destinations': [f"{a},{b}" if multi else a for (a, b), multi in zip(stops, multi_stop)],
+            'aircraft_type': rng.choice(aircraft_codes, n, p=aircraft_weights),
+            'terminal': rng.choice(['1', '2', '3'], n),
+            'gate': [f"{g}{num}" for g, num in zip(rng.choice(list('BCDEFGH'), n), rng.integers(1, 80, n))],
+            'baggage_claim': None,
+        }
+        flight_id += n
+        db.save_flights(pd.DataFrame(rows), batch_size=5000)
+
+        for direction_code in ('A', 'D'):
+            db.log_collection('collect', direction_code, day.isoformat(), day.isoformat(),
+                              records_collected=n // 2, records_processed=n // 2,
+                              execution_time=float(rng.uniform(5, 60)), api_pages=n // 40)
+
+
+def run_endpoint(client, stats: query_stats.QueryStats, path: str, iterations: int) -> Dict:
+    """
+    Call one endpoint repeatedly and collect its statements
+
+    A first warm-up call captures an EXPLAIN plan of every SELECT; the timed
+    calls run without EXPLAIN overhead.
+
+    Returns:
+        Dict with status, latency samples and per-statement statistics
+    """
+    stats.reset()
+    stats.slow_ms = 0
+    response = client.get(path)
+    plans = {key: dict(entry) for key, entry in stats.entries.items()}
+
+    stats.reset()
+    stats.slow_ms = float('inf')
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    statements = query_stats.merge_snapshots([stats.snapshot()])
+    for statement in statements:
+        warm = plans.get(statement['fingerprint'])
+        statement['explain'] = warm['explain'] if warm else None
+        statement['example'] = warm['slow_example'] if warm else None
+        statement['count'] = statement['count'] // iterations if iterations else statement['count']
+
+    return {
+        'status': response.status_code,
+        'p50_ms': query_stats.percentile(latencies, 50),
+        'p95_ms': query_stats.percentile(latencies, 95),
+        'p99_ms': query_stats.percentile(latencies, 99),
+        'statements': statements,
+    }
+
+
+def check_results(results: List[Dict], budgets: Dict, dialect: str) -> List[str]:
+    """Return the list of regressions against the budgets"""
+    regressions = []
+    allowed_scans = set(budgets.get('allowed_full_scans', []))
+    endpoint_budgets = budgets.get('endpoint_p95_ms', {})
+    statement_budgets = budgets.get('statement_p95_ms', {})
+
+    for result in results:
+        path = result['path']
+        if result['status'] >= 400:
+            regressions.append(f"{path}: HTTP {result['status']}")
+
+        budget = endpoint_budgets.get(result['route'], endpoint_budgets.get('default'))
+        statement_budget = statement_budgets.get(result['route'], statement_budgets.get('default'))
+        if budget is not None and result['p95_ms'] > budget:
+            regressions.append(f"{path}: p95 {result['p95_ms']:.1f} ms exceeds budget {budget} ms")
+
+        for statement in result['statements']:
+            source = statement['example'] or statement['query']
+            for table, access, full_scan in access_paths(statement['explain'], source, dialect):
+                if full_scan and table not in allowed_scans:
+                    regressions.append(
+                        f"{path}: full scan of {table} in [{statement['fingerprint']}] {statement['query'][:120]}"
+                    )
+            if statement_budget is not None and statement['p95_ms'] > statement_budget:
+                regressions.append(
+                    f"{path}: statement [{statement['fingerprint']}] p95 {statement['p95_ms']:.1f} ms "
+                    f"exceeds budget {statement_budget} ms"
+                )
+    return regressions
+
+
+def uncovered_routes(app) -> List[str]:
+    """/api routes of the Flask app that BENCHMARK_REQUESTS does not exercise"""
+    covered = {route for route, _ in BENCHMARK_REQUESTS}
+    routes = {
+        str(rule.rule) for rule in app.url_map.iter_rules()
+        if str(rule.rule).startswith('/api/') and not str(rule.rule).startswith(EXCLUDED_ROUTES)
+    }
+    return sorted(routes - covered)
+
+
+def write_report(results: List[Dict], regressions: List[str], dialect: str) -> str:
+    """Write text and JSON reports; returns the text report path"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    text_path = os.path.join(config.REPORTS_DIR, f"query_benchmark_{timestamp}.txt")
+
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(f"QUERY BENCHMARK ({dialect}) - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("=" * 80 + "\n\n")
+        for result in results:
+            f.write(f"{result['path']}  HTTP {result['status']}  p50={result['p50_ms']:.1f}ms "
+                    f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms  "
+                    f"statements/request={sum(s['count'] for s in result['statements'])}\n")
+            f.write("-" * 80 + "\n")
+            for statement in result['statements']:
+                f.write(f"  [{statement['fingerprint']}] x{statement['count']} p50={statement['p50_ms']:.1f}ms "
+                        f"p95={statement['p95_ms']:.1f}ms p99={statement['p99_ms']:.1f}ms "
+                        f"rows/call={statement['rows_per_call']:.1f}\n")
+                f.write(f"    {statement['query'][:200]}\n")
+                source = statement['example'] or statement['query']
+                for table, access, full_scan in access_paths(statement['explain'], source, dialect):
+                    f.write(f"    {'FULL SCAN ' if full_scan else ''}{table}: {access}\n")
+            f.write("\n")
+
+        f.write("REGRESSIONS\n" + "-" * 80 + "\n")
+        f.write("\n".join(regressions) if regressions else "None")
+        f.write("\n")
+
+    with open(text_path[:-4] + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'dialect': dialect, 'results': results, 'regressions': regressions}, f, indent=2, default=str)
+
+    return text_path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Query plan regression benchmark for the web API')
+    parser.add_argument('--backend', choices=['sqlite', 'mariadb'], default='sqlite',
+                        help='Database to benchmark (default: local SQLite file)')
+    parser.add_argument('--db', default=os.path.join(BENCHMARK_DIR, 'benchmark.db'),
+                        help='SQLite benchmark database file')
+    parser.add_argument('--reseed', action='store_true',
+                        help='Recreate the synthetic data (SQLite: new file; MariaDB: requires empty flights table)')
+    parser.add_argument('--days', type=int, default=365, help='Days of synthetic flights')
+    parser.add_argument('--flights-per-day', type=int, default=1300, help='Average flights per day')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed calls per endpoint')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS, help='Budgets file')
+    args = parser.parse_args()
+
+    with open(args.budgets, 'r', encoding='utf-8') as f:
+        budgets = json.load(f)
+
+    # Isolated statistics, not mixed into data/query_stats
+    stats = query_stats.QueryStats(slow_ms=0, snapshot_interval=float('inf'))
+    query_stats.set_query_stats(stats)
+    config.QUERY_STATS_SETTINGS['enabled'] = True
+    config.STORAGE_SETTINGS['backend'] = args.backend
+
+    if args.backend == 'sqlite':
+        config.STORAGE_SETTINGS['sqlite_path'] = args.db
+        os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+        if args.reseed:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+        needs_seed = not os.path.exists(args.db)
+    else:
+        needs_seed = args.reseed
+
+    from storage import create_storage_backend
+
+    with create_storage_backend() as db:
+        # Also brings a database seeded by an older version up to the current schema
+        db.create_tables()
+        if needs_seed:
+            print("=" * 80)
+            print(f"SEEDING {args.days} DAYS x ~{args.flights_per_day} FLIGHTS ({args.backend})")
+            print("=" * 80)
+            with db.connection.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) as total FROM flights")
+                if cursor.fetchone()['total']:
+                    print("Refusing to seed: the flights table is not empty")
+                    return 2
+            seed_database(db, args.days, args.flights_per_day)
+    stats.reset()
+
+    import web_api
+
+    # Measure the statements, not the response cache
+    web_api.response_cache.enabled = False
+    missing = uncovered_routes(web_api.app)
+    client = web_api.app.test_client()
+    results = []
+
+    print("=" * 80)
+    print(f"BENCHMARKING {len(BENCHMARK_REQUESTS)} REQUESTS x {args.iterations}")
+    print("=" * 80)
+    for route, path in BENCHMARK_REQUESTS:
+        result = run_endpoint(client, stats, path, args.iterations)
+        result.update({'route': route, 'path': path})
+        results.append(result)
+        print(f"  {path:<70} p95={result['p95_ms']:8.1f} ms  "
+              f"statements/request={sum(s['count'] for s in result['statements'])}")
+
+    regressions = [f"{route}: not covered by BENCHMARK_REQUESTS" for route in missing]
+    regressions += check_results(results, budgets, web_api.db.dialect)
+    report_path = write_report(results, regressions, web_api.db.dialect)
+    print(f"\nSaved benchmark report to {report_path}")
+
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+
+    print("\n[OK] All statements within budget and without unexpected full scans")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Serialization and Compression Benchmark
+Measures, for every web API endpoint in benchmark_queries.BENCHMARK_REQUESTS,
+how long its payload takes to encode with the stdlib encoder and with the fast
+encoder (orjson, when installed), and how many bytes go over the wire
+uncompressed, gzipped and brotli-compressed (when brotli is installed).
+
+Uses the same database as benchmark_queries.py (seed it there first).
+
+Usage:
+    python benchmark_serialization.py
+    python benchmark_serialization.py --backend mariadb --iterations 50
+
+Reports are written to data/reports/serialization_benchmark_<timestamp>.txt and .json.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import config
+import serialization
+from benchmark_queries import BENCHMARK_DIR, BENCHMARK_REQUESTS
+
+
+def median_ms(func: Callable, iterations: int) -> float:
+    """Median wall time of func() in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def measure_endpoint(app, client, path: str, iterations: int) -> Dict:
+    """Encode and compress one endpoint's payload"""
+    response = client.get(path, headers={'Accept-Encoding': 'identity'})
+    payload = response.get_json()
+    fast = serialization.FastJSONProvider(app)
+    stdlib = serialization.DefaultJSONProvider(app)
+    body = fast.dumps_bytes(payload)
+
+    result = {
+        'path': path,
+        'status': response.status_code,
+        'items': len(payload) if isinstance(payload, list) else None,
+        'stdlib_ms': median_ms(lambda: stdlib.dumps(payload, separators=(',', ':')).encode('utf-8'), iterations),
+        'fast_ms': median_ms(lambda: fast.dumps_bytes(payload), iterations) if serialization.orjson else None,
+        'identity_bytes': len(body),
+        'gzip_bytes': len(serialization.compress_bytes(body, 'gzip')),
+        'gzip_ms': median_ms(lambda: serialization.compress_bytes(body, 'gzip'), iterations),
+        'br_bytes': None,
+        'br_ms': None,
+    }
+    if serialization.brotli is not None:
+        result['br_bytes'] = len(serialization.compress_bytes(body, 'br'))
+        result['br_ms'] = median_ms(lambda: serialization.compress_bytes(body, 'br'), iterations)
+    return result
+
+
+def format_report(results: List[Dict]) -> str:
+    """Text table of the results"""
+    def value(number, fmt, width):
+        return (format(number, fmt) if number is not None else '-').rjust(width)
+
+    lines = [
+        f"SERIALIZATION BENCHMARK - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Fast encoder: {'orjson' if serialization.orjson else 'not installed (stdlib fallback)'}; "
+        f"brotli: {'available' if serialization.brotli else 'not installed'}",
+        "=" * 120,
+        f"{'Endpoint':<60} {'stdlib':>8} {'fast':>8} {'bytes':>10} {'gzip':>9} {'gz ms':>7} {'br':>9} {'br ms':>7}",
+        "-" * 120,
+    ]
+    for r in results:
+        lines.append(
+            f"{r['path'][:60]:<60} {value(r['stdlib_ms'], '.2f', 8)} {value(r['fast_ms'], '.2f', 8)} "
+            f"{r['identity_bytes']:>10,} {r['gzip_bytes']:>9,} {value(r['gzip_ms'], '.2f', 7)} "
+            f"{value(r['br_bytes'], ',', 9)} {value(r['br_ms'], '.2f', 7)}"
+        )
+    lines.append("-" * 120)
+    lines.append("Times are medians in ms; bytes are the encoded body sizes.")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='JSON serialization and compression benchmark for the web API')
+    parser.add_argument('--backend', choices=['sqlite', 'mariadb'], default='sqlite',
+                        help='Database to read the payloads from (default: benchmark SQLite file)')
+    parser.add_argument('--db', default=os.path.join(BENCHMARK_DIR, 'benchmark.db'),
+                        help='SQLite benchmark database file (seed with benchmark_queries.py)')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed runs per measurement')
+    args = parser.parse_args()
+
+    config.STORAGE_SETTINGS['backend'] = args.backend
+    if args.backend == 'sqlite':
+        if not os.path.exists(args.db):
+            print(f"Benchmark database not found: {args.db} (run benchmark_queries.py first)")
+            return 2
+        config.STORAGE_SETTINGS['sqlite_path'] = args.db
+
+    import web_api
+    web_api.response_cache.enabled = False
+    client = web_api.app.test_client()
+
+    results = []
+    for _, path in BENCHMARK_REQUESTS:
+        result = measure_endpoint(web_api.app, client, path, args.iterations)
+        results.append(result)
+        print(f"  {path:<70} {result['identity_bytes']:>10,} bytes")
+
+    report = format_report(results)
+    print()
+    print(report)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    text_path = os.path.join(config.REPORTS_DIR, f"serialization_benchmark_{timestamp}.txt")
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(report + "\n")
+    with open(text_path[:-4] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved benchmark report to {text_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
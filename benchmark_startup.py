@@ -0,0 +1,180 @@
+"""
+Web Worker Startup Benchmark
+Measures what importing the web API costs a fresh process: wall time to
+`import web_api` (what a gunicorn/uvicorn worker does on boot and after a
+reload) and resident memory afterwards, plus the modules that dominate the
+import time (python -X importtime).
+
+Every run is a new interpreter. With --baseline the same measurement runs
+against an earlier commit (exported with `git archive` into a temporary
+directory), so the effect of a change can be shown side by side:
+
+    python benchmark_startup.py --baseline HEAD~1
+
+Importing web_api does not connect to the database; the runs use the SQLite
+backend so no .env or tunnel is needed.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 20 --baseline <commit>
+
+Reports are written to data/reports/startup_benchmark_<timestamp>.txt and .json.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, List
+
+import config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run in the child: import the app and report time, memory and loaded modules
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import web_api
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+heavy = [name for name in ('pandas', 'paramiko', 'sshtunnel', 'numpy', 'matplotlib') if name in sys.modules]
+print(json.dumps({'import_ms': elapsed * 1000, 'rss_kb': rss_kb, 'modules': len(sys.modules), 'heavy': heavy}))
+"""
+
+
+def probe_env(tree: str) -> Dict[str, str]:
+    """Environment of the child processes (SQLite backend, no tunnel)"""
+    return dict(os.environ, STORAGE_BACKEND='sqlite', SKIP_SSH_TUNNEL='true',
+                SQLITE_PATH=os.path.join(tree, config.DATA_DIR, 'startup_benchmark.db'),
+                PYTHONDONTWRITEBYTECODE='1')
+
+
+def measure_tree(tree: str, runs: int) -> Dict:
+    """Import web_api from a source tree in `runs` fresh interpreters"""
+    env = probe_env(tree)
+    # One warm-up run fills the OS file cache (and builds generated files)
+    subprocess.run([sys.executable, '-c', PROBE], cwd=tree, env=env, capture_output=True)
+
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', PROBE], cwd=tree, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"import web_api failed in {tree}:\n{result.stderr[-2000:]}")
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    import_ms = [s['import_ms'] for s in samples]
+    return {
+        'tree': tree,
+        'runs': runs,
+        'import_ms_median': round(statistics.median(import_ms), 1),
+        'import_ms_min': round(min(import_ms), 1),
+        'rss_mb_median': round(statistics.median(s['rss_kb'] for s in samples) / 1024, 1),
+        'modules': samples[-1]['modules'],
+        'heavy_modules': samples[-1]['heavy'],
+        'top_imports': top_imports(tree, env),
+    }
+
+
+def top_imports(tree: str, env: Dict[str, str], count: int = 10) -> List[Dict]:
+    """Modules imported directly by web_api with the largest cumulative import time (-X importtime)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import web_api'],
+                            cwd=tree, env=env, capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        # Entries are indented two spaces per nesting level below web_api
+        if len(name) - len(name.lstrip()) != 3:
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+    return [{'module': name, 'ms': round(us / 1000, 1)} for name, us in ranked]
+
+
+def export_revision(revision: str, directory: str):
+    """Extract a commit of this repository into a directory"""
+    archive = subprocess.run(['git', 'archive', '--format=tar', revision], cwd=BASE_DIR,
+                             capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+def format_report(results: List[Dict]) -> str:
+    """Text table of the measurements"""
+    lines = [
+        f"WEB STARTUP BENCHMARK - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Python {sys.version.split()[0]}; `import web_api` in a fresh interpreter",
+        "=" * 80,
+        f"{'Tree':<20} {'Runs':>5} {'Import ms':>10} {'(min)':>8} {'RSS MB':>8} {'Modules':>8}  Heavy modules",
+        "-" * 80,
+    ]
+    for r in results:
+        lines.append(
+            f"{r['label']:<20} {r['runs']:>5} {r['import_ms_median']:>10.1f} {r['import_ms_min']:>8.1f} "
+            f"{r['rss_mb_median']:>8.1f} {r['modules']:>8}  {', '.join(r['heavy_modules']) or '-'}"
+        )
+    if len(results) == 2:
+        before, after = results
+        lines.append("-" * 80)
+        lines.append(
+            f"Change: import {after['import_ms_median'] - before['import_ms_median']:+.1f} ms "
+            f"({(after['import_ms_median'] / before['import_ms_median'] - 1) * 100:+.0f}%), "
+            f"RSS {after['rss_mb_median'] - before['rss_mb_median']:+.1f} MB "
+            f"({(after['rss_mb_median'] / before['rss_mb_median'] - 1) * 100:+.0f}%)"
+        )
+    for r in results:
+        lines.append("")
+        lines.append(f"Slowest imports ({r['label']}):")
+        for entry in r['top_imports']:
+            lines.append(f"  {entry['module']:<30} {entry['ms']:>8.1f} ms")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Import time and memory of a web worker')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per tree')
+    parser.add_argument('--baseline', metavar='REVISION', default=None,
+                        help='Also measure this git revision (e.g. HEAD~1)')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='startup-benchmark-') as baseline_dir:
+        if args.baseline:
+            print(f"Measuring {args.baseline}...")
+            export_revision(args.baseline, baseline_dir)
+            results.append({'label': args.baseline, **measure_tree(baseline_dir, args.runs)})
+        print("Measuring working tree...")
+        results.append({'label': 'working tree', **measure_tree(BASE_DIR, args.runs)})
+
+    report = format_report(results)
+    print()
+    print(report)
+
+    os.makedirs(config.REPORTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    text_path = os.path.join(config.REPORTS_DIR, f"startup_benchmark_{timestamp}.txt")
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(report + "\n")
+    with open(text_path[:-4] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved benchmark report to {text_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+"""
+Write-Behind Collection Logger
+Non-blocking logging of pipeline operations to the data_collection_log table.
+
+Entries are put on a bounded in-memory queue and written in batches by a
+background thread that keeps its own database connection. While the database
+is unreachable (or the queue is full) entries are appended to a local spool
+file, which is replayed as soon as a connection succeeds again. Logging never
+blocks the pipeline and never raises.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database import DatabaseManager
+from storage import StorageBackend, create_storage_backend
+import config
+
+
+class CollectionLogger:
+    """Batching, write-behind logger for data_collection_log"""
+
+    def __init__(self, queue_size: int = None, batch_size: int = None,
+                 flush_interval: float = None, retry_interval: float = None,
+                 spool_file: str = None):
+        settings = config.COLLECTION_LOG_SETTINGS
+        self.batch_size = batch_size or settings['batch_size']
+        self.flush_interval = flush_interval or settings['flush_interval']
+        self.retry_interval = retry_interval or settings['retry_interval']
+        self.spool_file = spool_file or settings['spool_file']
+
+        self.queue = queue.Queue(maxsize=queue_size or settings['queue_size'])
+        self.db = None
+        self.next_connect_attempt = 0.0
+        self.inflight: List[Dict] = []
+        self.spool_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='collection-logger', daemon=True)
+        self.thread.start()
+
+    def log(self, **kwargs) -> bool:
+        """
+        Queue a log entry without blocking
+
+        Accepts the same arguments as DatabaseManager.log_collection.
+
+        Returns:
+            True if the entry was queued, False if it was spooled to disk instead
+        """
+        try:
+            entry = DatabaseManager.collection_log_entry(**kwargs)
+        except Exception as e:
+            print(f"Warning: Invalid collection log entry: {e}")
+            return False
+
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self._spool([entry])
+            return False
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until all queued entries have been written or spooled
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def close(self, timeout: float = 10.0):
+        """Flush pending entries, stop the background thread and disconnect"""
+        self.flush(timeout)
+        self.stopping.set()
+        self.thread.join(timeout=max(self.flush_interval, 1.0) + 1.0)
+
+        if self.thread.is_alive():
+            # Still stuck on the database: keep everything on disk instead.
+            # The in-flight batch may be written twice, but never lost.
+            leftover = list(self.inflight)
+            while True:
+                try:
+                    leftover.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._spool(leftover)
+        else:
+            self._disconnect()
+
+    def _run(self):
+        """Background loop: collect batches from the queue and write them"""
+        while not (self.stopping.is_set() and self.queue.empty()):
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Idle: a good moment to replay spooled entries
+                if os.path.exists(self.spool_file) or os.path.exists(self.spool_file + '.replay'):
+                    self._write_batch([])
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.inflight = batch
+            try:
+                self._write_batch(batch)
+            finally:
+                self.inflight = []
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write_batch(self, batch: List[Dict]):
+        """Write spooled entries followed by batch, spooling batch on failure"""
+        db = self._get_db()
+        if db is None:
+            self._spool(batch)
+            return
+
+        try:
+            self._replay_spool(db)
+            db.log_collections(batch)
+        except Exception as e:
+            print(f"Warning: Could not write collection log, spooling to {self.spool_file}: {e}")
+            self._spool(batch)
+            self._disconnect()
+            self.next_connect_attempt = time.monotonic() + self.retry_interval
+
+    def _get_db(self) -> Optional[StorageBackend]:
+        """Return a connected storage backend, or None while backing off"""
+        if self.db is not None:
+            return self.db
+        if time.monotonic() < self.next_connect_attempt:
+            return None
+
+        try:
+            db = create_storage_backend()
+            db.connect()
+            db.create_tables()
+            self.db = db
+        except Exception as e:
+            print(f"Warning: Collection log database unavailable: {e}")
+            self.next_connect_attempt = time.monotonic() + self.retry_interval
+        return self.db
+
+    def _disconnect(self):
+        """Drop the logger's database connection"""
+        if self.db is not None:
+            try:
+                self.db.disconnect()
+            except Exception:
+                pass
+            self.db = None
+
+    def _spool(self, entries: List[Dict]):
+        """Append entries to the local spool file"""
+        if not entries:
+            return
+        try:
+            with self.spool_lock:
+                with open(self.spool_file, 'a', encoding='utf-8') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, default=str) + "\n")
+        except Exception as e:
+            print(f"Warning: Could not spool collection log entries: {e}")
+
+    def _replay_spool(self, db: StorageBackend):
+        """Write all spooled entries to the database and remove the spool file"""
+        replay_file = self.spool_file + '.replay'
+        with self.spool_lock:
+            if os.path.exists(self.spool_file):
+                if os.path.exists(replay_file):
+                    # Left over from an interrupted replay: keep both
+                    with open(self.spool_file, 'r', encoding='utf-8') as src, \
+                            open(replay_file, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                    os.remove(self.spool_file)
+                else:
+                    os.replace(self.spool_file, replay_file)
+            if not os.path.exists(replay_file):
+                return
+
+        entries = []
+        with open(replay_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        print(f"Warning: Skipping corrupt spooled log entry: {line[:80]}")
+
+        try:
+            for start in range(0, len(entries), self.batch_size):
+                db.log_collections(entries[start:start + self.batch_size])
+        except Exception:
+            # Put back what was not written yet
+            self._spool(entries[start:])
+            os.remove(replay_file)
+            raise
+
+        os.remove(replay_file)
+        if entries:
+            print(f"Replayed {len(entries)} spooled collection log entries")
+
+
+_logger: Optional[CollectionLogger] = None
+_logger_lock = threading.Lock()
+
+
+def get_collection_logger() -> CollectionLogger:
+    """Return the process-wide collection logger, starting it on first use"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = CollectionLogger()
+            atexit.register(_logger.close)
+        return _logger
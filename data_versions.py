@@ -0,0 +1,99 @@
+"""
+Data Versions
+Per-process view of the data_versions table.
+
+The pipeline bumps one counter per data channel in the transaction that changes
+the data:
+
+    flights         - flight batches, merged staging days, daily stats rebuilds,
+                      dropped partitions
+    collection_log  - data_collection_log entries
+    reference       - airports/countries/aircraft types loaded by load-reference
+    retention       - partitions dropped by retention (flights were removed)
+
+The web API reads the counters through a DataVersionTracker, which re-reads the
+table at most every few seconds, and uses them to invalidate cached responses
+and to answer conditional requests (ETag / Last-Modified) without running the
+endpoint's queries.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+import config
+
+
+class DataVersion(NamedTuple):
+    """Version counter of one channel and when it was last bumped"""
+    version: int
+    updated_at: Optional[datetime]
+
+
+class DataVersionTracker:
+    """Thread-safe, periodically refreshed copy of the data versions"""
+
+    def __init__(self, source: Callable[[], Dict[str, DataVersion]],
+                 check_interval: Optional[float] = None):
+        """
+        Args:
+            source: Callable returning {channel: DataVersion} (e.g. db.get_data_versions)
+            check_interval: Seconds between source calls (default from config)
+        """
+        self.source = source
+        self.check_interval = (check_interval if check_interval is not None
+                               else config.DATA_VERSION_SETTINGS['check_interval'])
+        self._versions: Optional[Dict[str, DataVersion]] = None
+        self._checked_at = 0.0
+        self.next_read_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Optional[Dict[str, DataVersion]]:
+        """
+        Return the versions of all channels, re-reading them if the last read is
+        older than check_interval
+
+        After a failed read the source is not called again for check_interval
+        seconds, so requests do not each wait for a database that is down.
+
+        Returns:
+            Dict of channel -> DataVersion, or None if the versions cannot be read
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._versions is not None and now - self._checked_at < self.check_interval:
+                return self._versions
+            if self._versions is None and now < self.next_read_attempt:
+                return None
+
+        try:
+            versions = self.source()
+        except Exception as e:
+            print(f"Could not read data versions: {e}")
+            versions = None
+
+        with self._lock:
+            self._versions = versions
+            self._checked_at = now
+            if versions is None:
+                self.next_read_attempt = now + self.check_interval
+        return versions
+
+    def get(self, channel: str) -> Optional[DataVersion]:
+        """
+        Return the current version of a channel
+
+        Returns:
+            DataVersion (version 0 if the channel was never bumped), or None if
+            the versions cannot be read
+        """
+        versions = self.snapshot()
+        if versions is None:
+            return None
+        return versions.get(channel, DataVersion(0, None))
+
+    def invalidate(self):
+        """Force a re-read on the next call"""
+        with self._lock:
+            self._versions = None
+            self.next_read_attempt = 0.0
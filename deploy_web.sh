@@ -29,7 +29,7 @@ export PATH=$PATH:/usr/sbin:/sbin
 
 echo ""
 echo "Step 2: Installing Python web dependencies..."
-sudo -u "$APP_USER" "$APP_DIR/venv/bin/pip" install gunicorn flask flask-cors python-dotenv
+sudo -u "$APP_USER" "$APP_DIR/venv/bin/pip" install gunicorn flask flask-cors python-dotenv uvicorn asgiref
 
 echo ""
 echo "Step 3: Creating Gunicorn systemd service..."
@@ -45,7 +45,7 @@ Group=$APP_USER
 WorkingDirectory=$APP_DIR
 Environment="PATH=$APP_DIR/venv/bin"
 Environment="SKIP_SSH_TUNNEL=true"
-ExecStart=$APP_DIR/venv/bin/gunicorn -w 4 -b 127.0.0.1:5000 --timeout 120 web_api:app
+ExecStart=$APP_DIR/venv/bin/gunicorn -w 2 -k uvicorn.workers.UvicornWorker -b 127.0.0.1:5000 --timeout 120 --preload web_asgi:application
 ExecReload=/bin/kill -s HUP \$MAINPID
 KillMode=mixed
 TimeoutStopSec=5
@@ -0,0 +1,216 @@
+"""
+Destination Catalog
+In-process index of the airports that departures fly to, used by
+/api/destinations instead of scanning flights on every call.
+
+The catalog is built once per process (one pass over the departures'
+destinations) and kept current through the data versions (see data_versions.py):
+
+    flights    - when it changes, the distinct codes of flight_destinations are
+                 read through its iata_code index, and only codes that are not
+                 yet known as departure destinations are checked against
+                 flights and looked up in airports
+    reference  - when load-reference ran, the airport details are reloaded
+    retention  - when partitions were dropped, the catalog is rebuilt from
+                 scratch: a code whose last departure was removed drops out
+
+Airports are indexed by IATA code, country and continent. The sorted
+/api/destinations list is prepared on refresh, so requests are answered from
+memory.
+"""
+import threading
+from typing import Dict, List, Optional, Set
+
+from data_versions import DataVersionTracker
+
+
+class CatalogSnapshot:
+    """Immutable state of the catalog; replaced as a whole on refresh"""
+
+    def __init__(self, airports: Dict[str, Dict], departure_codes: Set[str],
+                 flights_version: int, reference_version: int, retention_version: int):
+        self.airports = airports
+        self.departure_codes = frozenset(departure_codes)
+        self.flights_version = flights_version
+        self.reference_version = reference_version
+        self.retention_version = retention_version
+
+        self.destinations = sorted(
+            (self.entry(code) for code in self.departure_codes),
+            key=lambda entry: entry['name']
+        )
+        self.by_country: Dict[str, List[str]] = {}
+        self.by_continent: Dict[str, List[str]] = {}
+        for entry in self.destinations:
+            self.by_country.setdefault(entry['country'], []).append(entry['code'])
+            self.by_continent.setdefault(entry['continent'], []).append(entry['code'])
+
+    def entry(self, code: str) -> Dict:
+        """Destination entry for a code; codes missing from airports get a basic entry"""
+        return self.airports.get(code) or {
+            'code': code, 'name': code, 'country': 'Unknown', 'continent': 'Unknown'
+        }
+
+
+class DestinationCatalog:
+    """Airports served by departures, refreshed incrementally from the database"""
+
+    def __init__(self, db, versions: DataVersionTracker):
+        """
+        Args:
+            db: StorageBackend to read from (through its read connection)
+            versions: Tracker of the current data versions
+        """
+        self.db = db
+        self.versions = versions
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = threading.Lock()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        Return the current catalog, building or refreshing it first when the
+        flights or reference data changed
+        """
+        flights = self.versions.get('flights')
+        reference = self.versions.get('reference')
+        retention = self.versions.get('retention')
+        # Without readable versions, keep serving what we have
+        flights_version = flights.version if flights else None
+        reference_version = reference.version if reference else None
+        retention_version = retention.version if retention else None
+
+        snapshot = self._snapshot
+        if snapshot is not None and (flights_version is None or (
+                snapshot.flights_version == flights_version
+                and snapshot.reference_version == reference_version
+                and snapshot.retention_version == retention_version)):
+            return snapshot
+
+        with self._refresh_lock:
+            snapshot = self._snapshot
+            if snapshot is None or (retention_version is not None
+                                    and snapshot.retention_version != retention_version):
+                # Flights were removed: codes may have to go, so start over
+                snapshot = self._build(flights_version or 0, reference_version or 0, retention_version or 0)
+            elif (snapshot.flights_version != flights_version
+                  or snapshot.reference_version != reference_version):
+                snapshot = self._refresh(snapshot, flights_version, reference_version)
+            self._snapshot = snapshot
+        return snapshot
+
+    def destinations(self) -> List[Dict]:
+        """Destinations with departures, sorted by name"""
+        return self.snapshot().destinations
+
+    def get(self, code: str) -> Optional[Dict]:
+        """Destination entry of a served airport code"""
+        snapshot = self.snapshot()
+        return snapshot.entry(code) if code in snapshot.departure_codes else None
+
+    def codes_in_country(self, country: str) -> List[str]:
+        """Served airport codes in a country"""
+        return self.snapshot().by_country.get(country, [])
+
+    def codes_in_continent(self, continent: str) -> List[str]:
+        """Served airport codes on a continent"""
+        return self.snapshot().by_continent.get(continent, [])
+
+    def invalidate(self):
+        """Drop the catalog; the next call rebuilds it"""
+        with self._refresh_lock:
+            self._snapshot = None
+
+    def _build(self, flights_version: int, reference_version: int,
+               retention_version: int) -> CatalogSnapshot:
+        """Build the catalog from scratch"""
+        with self.db.get_read_connection().cursor() as cursor:
+            airports = self._load_airports(cursor)
+            departure_codes = self._all_departure_codes(cursor)
+
+        print(f"Destination catalog built: {len(departure_codes)} destinations, {len(airports)} airports")
+        return CatalogSnapshot(airports, departure_codes, flights_version, reference_version,
+                               retention_version)
+
+    def _refresh(self, snapshot: CatalogSnapshot, flights_version: int,
+                 reference_version: int) -> CatalogSnapshot:
+        """Apply new flights and/or reference data to a catalog"""
+        with self.db.get_read_connection().cursor() as cursor:
+            airports = snapshot.airports
+            if snapshot.reference_version != reference_version:
+                airports = self._load_airports(cursor)
+
+            departure_codes = set(snapshot.departure_codes)
+            if snapshot.flights_version != flights_version:
+                # New codes, and codes that so far only had arrivals
+                candidates = self._flight_destination_codes(cursor) - departure_codes
+                if candidates:
+                    departure_codes |= self._departure_codes(cursor, candidates)
+
+        added = len(departure_codes) - len(snapshot.departure_codes)
+        if added:
+            print(f"Destination catalog: {added} new destination(s)")
+        return CatalogSnapshot(airports, departure_codes, flights_version, reference_version,
+                               snapshot.retention_version)
+
+    @staticmethod
+    def _load_airports(cursor) -> Dict[str, Dict]:
+        """All airports with their country and continent, by IATA code"""
+        cursor.execute("""
+            SELECT
+                a.iata_code as code,
+                a.name,
+                c.name as country,
+                co.name as continent
+            FROM airports a
+            LEFT JOIN countries c ON a.country_id = c.id
+            LEFT JOIN continents co ON c.continent_id = co.id
+        """)
+        return {
+            row['code']: {
+                'code': row['code'],
+                'name': row['name'] or row['code'],
+                'country': row['country'] or 'Unknown',
+                'continent': row['continent'] or 'Unknown'
+            }
+            for row in cursor.fetchall()
+        }
+
+    @staticmethod
+    def _flight_destination_codes(cursor) -> Set[str]:
+        """Every airport code on any flight route (read from the iata_code index)"""
+        cursor.execute("SELECT DISTINCT iata_code FROM flight_destinations")
+        return {row['iata_code'] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _all_departure_codes(cursor) -> Set[str]:
+        """Every airport code of a departure route (one pass over the direction index)"""
+        cursor.execute("""
+            SELECT DISTINCT destinations
+            FROM flights
+            WHERE destinations IS NOT NULL
+              AND destinations != ''
+              AND flight_direction = 'D'
+        """)
+        codes = set()
+        for row in cursor.fetchall():
+            codes.update(code.strip() for code in str(row['destinations']).split(','))
+        codes.discard('')
+        return codes
+
+    @staticmethod
+    def _departure_codes(cursor, codes: Set[str], batch_size: int = 500) -> Set[str]:
+        """The subset of codes that at least one departure flies to"""
+        codes = sorted(codes)
+        found = set()
+        for start in range(0, len(codes), batch_size):
+            batch = codes[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"""
+                SELECT DISTINCT fd.iata_code
+                FROM flight_destinations fd
+                JOIN flights f ON f.id = fd.flight_id
+                WHERE fd.iata_code IN ({placeholders})
+                  AND f.flight_direction = 'D'
+            """, batch)
+            found.update(row['iata_code'] for row in cursor.fetchall())
+        return found
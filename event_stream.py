@@ -0,0 +1,337 @@
+"""
+Event Stream
+Server-Sent Events channel that tells open dashboards when data changed.
+
+One VersionBroadcaster per web worker process polls the data versions (see
+data_versions.py) in a background thread, on a database connection of its own
+(DedicatedVersionSource), and wakes the subscribed streams when a channel's
+version moves. Streams only send an event when a channel they subscribed to
+changed, plus a comment line as heartbeat, so idle viewers cost
+an open connection but no queries: the number of database reads does not
+depend on the number of viewers.
+
+Events look like:
+
+    id: collection_log=41;flights=1207
+    event: versions
+    data: {"versions": {"flights": 1207, "collection_log": 41}, "changed": ["flights"]}
+
+The id holds the versions the client has seen. Browsers send it back as
+Last-Event-ID when they reconnect, so changes made while a client was
+disconnected are reported on the first event after reconnecting.
+
+Serving:
+    - web_asgi.py streams /api/events on the event loop (asgi_event_stream); a
+      viewer does not hold a thread
+    - web_api's /api/events route streams from a thread (WSGI); it refuses to
+      run on single-threaded workers (sync gunicorn), where a viewer would
+      block the whole worker
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+import config
+from data_versions import DataVersionTracker
+
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+def parse_channels(value: Optional[str]) -> Optional[List[str]]:
+    """Channels from a comma separated query parameter (None = all channels)"""
+    if not value:
+        return None
+    channels = sorted({channel.strip() for channel in value.split(',') if channel.strip()})
+    return channels or None
+
+
+def event_id(versions: Dict[str, int]) -> str:
+    """Event id that encodes the versions of an event"""
+    return ';'.join(f"{channel}={version}" for channel, version in sorted(versions.items()))
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Dict[str, int]]:
+    """Versions from a Last-Event-ID header (None when missing or malformed)"""
+    if not value:
+        return None
+    try:
+        return {
+            channel: int(version)
+            for channel, version in (part.split('=', 1) for part in value.split(';') if part)
+        }
+    except ValueError:
+        return None
+
+
+class Subscription:
+    """The versions one client has been sent"""
+
+    def __init__(self, broadcaster: 'VersionBroadcaster', channels: Optional[List[str]] = None,
+                 last_event_id: Optional[str] = None):
+        """
+        Args:
+            broadcaster: Source of the current versions
+            channels: Channels to report (None = all)
+            last_event_id: Last-Event-ID header of a reconnecting client
+        """
+        self.broadcaster = broadcaster
+        self.channels = channels
+        self.sent = parse_event_id(last_event_id)
+
+    def opening(self) -> bytes:
+        """First bytes of the stream: reconnect delay for the browser"""
+        return f"retry: {config.EVENT_STREAM_SETTINGS['retry_ms']}\n\n".encode('ascii')
+
+    def update(self) -> Optional[bytes]:
+        """
+        Event for the current versions, or None if the subscribed channels did
+        not change since the last event
+        """
+        versions = self.broadcaster.current()
+        if versions is None:
+            return None
+        if self.channels is not None:
+            versions = {channel: versions.get(channel, 0) for channel in self.channels}
+        if versions == self.sent:
+            return None
+
+        changed = []
+        if self.sent is not None:
+            changed = [channel for channel, version in versions.items() if self.sent.get(channel) != version]
+        self.sent = versions
+        data = json.dumps({'versions': versions, 'changed': changed}, separators=(',', ':'), sort_keys=True)
+        return f"id: {event_id(versions)}\nevent: versions\ndata: {data}\n\n".encode('utf-8')
+
+
+class DedicatedVersionSource:
+    """
+    Reads the data versions on a connection of its own
+
+    The broadcaster's poll thread runs next to the request threads; pymysql
+    connections must not be shared between threads, so the poller does not
+    use the shared read connection (which the threaded dev server and gthread
+    workers hand to every request thread) but opens its own, like the flight
+    export does. The connection is reopened after an error.
+    """
+
+    def __init__(self, db):
+        """
+        Args:
+            db: StorageBackend to read the versions from
+        """
+        self.db = db
+        self._connection = None
+
+    def __call__(self) -> Dict:
+        if self._connection is None:
+            self._connection = self.db.open_read_connection()
+        try:
+            return self.db.get_data_versions(connection=self._connection)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the connection (a new one is opened on the next read)"""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+class VersionBroadcaster:
+    """Polls the data versions in one thread and wakes the streams on a change"""
+
+    def __init__(self, versions: DataVersionTracker, poll_interval: Optional[float] = None,
+                 heartbeat_seconds: Optional[float] = None):
+        """
+        Args:
+            versions: Tracker of the current data versions
+            poll_interval: Seconds between version reads (default from config)
+            heartbeat_seconds: Seconds between heartbeats on idle streams
+        """
+        settings = config.EVENT_STREAM_SETTINGS
+        self.versions = versions
+        self.poll_interval = poll_interval if poll_interval is not None else settings['poll_interval']
+        self.heartbeat_seconds = (heartbeat_seconds if heartbeat_seconds is not None
+                                  else settings['heartbeat_seconds'])
+
+        self._current: Optional[Dict[str, int]] = None
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._async_waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._streams = 0
+
+    @property
+    def sequence(self) -> int:
+        """Counter that moves every time the versions change"""
+        return self._sequence
+
+    @property
+    def streams(self) -> int:
+        """Number of open streams in this process"""
+        return self._streams
+
+    def current(self) -> Optional[Dict[str, int]]:
+        """Current version of every channel (None until the first successful read)"""
+        return self._current
+
+    def opened(self):
+        """Count a stream that started"""
+        with self._condition:
+            self._streams += 1
+
+    def closed(self):
+        """Count a stream that ended"""
+        with self._condition:
+            self._streams -= 1
+
+    def start(self):
+        """Start the polling thread (once per process)"""
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is not None:
+                return
+            self.poll()
+            self._thread = threading.Thread(target=self._run, name='version-broadcaster', daemon=True)
+            self._thread.start()
+
+    def poll(self) -> bool:
+        """Read the versions and wake the streams if they changed; returns True on a change"""
+        state = self.versions.snapshot()
+        if state is None:
+            return False
+        current = {channel: version.version for channel, version in state.items()}
+
+        with self._condition:
+            if current == self._current:
+                return False
+            self._current = current
+            self._sequence += 1
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop already closed
+                pass
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Event stream: could not poll data versions: {e}")
+
+    def wait(self, sequence: int, timeout: float) -> int:
+        """Block until the sequence moves past the given one or timeout passes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != sequence, timeout)
+            return self._sequence
+
+    async def wait_async(self, sequence: int, timeout: float, cancel: Optional[asyncio.Future] = None) -> int:
+        """
+        Wait on the event loop until the sequence moves past the given one,
+        timeout passes or cancel completes
+        """
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._condition:
+            if self._sequence != sequence:
+                return self._sequence
+            self._async_waiters.add(waiter)
+        waiting = asyncio.ensure_future(event.wait())
+        try:
+            await asyncio.wait({waiting} | ({cancel} if cancel else set()), timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiting.cancel()
+            with self._condition:
+                self._async_waiters.discard(waiter)
+        return self._sequence
+
+    def stream(self, channels: Optional[List[str]] = None, last_event_id: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Blocking event stream for a WSGI response
+
+        Runs until the client disconnects (the server then closes the generator
+        when a heartbeat cannot be written).
+        """
+        self.start()
+        subscription = Subscription(self, channels, last_event_id)
+        self.opened()
+        try:
+            yield subscription.opening()
+            sequence = self.sequence
+            while True:
+                chunk = subscription.update()
+                if chunk:
+                    yield chunk
+                new_sequence = self.wait(sequence, self.heartbeat_seconds)
+                if new_sequence == sequence:
+                    yield HEARTBEAT
+                sequence = new_sequence
+        finally:
+            self.closed()
+
+
+# Response headers of an event stream; X-Accel-Buffering stops nginx from buffering it
+STREAM_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+
+async def asgi_event_stream(broadcaster: VersionBroadcaster, scope, receive, send):
+    """
+    Serve an event stream directly from the event loop (ASGI)
+
+    Query parameter 'channels' selects the channels, like the WSGI route.
+    """
+    # The first start reads the versions; keep that off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, broadcaster.start)
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    subscription = Subscription(broadcaster, parse_channels(query.get('channels', [None])[0]),
+                                headers.get('last-event-id'))
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    broadcaster.opened()
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in STREAM_HEADERS.items()],
+        })
+        await send({'type': 'http.response.body', 'body': subscription.opening(), 'more_body': True})
+
+        sequence = broadcaster.sequence
+        while not disconnected.done():
+            chunk = subscription.update()
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            new_sequence = await broadcaster.wait_async(sequence, broadcaster.heartbeat_seconds, disconnected)
+            if new_sequence == sequence and not disconnected.done():
+                await send({'type': 'http.response.body', 'body': HEARTBEAT, 'more_body': True})
+            sequence = new_sequence
+    finally:
+        broadcaster.closed()
+        disconnected.cancel()
@@ -0,0 +1,114 @@
+"""
+Flight Export
+Streams flights as CSV or NDJSON for /api/export/flights.
+
+The export is generated while it is sent: the date range is read one day at a
+time with a server-side cursor (DatabaseManager.iter_flights) on a dedicated
+connection, and every chunk of rows is formatted and sent before the next is
+fetched. Memory use does not depend on the size of the range, and each day's
+query only sorts that day's flights, so rows start flowing right away even for
+a year of data. The CSV header is sent before the first query runs.
+
+Values are written as:
+    dates/datetimes  ISO 8601 (2025-01-31, 2025-01-31T14:05:00)
+    times            HH:MM:SS
+    booleans         true/false (CSV), JSON booleans (NDJSON)
+    NULL             empty field (CSV), null (NDJSON)
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+import config
+from database import FLIGHT_COLUMNS
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_COLUMNS = list(FLIGHT_COLUMNS)
+
+
+def export_value(value):
+    """Plain CSV/JSON value of a database value"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def csv_value(value) -> str:
+    value = export_value(value)
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def csv_lines(rows: List[Dict], columns: List[str]) -> str:
+    """CSV text of a chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows([csv_value(row[column]) for column in columns] for row in rows)
+    return buffer.getvalue()
+
+
+def ndjson_lines(rows: List[Dict], columns: List[str]) -> str:
+    """One JSON object per row"""
+    return ''.join(
+        json.dumps({column: export_value(row[column]) for column in columns},
+                   ensure_ascii=False, separators=(',', ':')) + '\n'
+        for row in rows
+    )
+
+
+def export_days(start_date: date, end_date: date) -> Iterator[date]:
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def stream_flights(db, fmt: str, start_date: date, end_date: date,
+                   airline_code: Optional[str] = None, flight_direction: Optional[str] = None,
+                   destination: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Export body, generated chunk by chunk
+
+    Args:
+        db: StorageBackend to read from
+        fmt: 'csv' or 'ndjson'
+        start_date: First schedule date
+        end_date: Last schedule date
+        airline_code: Airline filter
+        flight_direction: 'A' or 'D'
+        destination: Airport code on the route
+    """
+    columns = EXPORT_COLUMNS
+    format_rows = csv_lines if fmt == 'csv' else ndjson_lines
+    if fmt == 'csv':
+        yield (','.join(columns) + '\n').encode('utf-8')
+
+    chunk_size = config.EXPORT_SETTINGS['chunk_size']
+    # The shared read connection cannot serve other requests while an
+    # unbuffered cursor is open, so the export reads on its own connection
+    connection = db.open_read_connection()
+    try:
+        for day in export_days(start_date, end_date):
+            day_text = day.isoformat()
+            for rows in db.iter_flights(day_text, day_text, airline_code, flight_direction,
+                                        columns=columns, chunk_size=chunk_size, as_frames=False,
+                                        destination=destination, connection=connection):
+                yield format_rows(rows, columns).encode('utf-8')
+    finally:
+        # Also runs when the client disconnects (the server closes the generator)
+        connection.close()
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings for the web API (read automatically from the working directory)
+
+The hooks keep the Prometheus metrics of metrics.py correct across worker
+processes: the values of an earlier run are removed when the server starts,
+and the live gauges (requests in progress, pools, connections) of a worker are
+dropped when it exits, e.g. after a reload (SIGHUP) or a crash.
+"""
+
+
+def on_starting(server):
+    import metrics
+    metrics.clear_multiproc_dir()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
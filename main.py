@@ -7,7 +7,9 @@ from datetime import datetime, timedelta
 from schiphol_api import SchipholAPIClient
 from data_processor import FlightDataProcessor
 from visualizer import ReliabilityVisualizer
-from database import DatabaseManager
+from storage import create_storage_backend
+from collection_logger import get_collection_logger
+import config
 
 
 def collect_data(days_back: int = 0, days_forward: int = 0, max_pages: int = None):
@@ -58,23 +60,18 @@ def collect_data(days_back: int = 0, days_forward: int = 0, max_pages: int = Non
     
     dep_execution_time = time.time() - dep_start_time
     
-    # Log departures collection to database
-    try:
-        with DatabaseManager() as db:
-            db.create_tables()  # Ensure tables exist
-            db.log_collection(
-                operation_type='collect',
-                flight_direction='D',
-                date_range_start=start_date,
-                date_range_end=end_date,
-                records_collected=len(departures),
-                status=dep_status,
-                error_message=dep_error,
-                execution_time=dep_execution_time,
-                notes=f"Collected via Schiphol API (days_back={days_back}, days_forward={days_forward})"
-            )
-    except Exception as e:
-        print(f"Warning: Could not log to database: {e}")
+    # Log departures collection to database (written in the background)
+    get_collection_logger().log(
+        operation_type='collect',
+        flight_direction='D',
+        date_range_start=start_date,
+        date_range_end=end_date,
+        records_collected=len(departures),
+        status=dep_status,
+        error_message=dep_error,
+        execution_time=dep_execution_time,
+        notes=f"Collected via Schiphol API (days_back={days_back}, days_forward={days_forward})"
+    )
     
     # Collect arrivals
     print("\n--- COLLECTING ARRIVALS ---")
@@ -100,22 +97,18 @@ def collect_data(days_back: int = 0, days_forward: int = 0, max_pages: int = Non
     
     arr_execution_time = time.time() - arr_start_time
     
-    # Log arrivals collection to database
-    try:
-        with DatabaseManager() as db:
-            db.log_collection(
-                operation_type='collect',
-                flight_direction='A',
-                date_range_start=start_date,
-                date_range_end=end_date,
-                records_collected=len(arrivals),
-                status=arr_status,
-                error_message=arr_error,
-                execution_time=arr_execution_time,
-                notes=f"Collected via Schiphol API (days_back={days_back}, days_forward={days_forward})"
-            )
-    except Exception as e:
-        print(f"Warning: Could not log to database: {e}")
+    # Log arrivals collection to database (written in the background)
+    get_collection_logger().log(
+        operation_type='collect',
+        flight_direction='A',
+        date_range_start=start_date,
+        date_range_end=end_date,
+        records_collected=len(arrivals),
+        status=arr_status,
+        error_message=arr_error,
+        execution_time=arr_execution_time,
+        notes=f"Collected via Schiphol API (days_back={days_back}, days_forward={days_forward})"
+    )
     
     print("\n" + "=" * 80)
     print(f"DATA COLLECTION COMPLETE")
@@ -127,7 +120,8 @@ def collect_data(days_back: int = 0, days_forward: int = 0, max_pages: int = Non
 
 
 
-def process_data(flight_type: str, date_range: str, save_to_db: bool = True):
+def process_data(flight_type: str, date_range: str, save_to_db: bool = True,
+                 ingest_mode: str = None):
     """
     Process collected flight data
     
@@ -135,6 +129,9 @@ def process_data(flight_type: str, date_range: str, save_to_db: bool = True):
         flight_type: 'departures' or 'arrivals'
         date_range: Date range string (e.g., '2024-01-01_to_2024-01-07')
         save_to_db: Whether to save data to database (default: True)
+        ingest_mode: 'direct' (upsert into flights), 'staged' (load a staging
+            table and merge it per day) or 'deferred' (load a staging table and
+            leave the merge to 'main.py merge-staged'). Default from config.
     """
     import time
     
@@ -187,12 +184,23 @@ def process_data(flight_type: str, date_range: str, save_to_db: bool = True):
         if save_to_db:
             try:
                 print("\n--- SAVING TO DATABASE ---")
-                with DatabaseManager() as db:
+                with create_storage_backend() as db:
                     # Create tables if they don't exist
                     db.create_tables()
                     
                     # Save flight data
-                    db.save_flights(df)
+                    mode = ingest_mode or config.INGEST_SETTINGS['mode']
+                    if mode == 'direct':
+                        db.save_flights(df)
+                    else:
+                        stage_table = db.stage_flights(df)
+                        if stage_table and mode == 'staged':
+                            db.merge_staged_flights(
+                                stage_table,
+                                pause_seconds=config.INGEST_SETTINGS['merge_pause_seconds']
+                            )
+                        elif stage_table:
+                            print(f"Merge deferred; run 'python main.py merge-staged' to publish {stage_table}")
                     
                     # Extract date range for statistics
                     dates = date_range.split('_to_')
@@ -221,27 +229,23 @@ def process_data(flight_type: str, date_range: str, save_to_db: bool = True):
     
     execution_time = time.time() - start_time
     
-    # Log processing to database
-    try:
-        dates = date_range.split('_to_')
-        start_date = dates[0]
-        end_date = dates[1] if len(dates) > 1 else dates[0]
-        flight_dir = 'D' if flight_type == 'departures' else 'A'
-        
-        with DatabaseManager() as db:
-            db.log_collection(
-                operation_type='process',
-                flight_direction=flight_dir,
-                date_range_start=start_date,
-                date_range_end=end_date,
-                records_processed=records_processed,
-                status=process_status,
-                error_message=process_error,
-                execution_time=execution_time,
-                notes=f"Processed {flight_type} data, saved_to_db={save_to_db}"
-            )
-    except Exception as e:
-        print(f"Warning: Could not log processing to database: {e}")
+    # Log processing to database (written in the background)
+    dates = date_range.split('_to_')
+    start_date = dates[0]
+    end_date = dates[1] if len(dates) > 1 else dates[0]
+    flight_dir = 'D' if flight_type == 'departures' else 'A'
+    
+    get_collection_logger().log(
+        operation_type='process',
+        flight_direction=flight_dir,
+        date_range_start=start_date,
+        date_range_end=end_date,
+        records_processed=records_processed,
+        status=process_status,
+        error_message=process_error,
+        execution_time=execution_time,
+        notes=f"Processed {flight_type} data, saved_to_db={save_to_db}"
+    )
     
     print("\n" + "=" * 80)
     print("PROCESSING COMPLETE")
@@ -250,6 +254,71 @@ def process_data(flight_type: str, date_range: str, save_to_db: bool = True):
     return df, airline_stats
 
 
+def merge_staged(window: str = None, pause_seconds: float = None):
+    """
+    Merge all pending staging tables into the flights table
+    
+    Args:
+        window: Optional local time window 'HH:MM-HH:MM'; outside it nothing is merged
+        pause_seconds: Pause between per-day merge transactions (default from config)
+    """
+    print("=" * 80)
+    print("MERGING STAGED FLIGHTS")
+    print("=" * 80)
+    
+    if window:
+        start_str, end_str = window.split('-')
+        now = datetime.now().strftime('%H:%M')
+        inside = start_str <= now < end_str if start_str <= end_str else (now >= start_str or now < end_str)
+        if not inside:
+            print(f"Outside merge window {window} (now {now}); nothing merged")
+            return
+    
+    if pause_seconds is None:
+        pause_seconds = config.INGEST_SETTINGS['merge_pause_seconds']
+    
+    with create_storage_backend() as db:
+        tables = db.list_staged_tables()
+        if not tables:
+            print("No staged flights to merge")
+        for table in tables:
+            db.merge_staged_flights(table, pause_seconds=pause_seconds)
+
+
+def load_reference_data():
+    """Load airports (with countries/continents) and aircraft types into the database"""
+    import json
+    import os
+    
+    print("=" * 80)
+    print("LOADING REFERENCE DATA")
+    print("=" * 80)
+    
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    destinations = []
+    for filename in ('destinations_full.json', 'destinations_full.json.bak'):
+        path = os.path.join(base_dir, filename)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                destinations = json.load(f)
+            print(f"Read {len(destinations)} destinations from {filename}")
+            break
+    else:
+        print("Warning: destinations_full.json not found; run fetch_destinations.py first")
+    
+    aircraft_types = []
+    aircraft_path = os.path.join(base_dir, 'aircraft_types.json')
+    if os.path.exists(aircraft_path):
+        with open(aircraft_path, 'r', encoding='utf-8') as f:
+            aircraft_types = json.load(f)
+        print(f"Read {len(aircraft_types)} aircraft types from aircraft_types.json")
+    
+    with create_storage_backend() as db:
+        db.create_tables()
+        db.create_reference_tables()
+        db.load_reference_data(destinations, aircraft_types)
+
+
 def visualize_data(flight_type: str, date_range: str):
     """
     Create visualizations for processed data
@@ -371,6 +440,8 @@ def main():
     process_parser.add_argument('date_range', help='Date range (e.g., 2024-01-01_to_2024-01-07)')
     process_parser.add_argument('--no-db', action='store_true',
                                help='Skip saving to database (CSV only)')
+    process_parser.add_argument('--ingest-mode', choices=['direct', 'staged', 'deferred'], default=None,
+                               help='How flights are written to the database (default from config)')
     
     # Visualize command
     viz_parser = subparsers.add_parser('visualize', help='Create visualizations')
@@ -392,12 +463,57 @@ def main():
     # Database test command
     db_test_parser = subparsers.add_parser('db-test', help='Test database connection')
     
+    # Schema migration command
+    migrate_parser = subparsers.add_parser('migrate', help='Apply pending database schema migrations')
+    migrate_parser.add_argument('--explain', action='store_true',
+                               help='Write EXPLAIN/timing reports of the web API queries before and after')
+    
+    # Staged merge command
+    merge_parser = subparsers.add_parser('merge-staged', help='Merge staged flights into the flights table')
+    merge_parser.add_argument('--window', default=None,
+                             help='Only merge inside this local time window (e.g. 02:00-05:00)')
+    merge_parser.add_argument('--pause', type=float, default=None,
+                             help='Seconds to pause between per-day merge transactions')
+    
+    # Daily statistics rebuild command
+    rebuild_parser = subparsers.add_parser('rebuild-stats', help='Rebuild the airline_daily_stats aggregates from flights')
+    
+    # Reference data command
+    reference_parser = subparsers.add_parser('load-reference',
+                                             help='Load airports and aircraft types from the reference JSON files')
+    
+    # Query statistics report command
+    query_report_parser = subparsers.add_parser('query-report',
+                                                help='Summarize statement timings recorded by all processes')
+    query_report_parser.add_argument('--top', type=int, default=20,
+                                     help='Number of statements to show')
+    query_report_parser.add_argument('--sort', choices=['total', 'p95', 'max', 'count', 'rows'], default='total',
+                                     help='Order statements by this measure')
+    query_report_parser.add_argument('--reset', action='store_true',
+                                     help='Delete the collected statistics after reporting')
+    
+    # Partition maintenance command
+    partitions_parser = subparsers.add_parser('partitions', help='Maintain monthly partitions of the flights table')
+    partitions_parser.add_argument('--months-ahead', type=int, default=None,
+                                  help='Future monthly partitions to pre-create')
+    partitions_parser.add_argument('--retain-months', type=int, default=None,
+                                  help='Archive and drop partitions older than this many months')
+    partitions_parser.add_argument('--archive', metavar='PARTITION', default=None,
+                                  help='Archive and drop a single partition (e.g. p202501)')
+    
+    # Mapping file command
+    mappings_parser = subparsers.add_parser('build-mappings',
+                                            help='Compile the airline/destination mapping JSON files for the web API')
+    mappings_parser.add_argument('--output', default=None,
+                                 help='Mapping file to write (default: config.MAPPING_STORE_SETTINGS path)')
+    
     args = parser.parse_args()
     
     if args.command == 'collect':
         collect_data(args.days_back, args.days_forward, args.max_pages)
     elif args.command == 'process':
-        process_data(args.flight_type, args.date_range, save_to_db=not args.no_db)
+        process_data(args.flight_type, args.date_range, save_to_db=not args.no_db,
+                     ingest_mode=args.ingest_mode)
     elif args.command == 'visualize':
         visualize_data(args.flight_type, args.date_range)
     elif args.command == 'analyze':
@@ -407,7 +523,7 @@ def main():
         print("DATABASE CONNECTION TEST")
         print("=" * 80)
         try:
-            with DatabaseManager() as db:
+            with create_storage_backend() as db:
                 print("\nCreating/verifying tables...")
                 db.create_tables()
                 print("\n[OK] Database connection successful!")
@@ -415,6 +531,46 @@ def main():
         except Exception as e:
             print(f"\n[ERROR] Database connection failed: {e}")
             print("=" * 80)
+    elif args.command == 'migrate':
+        from migrations import run_migrations
+        print("=" * 80)
+        print("DATABASE MIGRATIONS")
+        print("=" * 80)
+        with create_storage_backend() as db:
+            run_migrations(db, explain=args.explain)
+    elif args.command == 'merge-staged':
+        merge_staged(args.window, args.pause)
+    elif args.command == 'rebuild-stats':
+        print("=" * 80)
+        print("REBUILDING AIRLINE DAILY STATISTICS")
+        print("=" * 80)
+        with create_storage_backend() as db:
+            db.create_tables()
+            db.rebuild_daily_stats()
+    elif args.command == 'query-report':
+        import query_stats
+        print(query_stats.format_report(
+            query_stats.collect_summary(args.sort, include_current=False), args.top
+        ))
+        if args.reset:
+            print(f"Removed {query_stats.reset_snapshots()} statistics snapshot(s)")
+    elif args.command == 'load-reference':
+        load_reference_data()
+    elif args.command == 'partitions':
+        import partitions
+        print("=" * 80)
+        print("FLIGHTS PARTITION MAINTENANCE")
+        print("=" * 80)
+        with create_storage_backend() as db:
+            if db.dialect != 'mariadb':
+                print(f"Partitioning is not supported by the {db.dialect} backend")
+            elif args.archive:
+                partitions.archive_partition(db, args.archive)
+            else:
+                partitions.maintain_partitions(db, args.months_ahead, args.retain_months)
+    elif args.command == 'build-mappings':
+        import mapping_store
+        mapping_store.build_from_sources(args.output)
     else:
         parser.print_help()
 
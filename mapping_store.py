@@ -0,0 +1,300 @@
+"""
+Mapping Store
+Read-only lookup tables (airline and destination names) in one compact binary
+file that every web worker memory-maps.
+
+The JSON mapping files become dicts of tens of thousands of Python objects in
+every worker. Here they are compiled into sorted key/value blobs; workers map
+the file read-only, so the operating system keeps a single copy in the page
+cache for all workers, and look keys up with a binary search over the sorted
+keys.
+
+File layout (little endian):
+
+    header      b'AMAP', format version (u16), table count (u16)
+    directory   per table: name (32 bytes, NUL padded), entry count (u32),
+                offsets of the key offsets, key data, value offsets and
+                value data (4 x u32)
+    tables      per table: (count + 1) u32 key offsets, UTF-8 keys sorted
+                bytewise, (count + 1) u32 value offsets, UTF-8 values
+
+The file is rebuilt from the JSON sources with `python main.py build-mappings`
+(also done automatically when it is missing or older than a source). Builds
+write a temporary file and rename it over the old one, so workers that still
+map the old file are not affected; they pick up the new file on their next
+check (see MappingStore.refresh).
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import config
+
+
+MAGIC = b'AMAP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHH')
+DIRECTORY_ENTRY = struct.Struct('<32sIIIII')
+OFFSET_PAIR = struct.Struct('<II')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Table name -> JSON source file (an object of string keys and string values).
+# destinations_full.json is not a source: it is a list of airport records that
+# load-reference imports into the airports table, and the web API reads those
+# details from the DestinationCatalog (destination_catalog.py) instead.
+MAPPING_SOURCES = {
+    'airlines': os.path.join(BASE_DIR, 'airline_mapping.json'),
+    'destinations': os.path.join(BASE_DIR, 'destination_mapping.json'),
+}
+
+
+def _pack_strings(strings) -> Tuple[bytes, bytes]:
+    """Offsets array and concatenated UTF-8 data of a list of strings"""
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return struct.pack(f'<{len(offsets)}I', *offsets), b''.join(encoded)
+
+
+def build_mapping_file(tables: Dict[str, Dict[str, str]], path: str) -> int:
+    """
+    Write lookup tables to a mapping file (atomically replacing it)
+
+    Args:
+        tables: Table name -> {key: value}
+        path: Output file
+
+    Returns:
+        Size of the file in bytes
+    """
+    directory_size = HEADER.size + DIRECTORY_ENTRY.size * len(tables)
+    entries = []
+    blobs = []
+    position = directory_size
+    for name, mapping in tables.items():
+        items = sorted(((str(key).encode('utf-8'), str(value)) for key, value in mapping.items()),
+                       key=lambda item: item[0])
+        key_offsets, key_data = _pack_strings(key.decode('utf-8') for key, _ in items)
+        value_offsets, value_data = _pack_strings(value for _, value in items)
+
+        sections = []
+        for blob in (key_offsets, key_data, value_offsets, value_data):
+            sections.append(position)
+            blobs.append(blob)
+            position += len(blob)
+        entries.append(DIRECTORY_ENTRY.pack(name.encode('utf-8')[:32], len(items), *sections))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.mappings-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(tables)))
+            f.writelines(entries)
+            f.writelines(blobs)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return position
+
+
+def load_sources() -> Dict[str, Dict[str, str]]:
+    """Read the JSON mapping files (MAPPING_SOURCES); missing files become empty tables"""
+    tables = {}
+    for name, source in MAPPING_SOURCES.items():
+        if os.path.exists(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                tables[name] = json.load(f)
+        else:
+            print(f"Warning: mapping source not found: {source}")
+            tables[name] = {}
+    return tables
+
+
+def build_from_sources(path: Optional[str] = None) -> int:
+    """
+    Compile the JSON mapping files into the mapping file
+
+    Returns:
+        Size of the file in bytes
+    """
+    path = path or config.MAPPING_STORE_SETTINGS['path']
+    tables = load_sources()
+    size = build_mapping_file(tables, path)
+    counts = ', '.join(f"{len(mapping)} {name}" for name, mapping in tables.items())
+    print(f"Built mapping file {path} ({size:,} bytes: {counts})")
+    return size
+
+
+class MappingTable:
+    """
+    One read-only table of a mapped file; supports the dict lookups the web
+    API uses (get, in, [], len)
+    """
+
+    def __init__(self, buffer: mmap.mmap, count: int, key_offsets: int, key_data: int,
+                 value_offsets: int, value_data: int):
+        self._buffer = buffer
+        self._count = count
+        self._key_offsets = key_offsets
+        self._key_data = key_data
+        self._value_offsets = value_offsets
+        self._value_data = value_data
+
+    def _key(self, index: int) -> bytes:
+        start, end = OFFSET_PAIR.unpack_from(self._buffer, self._key_offsets + 4 * index)
+        return self._buffer[self._key_data + start:self._key_data + end]
+
+    def _value(self, index: int) -> str:
+        start, end = OFFSET_PAIR.unpack_from(self._buffer, self._value_offsets + 4 * index)
+        return self._buffer[self._value_data + start:self._value_data + end].decode('utf-8')
+
+    def _find(self, key) -> int:
+        """Index of a key, or -1"""
+        if not isinstance(key, str):
+            return -1
+        target = key.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == target:
+            return low
+        return -1
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        return self._value(index) if index >= 0 else default
+
+    def __getitem__(self, key) -> str:
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._value(index)
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        for index in range(self._count):
+            yield self._key(index).decode('utf-8'), self._value(index)
+
+
+def open_mapping_file(path: str) -> Dict[str, MappingTable]:
+    """Map a mapping file read-only and return its tables"""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, table_count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} mapping file")
+
+    tables = {}
+    for i in range(table_count):
+        name, count, *sections = DIRECTORY_ENTRY.unpack_from(buffer, HEADER.size + i * DIRECTORY_ENTRY.size)
+        tables[name.rstrip(b'\0').decode('utf-8')] = MappingTable(buffer, count, *sections)
+    return tables
+
+
+class MappingStore:
+    """The current mapping file of this process, reopened when it is rebuilt"""
+
+    def __init__(self, path: Optional[str] = None, check_interval: Optional[float] = None,
+                 auto_build: bool = True):
+        """
+        Args:
+            path: Mapping file (default from config)
+            check_interval: Seconds between checks for a rebuilt file
+            auto_build: Build the file when it is missing or older than a source
+        """
+        settings = config.MAPPING_STORE_SETTINGS
+        self.path = path or settings['path']
+        self.check_interval = check_interval if check_interval is not None else settings['check_interval']
+        self.auto_build = auto_build
+        self._tables: Dict[str, MappingTable] = {}
+        self._file_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _stale(self) -> bool:
+        """Whether the file is missing or older than one of its sources"""
+        try:
+            built = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return True
+        return any(os.path.exists(source) and os.stat(source).st_mtime > built
+                   for source in MAPPING_SOURCES.values())
+
+    def refresh(self, force: bool = False):
+        """
+        (Re)open the file if it was rebuilt since it was mapped; checked at most
+        every check_interval seconds unless forced
+        """
+        now = time.monotonic()
+        if not force and self._file_id is not None and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                if self.auto_build and self._stale():
+                    build_from_sources(self.path)
+                stat = os.stat(self.path)
+                file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if file_id == self._file_id:
+                    return
+                # Requests still using the old tables keep their mapping alive
+                self._tables = open_mapping_file(self.path)
+                if self._file_id is not None:
+                    print(f"Reloaded mapping file {self.path}")
+                self._file_id = file_id
+            except Exception as e:
+                print(f"Error loading mapping file {self.path}: {e}")
+                if self._file_id is None:
+                    # Never mapped: serve the JSON files from process memory
+                    self._tables = load_sources()
+                    self._file_id = ('json',)
+
+    def table(self, name: str) -> MappingTable:
+        """Current version of a table (an empty dict if the file has no such table)"""
+        self.refresh()
+        return self._tables.get(name, {})
+
+
+class MappingView:
+    """Dict-like access to one table of a store that follows reloads"""
+
+    def __init__(self, store: MappingStore, name: str):
+        self.store = store
+        self.name = name
+
+    def get(self, key, default=None):
+        return self.store.table(self.name).get(key, default)
+
+    def __getitem__(self, key) -> str:
+        return self.store.table(self.name)[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.store.table(self.name)
+
+    def __len__(self) -> int:
+        return len(self.store.table(self.name))
+
+
+if __name__ == "__main__":
+    build_from_sources()
@@ -0,0 +1,209 @@
+"""
+Metrics
+Prometheus metrics of the web API, served in the text format at /metrics.
+
+    airlines_http_requests_total{route,method,status}             requests handled
+    airlines_http_request_duration_seconds{route,method,status}   time until the response starts
+    airlines_http_requests_in_progress                            requests being handled now
+    airlines_db_time_per_request_seconds{route}                   database time of one request
+    airlines_db_query_duration_seconds{fingerprint}               time of one statement
+    airlines_response_cache_total{route,result}                   response cache hits / misses
+    airlines_thread_pool_size{pool}, airlines_thread_pool_busy{pool}
+    airlines_db_connections                                       open database connections
+
+Routes are labelled with their URL rule (/api/airlines/<airline_code>/flights),
+statements with their query_stats fingerprint (see `python main.py
+query-report` for the statement text). Sub-requests of /api/batch are counted
+under their own route; their database time also counts for the batch.
+
+Gunicorn runs several worker processes, each with its own counters. The
+prometheus_client multiprocess mode makes every process write its values to
+files in METRICS_SETTINGS['multiproc_dir'], and /metrics adds up the files of
+all workers, so a scrape reports the whole service no matter which worker
+answers it. gunicorn.conf.py empties the directory when the server starts
+and removes the gauges of workers that exit.
+
+prometheus_client is optional; without it (or with METRICS_ENABLED=false)
+install() does nothing and /metrics answers 503.
+"""
+import contextlib
+import contextvars
+import glob
+import os
+import re
+import shutil
+import time
+from typing import Optional
+
+from flask import request
+
+import config
+
+settings = config.METRICS_SETTINGS
+
+# The multiprocess mode is chosen when prometheus_client is imported
+if settings['enabled']:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', settings['multiproc_dir'])
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+available = settings['enabled'] and prometheus_client is not None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request being measured in this context; pool threads see it through run_concurrently
+_current_request: contextvars.ContextVar = contextvars.ContextVar('metrics_request', default=None)
+
+if available:
+    buckets = settings['latency_buckets']
+    REQUESTS = prometheus_client.Counter(
+        'airlines_http_requests_total', 'HTTP requests handled', ['route', 'method', 'status'])
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        'airlines_http_request_duration_seconds', 'Time until the response starts',
+        ['route', 'method', 'status'], buckets=buckets)
+    IN_PROGRESS = prometheus_client.Gauge(
+        'airlines_http_requests_in_progress', 'Requests being handled', multiprocess_mode='livesum')
+    REQUEST_DB_TIME = prometheus_client.Histogram(
+        'airlines_db_time_per_request_seconds', 'Database time of one request', ['route'], buckets=buckets)
+    QUERY_LATENCY = prometheus_client.Histogram(
+        'airlines_db_query_duration_seconds', 'Execution time of one statement', ['fingerprint'],
+        buckets=buckets)
+    CACHE_RESULTS = prometheus_client.Counter(
+        'airlines_response_cache_total', 'Response cache lookups', ['route', 'result'])
+    POOL_SIZE = prometheus_client.Gauge(
+        'airlines_thread_pool_size', 'Threads per pool', ['pool'], multiprocess_mode='livesum')
+    POOL_BUSY = prometheus_client.Gauge(
+        'airlines_thread_pool_busy', 'Busy threads per pool', ['pool'], multiprocess_mode='livesum')
+    DB_CONNECTIONS = prometheus_client.Gauge(
+        'airlines_db_connections', 'Open database connections', multiprocess_mode='livesum')
+
+
+def install(app, db=None):
+    """
+    Measure the requests of a Flask app
+
+    Args:
+        app: Flask app
+        db: StorageBackend whose open connections are reported
+    """
+    if not available:
+        return
+    import query_stats
+
+    remove_dead_processes()
+    query_stats.add_observer(record_query)
+
+    @app.before_request
+    def start_request():
+        outer = _current_request.get()
+        state = {'start': time.perf_counter(), 'db_seconds': [], 'nested': outer is not None}
+        state['token'] = _current_request.set(state)
+        if not state['nested']:
+            IN_PROGRESS.inc()
+        request.environ['airlines.metrics'] = state
+
+    @app.after_request
+    def record_request(response):
+        state = request.environ.get('airlines.metrics')
+        if state is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = str(response.status_code)
+        REQUESTS.labels(route, request.method, status).inc()
+        REQUEST_LATENCY.labels(route, request.method, status).observe(time.perf_counter() - state['start'])
+        REQUEST_DB_TIME.labels(route).observe(sum(state['db_seconds']))
+        cache = response.headers.get('X-Cache')
+        if cache:
+            CACHE_RESULTS.labels(route, cache.lower()).inc()
+        if db is not None:
+            DB_CONNECTIONS.set(db.open_connection_count())
+        return response
+
+    @app.teardown_request
+    def finish_request(exc=None):
+        state = request.environ.pop('airlines.metrics', None)
+        if state is None:
+            return
+        try:
+            _current_request.reset(state['token'])
+        except ValueError:
+            # Torn down in another context than it started in
+            pass
+        if state['nested']:
+            outer = _current_request.get()
+            if outer is not None:
+                outer['db_seconds'].append(sum(state['db_seconds']))
+        else:
+            IN_PROGRESS.dec()
+
+
+def record_query(fingerprint: str, elapsed_ms: float):
+    """query_stats observer: time one statement and add it to the current request"""
+    seconds = elapsed_ms / 1000.0
+    QUERY_LATENCY.labels(fingerprint).observe(seconds)
+    state = _current_request.get()
+    if state is not None:
+        # list.append is atomic, so pool threads of the request can add concurrently
+        state['db_seconds'].append(seconds)
+
+
+def set_pool_size(pool: str, size: int):
+    """Report the size of a thread pool of this process"""
+    if available:
+        POOL_SIZE.labels(pool).set(size)
+
+
+def pool_task(pool: str):
+    """Context manager that counts a thread of the pool as busy"""
+    if not available:
+        return contextlib.nullcontext()
+    return POOL_BUSY.labels(pool).track_inprogress()
+
+
+def render() -> Optional[bytes]:
+    """Metrics of all worker processes in the Prometheus text format (None when unavailable)"""
+    if not available:
+        return None
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry)
+
+
+def mark_process_dead(pid: int):
+    """Drop the live gauges (in-progress requests, pools, connections) of an exited process"""
+    if available:
+        multiprocess.mark_process_dead(pid)
+
+
+def remove_dead_processes():
+    """
+    Drop live gauges left behind by processes that are no longer running
+    (servers without a child_exit hook, such as uvicorn or the dev server)
+    """
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    pids = set()
+    for path in glob.glob(os.path.join(directory, 'gauge_live*_*.db')):
+        match = re.search(r'_(\d+)\.db$', path)
+        if match:
+            pids.add(int(match.group(1)))
+    for pid in pids:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid)
+        except PermissionError:
+            # Running under another user
+            pass
+
+
+def clear_multiproc_dir():
+    """Remove the values of earlier runs (called when the server starts)"""
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR', settings['multiproc_dir'])
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
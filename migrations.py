@@ -0,0 +1,357 @@
+"""
+Schema Migrations
+Versioned, one-off schema changes and data backfills for the flights database.
+
+Applied versions are recorded in the schema_migrations table, so running the
+migrations again only executes the steps that are still pending:
+
+    python main.py migrate [--explain]
+    python migrations.py [--explain]
+
+With --explain, the EXPLAIN plan and timing of every web API query shape is
+written to the reports directory before and after the pending migrations run.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+from database import DatabaseManager
+import config
+
+
+# Rows copied per transaction during backfills
+BACKFILL_BATCH_SIZE = 5000
+
+
+def ensure_migrations_table(db: DatabaseManager):
+    """Create the schema_migrations bookkeeping table if needed"""
+    with db.connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+    db.connection.commit()
+
+
+def get_applied_versions(db: DatabaseManager) -> set:
+    """Return the set of migration versions already applied"""
+    with db.connection.cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row['version'] for row in cursor.fetchall()}
+
+
+def migrate_001_flight_destinations(db: DatabaseManager):
+    """
+    Backfill flight_destinations from the comma-joined flights.destinations
+
+    Walks the flights table in primary key order so every batch is a short
+    range scan, committing after each batch.
+    """
+    last_id = 0
+    total = 0
+
+    while True:
+        with db.connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, destinations
+                FROM flights
+                WHERE id > %s
+                  AND destinations IS NOT NULL
+                  AND destinations != ''
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, BACKFILL_BATCH_SIZE))
+            rows = cursor.fetchall()
+
+            if not rows:
+                break
+
+            destination_rows = []
+            for row in rows:
+                destination_rows.extend(db.destination_rows(row['id'], row['destinations']))
+
+            if destination_rows:
+                cursor.executemany("""
+                    INSERT IGNORE INTO flight_destinations (flight_id, seq, iata_code)
+                    VALUES (%s, %s, %s)
+                """, destination_rows)
+
+        db.connection.commit()
+        last_id = rows[-1]['id']
+        total += len(rows)
+        print(f"  Backfilled destinations for {total} flights (last id {last_id})")
+
+
+def migrate_002_covering_indexes(db: DatabaseManager):
+    """
+    Add composite covering indexes for the web API query shapes
+
+    The rankings/stats/trend queries filter on a schedule_date range plus
+    actual_time and flight_direction and group by airline_code; these indexes
+    let them run as index-only range scans. aircraft_type_norm is a stored,
+    trimmed copy of aircraft_type (in the aircraft_types collation) so the
+    aircraft endpoints no longer need TRIM() on the column.
+    """
+    with db.connection.cursor() as cursor:
+        cursor.execute("""
+            ALTER TABLE flights
+                ADD COLUMN IF NOT EXISTS aircraft_type_norm VARCHAR(10)
+                    CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+                    AS (NULLIF(TRIM(aircraft_type), '')) STORED,
+                ADD INDEX IF NOT EXISTS idx_date_dir_airline (schedule_date, flight_direction, airline_code,
+                                                              on_time, delay_minutes, actual_time),
+                ADD INDEX IF NOT EXISTS idx_airline_date (airline_code, schedule_date, actual_time,
+                                                          on_time, delay_minutes),
+                ADD INDEX IF NOT EXISTS idx_dir_date_dest (flight_direction, schedule_date, destinations),
+                ADD INDEX IF NOT EXISTS idx_date_aircraft (schedule_date, aircraft_type_norm),
+                ADD INDEX IF NOT EXISTS idx_aircraft_date (aircraft_type_norm, schedule_date, airline_code),
+                DROP INDEX IF EXISTS idx_airline_code,
+                DROP INDEX IF EXISTS idx_schedule_date
+        """)
+    db.connection.commit()
+
+
+def migrate_003_partition_flights(db: DatabaseManager):
+    """
+    Partition the flights table by schedule_date month
+
+    Rebuilds the table; see partitions.partition_flights_table.
+    """
+    from partitions import partition_flights_table
+    partition_flights_table(db)
+
+
+def migrate_004_airline_daily_stats(db: DatabaseManager):
+    """Populate airline_daily_stats from the existing flights"""
+    db.rebuild_daily_stats()
+
+
+def migrate_005_row_fingerprint(db: DatabaseManager):
+    """
+    Add the row_fingerprint column used to skip unchanged upserts
+
+    Existing rows start without a fingerprint and are rewritten once, the
+    next time they are collected.
+    """
+    with db.connection.cursor() as cursor:
+        cursor.execute("""
+            ALTER TABLE flights
+                ADD COLUMN IF NOT EXISTS row_fingerprint CHAR(32) CHARACTER SET ascii
+        """)
+    db.connection.commit()
+
+
+def migrate_006_airline_keyset_index(db: DatabaseManager):
+    """
+    Add the index behind the keyset paging of /api/airlines/<code>/flights
+
+    Pages are read newest first by (schedule_date, schedule_time, id) for one
+    airline; with this index each page is a short backward range scan, however
+    deep it is.
+    """
+    with db.connection.cursor() as cursor:
+        cursor.execute("""
+            ALTER TABLE flights
+                ADD INDEX IF NOT EXISTS idx_airline_date_time (airline_code, schedule_date, schedule_time, id)
+        """)
+    db.connection.commit()
+
+
+# Ordered list of (version, description, function)
+MIGRATIONS: List[Tuple[int, str, Callable[[DatabaseManager], None]]] = [
+    (1, 'Backfill flight_destinations junction table', migrate_001_flight_destinations),
+    (2, 'Covering indexes and normalized aircraft type column', migrate_002_covering_indexes),
+    (3, 'Monthly RANGE partitioning of flights by schedule_date', migrate_003_partition_flights),
+    (4, 'Build airline_daily_stats aggregates', migrate_004_airline_daily_stats),
+    (5, 'Row fingerprints for write-skipping upserts', migrate_005_row_fingerprint),
+    (6, 'Keyset paging index for airline flight lists', migrate_006_airline_keyset_index),
+]
+
+
+def endpoint_queries(aircraft_column: str) -> List[Tuple[str, str, tuple]]:
+    """
+    Representative query shapes of the web API endpoints
+
+    Args:
+        aircraft_column: Expression used for the trimmed aircraft type
+            ('aircraft_type_norm' once migration 002 is applied)
+
+    Returns:
+        List of (endpoint, SQL, parameters)
+    """
+    end = datetime.now()
+    today = end.strftime('%Y-%m-%d')
+    week_ago = (end - timedelta(days=7)).strftime('%Y-%m-%d')
+    month_ago = (end - timedelta(days=30)).strftime('%Y-%m-%d')
+
+    return [
+        ('/api/rankings', """
+            SELECT airline_code, COUNT(*) as total_flights,
+                   SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
+                   AVG(delay_minutes) as avg_delay
+            FROM flights
+            WHERE schedule_date BETWEEN %s AND %s
+              AND actual_time IS NOT NULL
+              AND flight_direction = 'D'
+            GROUP BY airline_code HAVING total_flights >= %s
+        """, (month_ago, today, 10)),
+        ('/api/rankings (trend)', """
+            SELECT schedule_date, COUNT(*) as total_flights,
+                   SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
+                   AVG(delay_minutes) as avg_delay
+            FROM flights
+            WHERE airline_code = %s
+              AND schedule_date BETWEEN %s AND %s
+              AND actual_time IS NOT NULL
+            GROUP BY schedule_date
+            ORDER BY schedule_date ASC
+        """, ('KL', month_ago, today)),
+        ('/api/stats', """
+            SELECT COUNT(*) as total_flights, COUNT(DISTINCT airline_code) as total_airlines,
+                   SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
+                   AVG(delay_minutes) as avg_delay
+            FROM flights
+            WHERE schedule_date BETWEEN %s AND %s
+              AND actual_time IS NOT NULL
+        """, (month_ago, today)),
+        ('/api/airlines/<code>/flights', """
+            SELECT id, flight_number, schedule_date, schedule_time, actual_time, delay_minutes,
+                   on_time, flight_status, destinations, flight_direction, terminal, gate
+            FROM flights
+            WHERE airline_code = %s
+              AND schedule_date BETWEEN %s AND %s
+            ORDER BY schedule_date DESC, schedule_time DESC, id DESC LIMIT %s
+        """, ('KL', week_ago, today, 101)),
+        ('/api/stats/destinations', """
+            SELECT destinations, COUNT(*) as flight_count
+            FROM flights
+            WHERE schedule_date BETWEEN %s AND %s
+              AND flight_direction = 'D'
+              AND destinations IS NOT NULL
+              AND destinations != ''
+            GROUP BY destinations
+            ORDER BY flight_count DESC
+            LIMIT %s
+        """, (week_ago, today, 10)),
+        ('/api/stats/aircraft', f"""
+            SELECT {aircraft_column} as aircraft_type, COUNT(*) as flight_count
+            FROM flights
+            WHERE schedule_date BETWEEN %s AND %s
+              AND {aircraft_column} IS NOT NULL
+            GROUP BY {aircraft_column}
+            ORDER BY flight_count DESC
+            LIMIT %s
+        """, (week_ago, today, 10)),
+        ('/api/stats/aircraft/<code>/airlines', f"""
+            SELECT airline_code, COUNT(*) as flight_count
+            FROM flights
+            WHERE {aircraft_column} = %s
+              AND schedule_date BETWEEN %s AND %s
+              AND airline_code IS NOT NULL
+            GROUP BY airline_code
+            ORDER BY flight_count DESC
+            LIMIT 20
+        """, ('73H', week_ago, today)),
+    ]
+
+
+def explain_endpoint_queries(db: DatabaseManager, label: str) -> str:
+    """
+    Record EXPLAIN output and timing of each endpoint query shape
+
+    Args:
+        db: Connected DatabaseManager
+        label: Report label (e.g. 'before' or 'after')
+
+    Returns:
+        Path of the written report
+    """
+    with db.connection.cursor() as cursor:
+        cursor.execute("SHOW COLUMNS FROM flights LIKE 'aircraft_type_norm'")
+        aircraft_column = 'aircraft_type_norm' if cursor.fetchone() else 'TRIM(aircraft_type)'
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filepath = os.path.join(config.REPORTS_DIR, f"explain_{label}_{timestamp}.txt")
+
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(f"EXPLAIN REPORT ({label}) - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("=" * 80 + "\n\n")
+
+        for endpoint, query, params in endpoint_queries(aircraft_column):
+            f.write(f"{endpoint}\n")
+            f.write("-" * 80 + "\n")
+            with db.connection.cursor() as cursor:
+                cursor.execute("EXPLAIN " + query, params)
+                for row in cursor.fetchall():
+                    f.write(
+                        f"  table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                        f"rows={row.get('rows')} extra={row.get('Extra')}\n"
+                    )
+
+                start = time.perf_counter()
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            f.write(f"  time={elapsed_ms:.1f} ms rows_returned={len(rows)}\n\n")
+
+    print(f"Saved EXPLAIN report to {filepath}")
+    return filepath
+
+
+def run_migrations(db: DatabaseManager, explain: bool = False) -> int:
+    """
+    Apply all pending migrations in version order
+
+    Args:
+        db: Connected DatabaseManager
+        explain: Record EXPLAIN reports before and after the pending migrations
+
+    Returns:
+        Number of migrations applied
+    """
+    # create_tables only creates tables that are missing entirely; existing
+    # databases are brought up to date by the migrations below
+    db.create_tables()
+    if db.dialect != 'mariadb':
+        # Other backends create their current schema directly
+        print(f"Schema migrations apply to MariaDB only; {db.dialect} schema is up to date")
+        return 0
+        
+    ensure_migrations_table(db)
+    applied = get_applied_versions(db)
+    pending = [m for m in MIGRATIONS if m[0] not in applied]
+
+    if explain and pending:
+        explain_endpoint_queries(db, 'before')
+
+    count = 0
+
+    for version, description, migration in pending:
+
+        print(f"Applying migration {version:03d}: {description}")
+        migration(db)
+
+        with db.connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+        db.connection.commit()
+        count += 1
+
+    if count:
+        print(f"Applied {count} migration(s)")
+        if explain:
+            explain_endpoint_queries(db, 'after')
+    else:
+        print("Database schema is up to date")
+    return count
+
+
+if __name__ == "__main__":
+    with DatabaseManager() as db:
+        run_migrations(db, explain='--explain' in sys.argv)
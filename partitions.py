@@ -0,0 +1,340 @@
+"""
+Flights Table Partitioning
+Monthly RANGE partitioning of the flights table by schedule_date, with
+maintenance of future partitions and archival/retention of old months.
+
+Queries that filter on a schedule_date window only touch the partitions of
+that window (partition pruning), and removing an old month is a metadata-only
+DROP PARTITION instead of a mass DELETE.
+
+Usage:
+    python main.py partitions                        # pre-create future partitions
+    python main.py partitions --retain-months 12     # also archive + drop older months
+    python main.py partitions --archive p202501      # archive + drop one partition
+"""
+import csv
+import gzip
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import pymysql
+
+from database import DatabaseManager
+import config
+
+
+def month_start(day: date) -> date:
+    """Return the first day of the month containing day"""
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    """Return the first day of the month that is `months` after day's month"""
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Partition name for a month, e.g. p202601"""
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month covered by a partition name, or None for pmax/unknown names"""
+    if len(name) != 7 or not name.startswith('p') or not name[1:].isdigit():
+        return None
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def partition_definition(month: date) -> str:
+    """SQL definition of the partition holding one month of flights"""
+    boundary = add_months(month, 1).strftime('%Y-%m-%d')
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{boundary}'))"
+
+
+def get_partitions(db: DatabaseManager) -> List[Dict]:
+    """
+    List the partitions of the flights table
+
+    Returns:
+        List of dicts with 'name' and 'rows' (estimated), in partition order.
+        Empty if the table is not partitioned.
+    """
+    with db.connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT PARTITION_NAME as name, TABLE_ROWS as `rows`
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'flights'
+              AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """)
+        return cursor.fetchall()
+
+
+def partition_flights_table(db: DatabaseManager, months_ahead: int = None):
+    """
+    Convert the flights table to monthly RANGE partitions on schedule_date
+
+    The primary key becomes (id, schedule_date), since MariaDB requires the
+    partitioning column in every unique key. The ON DUPLICATE KEY upserts in
+    save_flights and merge_staged_flights then only match a flight on its
+    current schedule date, so both first delete the stored row of a flight
+    that moved to another date and insert it again (see
+    DatabaseManager._delete_moved_flights); an id is never stored twice.
+    This rebuilds the whole table and should run in a maintenance window.
+
+    Args:
+        db: Connected DatabaseManager
+        months_ahead: Future months to pre-create (default from config)
+    """
+    if months_ahead is None:
+        months_ahead = config.PARTITION_SETTINGS['months_ahead']
+
+    if get_partitions(db):
+        print("Flights table is already partitioned")
+        return
+
+    with db.connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) as missing FROM flights WHERE schedule_date IS NULL")
+        missing = cursor.fetchone()['missing']
+        if missing:
+            raise ValueError(
+                f"{missing} flights have no schedule_date; fix or remove them before partitioning"
+            )
+
+        cursor.execute("SELECT MIN(schedule_date) as first_date FROM flights")
+        first_date = cursor.fetchone()['first_date']
+
+        current = month_start(date.today())
+        first = month_start(first_date) if first_date else current
+        months = []
+        month = first
+        while month <= add_months(current, months_ahead):
+            months.append(month)
+            month = add_months(month, 1)
+
+        print("Changing flights primary key to (id, schedule_date)...")
+        cursor.execute("""
+            ALTER TABLE flights
+                MODIFY schedule_date DATE NOT NULL,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, schedule_date)
+        """)
+
+        definitions = [partition_definition(m) for m in months]
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        print(f"Partitioning flights into {len(months)} monthly partitions...")
+        cursor.execute(
+            "ALTER TABLE flights PARTITION BY RANGE (TO_DAYS(schedule_date)) (\n    "
+            + ",\n    ".join(definitions)
+            + "\n)"
+        )
+
+    db.connection.commit()
+
+
+def ensure_future_partitions(db: DatabaseManager, months_ahead: int = None) -> List[str]:
+    """
+    Pre-create monthly partitions up to months_ahead beyond the current month
+
+    New months are split off the (normally empty) pmax partition, which is a
+    cheap metadata change while pmax holds no rows.
+
+    Returns:
+        Names of the partitions created
+    """
+    if months_ahead is None:
+        months_ahead = config.PARTITION_SETTINGS['months_ahead']
+
+    partitions = get_partitions(db)
+    if not partitions:
+        print("Flights table is not partitioned; run 'python main.py migrate' first")
+        return []
+
+    existing = [partition_month(p['name']) for p in partitions]
+    existing = [m for m in existing if m]
+    current = month_start(date.today())
+    month = add_months(max(existing), 1) if existing else current
+
+    new_months = []
+    while month <= add_months(current, months_ahead):
+        new_months.append(month)
+        month = add_months(month, 1)
+
+    if not new_months:
+        print("Future partitions already exist")
+        return []
+
+    definitions = [partition_definition(m) for m in new_months]
+    definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    with db.connection.cursor() as cursor:
+        cursor.execute(
+            "ALTER TABLE flights REORGANIZE PARTITION pmax INTO (\n    "
+            + ",\n    ".join(definitions)
+            + "\n)"
+        )
+    db.connection.commit()
+
+    names = [partition_name(m) for m in new_months]
+    print(f"Created partitions: {', '.join(names)}")
+    return names
+
+
+def archive_partition(db: DatabaseManager, name: str, drop: bool = True) -> Tuple[str, int]:
+    """
+    Export one partition to a gzip-compressed CSV file and drop it
+
+    Rows are streamed with a server-side cursor, so memory use does not depend
+    on the size of the partition. The partition is only dropped after the
+    archive has been written completely and its row count verified.
+
+    Args:
+        db: Connected DatabaseManager
+        name: Partition name (e.g. 'p202501')
+        drop: Drop the partition after a successful export
+
+    Returns:
+        Tuple of (archive file path, number of rows archived)
+    """
+    if partition_month(name) is None:
+        raise ValueError(f"Not a monthly flights partition: {name}")
+
+    filepath = os.path.join(config.ARCHIVE_DIR, f"flights_{name}.csv.gz")
+    temp_path = filepath + '.tmp'
+    archived = 0
+
+    cursor = db.connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(f"SELECT * FROM flights PARTITION ({name}) ORDER BY schedule_date, id")
+        columns = [column[0] for column in cursor.description]
+
+        with gzip.open(temp_path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                archived += len(rows)
+    finally:
+        cursor.close()
+
+    with db.connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) as total FROM flights PARTITION ({name})")
+        total = cursor.fetchone()['total']
+
+    if total != archived:
+        os.remove(temp_path)
+        raise RuntimeError(
+            f"Partition {name} changed during export ({archived} archived, {total} present); not dropped"
+        )
+
+    os.replace(temp_path, filepath)
+    print(f"Archived {archived} flights from {name} to {filepath}")
+
+    if drop:
+        drop_partition(db, name)
+
+    return filepath, archived
+
+
+def drop_partition(db: DatabaseManager, name: str):
+    """
+    Drop one monthly partition of the flights table
+
+    The flight_destinations rows of the dropped flights are removed first in
+    small batches; dropping the partition itself is a metadata operation.
+    Afterwards the month's airline_daily_stats rows are deleted, so rankings
+    and /api/stats stop counting the dropped flights, and the flights and
+    retention data versions are bumped.
+    """
+    month = partition_month(name)
+    if month is None:
+        raise ValueError(f"Not a monthly flights partition: {name}")
+
+    with db.connection.cursor() as cursor:
+        last_id = -1
+        while True:
+            cursor.execute(
+                f"SELECT id FROM flights PARTITION ({name}) WHERE id > %s ORDER BY id LIMIT 5000",
+                (last_id,)
+            )
+            ids = [row['id'] for row in cursor.fetchall()]
+            if not ids:
+                break
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(f"DELETE FROM flight_destinations WHERE flight_id IN ({placeholders})", ids)
+            db.connection.commit()
+            last_id = ids[-1]
+
+        # A daily stats rebuild must not copy the month back in between
+        with db.daily_stats_lock(cursor):
+            cursor.execute(f"ALTER TABLE flights DROP PARTITION {name}")
+            cursor.execute(
+                "DELETE FROM airline_daily_stats WHERE schedule_date >= %s AND schedule_date < %s",
+                (month, add_months(month, 1))
+            )
+            db.connection.commit()
+    # Cached responses, ETags and event streams follow the flights version;
+    # the destination catalog rebuilds on a retention bump, since codes can
+    # disappear with the dropped flights
+    db.bump_data_version('flights')
+    db.bump_data_version('retention')
+    print(f"Dropped partition {name}")
+
+
+def apply_retention(db: DatabaseManager, retain_months: int) -> List[str]:
+    """
+    Archive and drop all partitions older than retain_months months
+
+    Args:
+        db: Connected DatabaseManager
+        retain_months: Number of months to keep, including the current month
+
+    Returns:
+        Names of the partitions archived
+    """
+    if retain_months < 1:
+        raise ValueError("retain_months must be at least 1")
+
+    cutoff = add_months(month_start(date.today()), -(retain_months - 1))
+    archived = []
+
+    for partition in get_partitions(db):
+        month = partition_month(partition['name'])
+        if month and month < cutoff:
+            archive_partition(db, partition['name'])
+            archived.append(partition['name'])
+
+    if not archived:
+        print(f"No partitions older than {cutoff.strftime('%Y-%m')} to archive")
+    return archived
+
+
+def maintain_partitions(db: DatabaseManager, months_ahead: int = None,
+                        retain_months: int = None):
+    """
+    Run routine partition maintenance: pre-create future months and apply retention
+
+    Args:
+        db: Connected DatabaseManager
+        months_ahead: Future months to pre-create (default from config)
+        retain_months: Months to keep (default from config, None keeps everything)
+    """
+    ensure_future_partitions(db, months_ahead)
+
+    if retain_months is None:
+        retain_months = config.PARTITION_SETTINGS['retention_months']
+    if retain_months:
+        apply_retention(db, retain_months)
+
+
+if __name__ == "__main__":
+    with DatabaseManager() as db:
+        maintain_partitions(db)
+        for partition in get_partitions(db):
+            print(f"  {partition['name']:<10} ~{partition['rows']} rows")
@@ -0,0 +1,451 @@
+"""
+Query Statistics
+Per-statement timing, row counts and slow-query EXPLAIN capture for every
+query that goes through a DatabaseManager connection.
+
+Connections are wrapped in an InstrumentedConnection whose cursors time each
+execute(), count the rows fetched and group statements by a normalized
+fingerprint (literals and parameters replaced by ?). The first time a SELECT
+of a fingerprint is slower than the threshold, its EXPLAIN plan is captured.
+
+Each process periodically writes its statistics to a snapshot file in
+data/query_stats/, so the statistics of all web workers and pipeline runs can
+be combined into one report:
+
+    python main.py query-report [--top 20] [--sort total|p95|max|count|rows] [--reset]
+    python query_stats.py
+"""
+import atexit
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import config
+
+
+# Latency samples kept per fingerprint for the percentiles
+MAX_SAMPLES = 500
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_PARAMETERS = re.compile(r"%\(\w+\)s|%s|\?|:\w+\b")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_query(query: str) -> str:
+    """
+    Normalize a statement so that executions differing only in literal
+    values map to the same text
+
+    Example:
+        "SELECT * FROM flights WHERE id IN (%s, %s) AND gate = 'D4'"
+        -> "SELECT * FROM flights WHERE id IN (...) AND gate = ?"
+    """
+    text = _COMMENTS.sub(' ', query)
+    text = _STRINGS.sub('?', text)
+    text = _PARAMETERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _IN_LISTS.sub('(...)', text)
+
+
+def fingerprint_query(query: str) -> str:
+    """Short stable ID of a normalized statement"""
+    return hashlib.md5(normalize_query(query).encode('utf-8')).hexdigest()[:16]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples (0 for no samples)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class QueryStats:
+    """Thread-safe per-fingerprint statement statistics of one process"""
+
+    def __init__(self, slow_ms: float = None, snapshot_dir: str = None,
+                 snapshot_interval: float = None):
+        settings = config.QUERY_STATS_SETTINGS
+        self.slow_ms = settings['slow_ms'] if slow_ms is None else slow_ms
+        self.snapshot_dir = snapshot_dir or settings['snapshot_dir']
+        self.snapshot_interval = settings['snapshot_interval'] if snapshot_interval is None else snapshot_interval
+
+        self.entries: Dict[str, Dict] = {}
+        self.started_at = datetime.now().isoformat()
+        self.lock = threading.Lock()
+        self.last_snapshot = time.monotonic()
+
+    def record(self, query: str, elapsed_ms: float) -> str:
+        """
+        Record one execution of a statement
+
+        Returns:
+            Fingerprint of the statement (for add_rows)
+        """
+        key = fingerprint_query(query)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {
+                    'fingerprint': key,
+                    'query': normalize_query(query),
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                    'slow_count': 0,
+                    'samples': [],
+                    'explain': None,
+                    'slow_example': None,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            if elapsed_ms >= self.slow_ms:
+                entry['slow_count'] += 1
+                entry['slow_example'] = _WHITESPACE.sub(' ', query).strip()[:1000]
+
+            # Reservoir sampling keeps a uniform sample of all executions
+            samples = entry['samples']
+            if len(samples) < MAX_SAMPLES:
+                samples.append(round(elapsed_ms, 3))
+            else:
+                slot = random.randrange(entry['count'])
+                if slot < MAX_SAMPLES:
+                    samples[slot] = round(elapsed_ms, 3)
+
+        if time.monotonic() - self.last_snapshot >= self.snapshot_interval:
+            self.write_snapshot()
+        return key
+
+    def add_rows(self, key: str, rows: int):
+        """Add returned/affected rows to a fingerprint"""
+        if rows > 0:
+            with self.lock:
+                if key in self.entries:
+                    self.entries[key]['rows'] += rows
+
+    def needs_explain(self, key: str, elapsed_ms: float) -> bool:
+        """True the first time a fingerprint is slower than the threshold"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return bool(entry) and elapsed_ms >= self.slow_ms and entry['explain'] is None
+
+    def set_explain(self, key: str, plan: List[Dict]):
+        """Store the EXPLAIN plan captured for a fingerprint"""
+        with self.lock:
+            if key in self.entries:
+                self.entries[key]['explain'] = plan
+
+    def reset(self):
+        """Forget all recorded statements"""
+        with self.lock:
+            self.entries.clear()
+
+    def snapshot(self) -> Dict:
+        """Copy of the statistics of this process"""
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'started_at': self.started_at,
+                'written_at': datetime.now().isoformat(),
+                'entries': [dict(entry, samples=list(entry['samples'])) for entry in self.entries.values()],
+            }
+
+    def write_snapshot(self):
+        """Write this process's statistics to its snapshot file"""
+        self.last_snapshot = time.monotonic()
+        if not self.entries:
+            return
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            path = os.path.join(self.snapshot_dir, f"stats_{os.getpid()}.json")
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, default=str)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Warning: Could not write query statistics snapshot: {e}")
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that records timing and rows of every statement"""
+
+    READ_PREFIXES = ('SELECT', 'WITH', 'SHOW', 'EXPLAIN', 'PRAGMA')
+
+    def __init__(self, cursor, connection: 'InstrumentedConnection'):
+        self._cursor = cursor
+        self._connection = connection
+        self._key = None
+        self._pending_explains = []
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._after_execute(query, args, (time.perf_counter() - start) * 1000)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._after_execute(query, None, (time.perf_counter() - start) * 1000)
+
+    def _after_execute(self, query: str, args, elapsed_ms: float):
+        stats = self._connection.stats
+        self._key = stats.record(query, elapsed_ms)
+        for observer in _observers:
+            observer(self._key, elapsed_ms)
+        is_read = query.lstrip().upper().startswith(self.READ_PREFIXES)
+
+        if not is_read:
+            rowcount = getattr(self._cursor, 'rowcount', -1)
+            if rowcount is not None and 0 < rowcount < 2 ** 63:
+                stats.add_rows(self._key, rowcount)
+        elif query.lstrip().upper().startswith(('SELECT', 'WITH')) and stats.needs_explain(self._key, elapsed_ms):
+            # Unbuffered cursors must be drained before the connection can run
+            # the EXPLAIN, so it is deferred until the cursor is closed
+            self._pending_explains.append((self._key, query, args))
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._key:
+            self._connection.stats.add_rows(self._key, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        if self._key:
+            self._connection.stats.add_rows(self._key, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._key:
+            self._connection.stats.add_rows(self._key, len(rows))
+        return rows
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def close(self):
+        self._cursor.close()
+        pending, self._pending_explains = self._pending_explains, []
+        captured = set()
+        for key, query, args in pending:
+            if key not in captured:
+                captured.add(key)
+                self._connection.capture_explain(key, query, args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection wrapper whose cursors are InstrumentedCursors"""
+
+    def __init__(self, connection, stats: QueryStats, explain_prefix: str = 'EXPLAIN'):
+        self._connection = connection
+        self.stats = stats
+        self.explain_prefix = explain_prefix
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self)
+
+    def capture_explain(self, key: str, query: str, args):
+        """Run EXPLAIN for a slow statement on the raw connection and store the plan"""
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute(f"{self.explain_prefix} {query}", args)
+                plan = [dict(row) for row in cursor.fetchall()]
+            self.stats.set_explain(key, plan)
+        except Exception as e:
+            self.stats.set_explain(key, [{'error': str(e)}])
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+_stats: Optional[QueryStats] = None
+_stats_lock = threading.Lock()
+
+# Callbacks (fingerprint, elapsed_ms) run after every instrumented statement
+_observers: List[Callable[[str, float], None]] = []
+
+
+def get_query_stats() -> QueryStats:
+    """Return the process-wide query statistics, creating them on first use"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = QueryStats()
+            atexit.register(_stats.write_snapshot)
+        return _stats
+
+
+def add_observer(callback: Callable[[str, float], None]):
+    """Call callback(fingerprint, elapsed_ms) after every instrumented statement (e.g. metrics.py)"""
+    if callback not in _observers:
+        _observers.append(callback)
+
+
+def set_query_stats(stats: QueryStats):
+    """
+    Replace the process-wide query statistics (e.g. with an isolated collector
+    for a benchmark); only affects connections opened afterwards
+    """
+    global _stats
+    with _stats_lock:
+        _stats = stats
+
+
+def instrument_connection(connection, dialect: str = 'mariadb'):
+    """
+    Wrap a connection for query statistics (unless disabled in config)
+
+    Args:
+        connection: pymysql or SQLite adapter connection
+        dialect: Backend dialect, selects the EXPLAIN syntax
+
+    Returns:
+        InstrumentedConnection, or the connection itself when disabled
+    """
+    if not config.QUERY_STATS_SETTINGS['enabled']:
+        return connection
+    explain_prefix = 'EXPLAIN QUERY PLAN' if dialect == 'sqlite' else 'EXPLAIN'
+    return InstrumentedConnection(connection, get_query_stats(), explain_prefix)
+
+
+def load_snapshots(snapshot_dir: str = None) -> List[Dict]:
+    """Read all per-process snapshot files"""
+    snapshot_dir = snapshot_dir or config.QUERY_STATS_SETTINGS['snapshot_dir']
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(snapshot_dir, 'stats_*.json'))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping unreadable snapshot {path}: {e}")
+    return snapshots
+
+
+def merge_snapshots(snapshots: List[Dict]) -> List[Dict]:
+    """
+    Combine per-process statistics into one summary per fingerprint
+
+    Returns:
+        List of dicts with count, total/avg/p50/p95/p99/max ms, rows,
+        slow_count, query, slow_example and explain
+    """
+    merged: Dict[str, Dict] = {}
+    for snapshot in snapshots:
+        for entry in snapshot.get('entries', []):
+            target = merged.get(entry['fingerprint'])
+            if target is None:
+                target = merged[entry['fingerprint']] = dict(entry, samples=list(entry['samples']))
+                continue
+            target['count'] += entry['count']
+            target['total_ms'] += entry['total_ms']
+            target['max_ms'] = max(target['max_ms'], entry['max_ms'])
+            target['rows'] += entry['rows']
+            target['slow_count'] += entry['slow_count']
+            target['samples'].extend(entry['samples'])
+            target['explain'] = target['explain'] or entry['explain']
+            target['slow_example'] = target['slow_example'] or entry['slow_example']
+
+    summary = []
+    for entry in merged.values():
+        samples = entry.pop('samples')
+        entry['avg_ms'] = entry['total_ms'] / entry['count'] if entry['count'] else 0.0
+        entry['p50_ms'] = percentile(samples, 50)
+        entry['p95_ms'] = percentile(samples, 95)
+        entry['p99_ms'] = percentile(samples, 99)
+        entry['rows_per_call'] = entry['rows'] / entry['count'] if entry['count'] else 0.0
+        summary.append(entry)
+    return summary
+
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'p95': 'p95_ms',
+    'max': 'max_ms',
+    'count': 'count',
+    'rows': 'rows',
+}
+
+
+def collect_summary(sort: str = 'total', include_current: bool = True) -> List[Dict]:
+    """
+    Summary over all snapshot files, sorted descending by a SORT_KEYS key
+
+    Args:
+        sort: One of SORT_KEYS
+        include_current: Write this process's snapshot first
+    """
+    if include_current and _stats is not None:
+        _stats.write_snapshot()
+    summary = merge_snapshots(load_snapshots())
+    return sorted(summary, key=lambda entry: entry[SORT_KEYS[sort]], reverse=True)
+
+
+def format_report(summary: List[Dict], top: int = 20) -> str:
+    """Plain-text report of the top statements"""
+    lines = [
+        "=" * 80,
+        f"QUERY STATISTICS - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "=" * 80,
+        f"{len(summary)} distinct statements, {sum(e['count'] for e in summary)} executions, "
+        f"{sum(e['total_ms'] for e in summary) / 1000:.1f} s total",
+        "",
+    ]
+    for rank, entry in enumerate(summary[:top], 1):
+        lines.append(
+            f"#{rank} [{entry['fingerprint']}] calls={entry['count']} total={entry['total_ms']:.0f}ms "
+            f"avg={entry['avg_ms']:.1f}ms p50={entry['p50_ms']:.1f}ms p95={entry['p95_ms']:.1f}ms "
+            f"p99={entry['p99_ms']:.1f}ms max={entry['max_ms']:.1f}ms "
+            f"rows/call={entry['rows_per_call']:.1f} slow={entry['slow_count']}"
+        )
+        lines.append(f"    {entry['query'][:300]}")
+        for step in entry['explain'] or []:
+            lines.append("    EXPLAIN " + " ".join(f"{k}={v}" for k, v in step.items() if v is not None))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def reset_snapshots(snapshot_dir: str = None) -> int:
+    """Delete all snapshot files; returns the number removed"""
+    snapshot_dir = snapshot_dir or config.QUERY_STATS_SETTINGS['snapshot_dir']
+    paths = glob.glob(os.path.join(snapshot_dir, 'stats_*.json'))
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+
+if __name__ == "__main__":
+    print(format_report(collect_summary()))
@@ -0,0 +1,159 @@
+"""
+Response Cache
+In-memory cache of web API responses, invalidated by data versions.
+
+The pipeline bumps a per-channel counter in the data_versions table in the same
+transaction that changes the data (e.g. 'flights' for every flight batch, merged
+day or daily stats rebuild). Cached responses are tagged with the version of
+their channel at the time they were built and are only served while that
+version is still current, so a finished collection or process run invalidates
+them without any explicit purge.
+
+Entries are keyed by route, the sorted query parameters and the current date
+(the endpoints compute their date windows from today). The cache is bounded by
+entry count and total body size, evicting least recently used entries first.
+
+Each web worker process has its own cache; the statistics of the serving
+worker are available at /api/internal/cache-stats. The versions are read
+through a shared data_versions.DataVersionTracker.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import config
+from data_versions import DataVersionTracker
+
+
+class CacheEntry:
+    """One cached response body"""
+
+    __slots__ = ('body', 'status', 'mimetype', 'channel', 'version', 'created_at')
+
+    def __init__(self, body: bytes, status: int, mimetype: str, channel: str, version: int):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.channel = channel
+        self.version = version
+        self.created_at = time.time()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of response bodies tagged with data versions"""
+
+    def __init__(self, versions: DataVersionTracker, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        """
+        Args:
+            versions: Tracker of the current data versions
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of the cached bodies
+            ttl_seconds: Maximum age of an entry
+            enabled: Serve and store responses (default from config)
+        """
+        settings = config.RESPONSE_CACHE_SETTINGS
+        self.versions = versions
+        self.max_entries = max_entries if max_entries is not None else settings['max_entries']
+        self.max_bytes = max_bytes if max_bytes is not None else settings['max_bytes']
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings['ttl_seconds']
+        self.enabled = enabled if enabled is not None else settings['enabled']
+
+        self._entries: 'OrderedDict[Tuple, CacheEntry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'uncacheable': 0}
+
+    @staticmethod
+    def make_key(route: str, args) -> Tuple:
+        """
+        Build the cache key of a request
+
+        Args:
+            route: Request path
+            args: Query parameters (werkzeug MultiDict or dict)
+
+        Returns:
+            Hashable key: (route, sorted non-empty params, today's date)
+        """
+        items = args.items(multi=True) if hasattr(args, 'getlist') else args.items()
+        params = tuple(sorted((key, value) for key, value in items if value != ''))
+        return (route, params, date.today().isoformat())
+
+    def current_version(self, channel: str) -> Optional[int]:
+        """
+        Return the current version of a channel
+
+        Returns:
+            Version number (0 if the channel was never bumped), or None if the
+            versions cannot be read (responses are then not cached)
+        """
+        state = self.versions.get(channel)
+        return state.version if state is not None else None
+
+    def get(self, key: Tuple, channel: str, version: int) -> Optional[CacheEntry]:
+        """Return the entry for key if it was built from this version of the channel"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            if (entry.channel != channel or entry.version != version
+                    or time.time() - entry.created_at > self.ttl_seconds):
+                self._remove(key)
+                self._counters['stale'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry
+
+    def put(self, key: Tuple, body: bytes, status: int, mimetype: str, channel: str, version: int):
+        """Store a response body, evicting least recently used entries to stay in bounds"""
+        # A single response may use at most a quarter of the cache
+        if len(body) > self.max_bytes // 4:
+            with self._lock:
+                self._counters['uncacheable'] += 1
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(body, status, mimetype, channel, version)
+            self._bytes += len(body)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters['evictions'] += 1
+
+    def _remove(self, key: Tuple):
+        """Drop an entry (caller holds the lock)"""
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current size of the cache"""
+        versions = self.versions.snapshot() or {}
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                'enabled': self.enabled,
+                **self._counters,
+                'hitRate': round(self._counters['hits'] / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+                'ttlSeconds': self.ttl_seconds,
+                'versions': {channel: state.version for channel, state in versions.items()},
+            }
@@ -0,0 +1,208 @@
+"""
+API Serialization
+Fast JSON encoding and response compression for the Flask web API.
+
+    - FastJSONProvider: Flask JSON provider that encodes with orjson when it is
+      installed and falls back to the stdlib encoder otherwise. jsonify() uses
+      it automatically once installed with install(app).
+    - json_array_response: returns large lists as a streamed JSON array, encoded
+      in chunks instead of one big string.
+    - compress_response: after_request hook that compresses JSON/text responses
+      with brotli or gzip, negotiated from Accept-Encoding, above a size
+      threshold. Streamed responses are compressed chunk by chunk.
+
+orjson and brotli are optional; without them responses are encoded with the
+stdlib json module and compressed with gzip only.
+"""
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Mimetypes worth compressing
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/')
+
+# Streams whose chunks must reach the client right away
+UNCOMPRESSED_MIMETYPES = ('text/event-stream',)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider using orjson when available
+
+    Output is equivalent to Flask's default provider: keys are sorted, dates
+    are HTTP dates and Decimals are strings (through the same default()
+    function). Non-ASCII characters are written as UTF-8 instead of escapes.
+    """
+
+    def _orjson_options(self, indent: bool = False) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        """Serialize obj to UTF-8 JSON bytes"""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+            except orjson.JSONEncodeError:
+                # e.g. integers beyond 64 bit; the stdlib encoder handles those
+                pass
+        if indent:
+            return super().dumps(obj, indent=2).encode('utf-8')
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def indent(self) -> bool:
+        """Pretty-print like Flask does (debug mode, or compact disabled)"""
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj, self.indent()) + b'\n', mimetype=self.mimetype)
+
+
+def install(app):
+    """Use FastJSONProvider for jsonify() and compress responses after each request"""
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
+
+
+def json_array_response(items: List, status: int = 200):
+    """
+    Return a list as JSON, streamed in chunks when it is large
+
+    Lists with at least stream_min_items entries are encoded stream_chunk_items
+    at a time while the response is being sent, so the complete encoded payload
+    is never held in memory and the first bytes go out early.
+
+    Args:
+        items: JSON-serializable entries
+        status: HTTP status code
+
+    Returns:
+        Flask response
+    """
+    settings = config.API_RESPONSE_SETTINGS
+    provider = current_app.json
+    if len(items) < settings['stream_min_items'] or not isinstance(provider, FastJSONProvider):
+        response = provider.response(items)
+        response.status_code = status
+        return response
+
+    chunk_size = settings['stream_chunk_items']
+
+    def generate() -> Iterator[bytes]:
+        yield b'['
+        for start in range(0, len(items), chunk_size):
+            # Encode the chunk as an array and strip its brackets
+            chunk = provider.dumps_bytes(items[start:start + chunk_size])
+            if start:
+                yield b','
+            yield chunk[1:-1]
+        yield b']\n'
+
+    return current_app.response_class(generate(), status=status, mimetype=provider.mimetype)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """
+    Pick the content encoding for a request
+
+    Args:
+        accept_encodings: request.accept_encodings
+
+    Returns:
+        'br', 'gzip' or None (send uncompressed)
+    """
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(available)
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """Compress a complete body"""
+    settings = config.API_RESPONSE_SETTINGS
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings['brotli_quality'])
+    compressor = zlib.compressobj(settings['gzip_level'], zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_chunks(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk"""
+    settings = config.API_RESPONSE_SETTINGS
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings['brotli_quality'])
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(settings['gzip_level'], zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_response(response):
+    """
+    after_request hook: compress JSON and text responses the client accepts
+    compressed
+
+    Bodies below compress_min_bytes, responses that already have a
+    Content-Encoding, file responses and event streams are left alone.
+    """
+    settings = config.API_RESPONSE_SETTINGS
+    if (not settings['compress']
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES)
+            or response.mimetype in UNCOMPRESSED_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < settings['compress_min_bytes']:
+            return response
+        response.set_data(compress_bytes(body, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,488 @@
+"""
+SQLite Storage Backend
+Embedded, single-file implementation of the flight database for local
+development, tests and small single-host deployments.
+
+The database runs in WAL mode, so the web API can keep reading while the
+pipeline writes. Queries are written once in the MariaDB dialect used by
+DatabaseManager; the connection adapter below translates the few MariaDB
+constructs they use (%s parameters, INSERT IGNORE, ON DUPLICATE KEY UPDATE,
+<=>) and returns rows as dicts with DATE/DATETIME/TIME values converted the
+way pymysql returns them.
+
+Usage (.env):
+    STORAGE_BACKEND=sqlite
+    SQLITE_PATH=data/airlines.db
+"""
+import contextlib
+import os
+import re
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from database import DatabaseManager
+from query_stats import instrument_connection
+
+
+def _convert_date(value: bytes):
+    text = value.decode()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+def _convert_datetime(value: bytes):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_time(value: bytes):
+    """TIME columns come back as timedelta, like pymysql returns them"""
+    text = value.decode()
+    try:
+        parts = [float(part) for part in text.split(':')]
+        hours, minutes, seconds = (parts + [0.0, 0.0])[:3]
+        return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+    except ValueError:
+        return text
+
+
+def _adapt_timedelta(value: timedelta) -> str:
+    total = int(value.total_seconds())
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+sqlite3.register_converter('TIME', _convert_time)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_adapter(time, lambda value: value.isoformat())
+sqlite3.register_adapter(timedelta, _adapt_timedelta)
+sqlite3.register_adapter(Decimal, float)
+
+# Aggregate result columns that hold dates; SQLite only knows the declared
+# type of plain columns, so these are converted by name
+DATE_RESULT_COLUMNS = {'first_date'}
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\s+INTO\b", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def translate_query(query: str) -> str:
+    """
+    Translate a MariaDB-dialect query to SQLite
+
+    Args:
+        query: SQL with pymysql-style %s / %(name)s parameters
+
+    Returns:
+        SQL with ? / :name parameters and SQLite equivalents of the MariaDB
+        constructs used in this project
+    """
+    sql = _NAMED_PARAM.sub(r":\1", query)
+    sql = sql.replace('%s', '?').replace('%%', '%')
+    sql = _INSERT_IGNORE.sub('INSERT OR IGNORE INTO', sql)
+    sql = sql.replace('<=>', ' IS ')
+    sql = sql.replace('CURRENT_TIMESTAMP', "datetime('now', 'localtime')")
+
+    match = _ON_DUPLICATE.search(sql)
+    if match:
+        assignments = _VALUES_REF.sub(r"excluded.\1", sql[match.end():])
+        sql = sql[:match.start()] + 'ON CONFLICT DO UPDATE SET' + assignments
+    return sql
+
+
+def _parameters(params):
+    """pymysql accepts None, a sequence or a mapping; sqlite3 needs () for None"""
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return params
+    return tuple(params)
+
+
+class SQLiteCursor:
+    """DB-API cursor returning dict rows for MariaDB-dialect queries"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._cursor = connection.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self._cursor.lastrowid
+
+    def execute(self, query: str, params=None) -> int:
+        self._cursor.execute(translate_query(query), _parameters(params))
+        return self._cursor.rowcount
+
+    def executemany(self, query: str, seq_of_params) -> int:
+        self._cursor.executemany(translate_query(query), [_parameters(p) for p in seq_of_params])
+        return self._cursor.rowcount
+
+    def fetchone(self) -> Optional[Dict]:
+        row = self._cursor.fetchone()
+        return self._row(row) if row is not None else None
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Dict]:
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        return [self._row(row) for row in rows]
+
+    def fetchall(self) -> List[Dict]:
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def _row(self, row) -> Dict:
+        names = [column[0] for column in self._cursor.description]
+        result = dict(zip(names, row))
+        for name in DATE_RESULT_COLUMNS.intersection(result):
+            if isinstance(result[name], str):
+                result[name] = _convert_date(result[name].encode())
+        return result
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SQLiteConnection:
+    """Wraps sqlite3.Connection with the parts of the pymysql API the project uses"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=30
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=30000")
+
+    def cursor(self, cursorclass=None) -> SQLiteCursor:
+        # cursorclass (e.g. SSDictCursor) is accepted for compatibility; SQLite
+        # cursors always step through results lazily
+        return SQLiteCursor(self._connection)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self, reconnect: bool = True):
+        self._connection.execute("SELECT 1")
+
+    def executescript(self, script: str):
+        self._connection.executescript(script)
+
+    def close(self):
+        self._connection.close()
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """Flight database stored in a local SQLite file"""
+
+    dialect = 'sqlite'
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Database file (created on first connect)
+        """
+        super().__init__(replica_dsns=[])
+        self.path = path
+
+    def connect(self):
+        """Open the database file"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        print(f"Opening SQLite database '{self.path}'...")
+        self.connection = instrument_connection(SQLiteConnection(self.path), self.dialect)
+        print("Database connection established successfully!")
+
+    def disconnect(self):
+        """Close the database file"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+            print("Database connection closed")
+        with self._connect_lock:
+            thread_connections, self._thread_connections = self._thread_connections, []
+        for connection in thread_connections:
+            connection.close()
+
+    def get_connection(self):
+        """Get the database connection, opening it if needed"""
+        if not self.connection:
+            self.connect()
+        return self.connection
+
+    def open_connection(self, dsn: Optional[str] = None, autocommit: bool = False):
+        """Open an additional connection to the database file (dsn is ignored)"""
+        return instrument_connection(SQLiteConnection(self.path), self.dialect)
+
+    def create_tables(self):
+        """Create database tables and indexes if they don't exist"""
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS flights (
+                id INTEGER PRIMARY KEY,
+                flight_number VARCHAR(20) NOT NULL,
+                airline_code VARCHAR(10),
+                flight_direction CHAR(1),
+                schedule_date DATE,
+                schedule_time TIME,
+                actual_time DATETIME,
+                estimated_time DATETIME,
+                delay_minutes DECIMAL(10, 2),
+                on_time BOOLEAN,
+                flight_status VARCHAR(20),
+                destinations VARCHAR(255),
+                aircraft_type VARCHAR(10),
+                terminal VARCHAR(10),
+                gate VARCHAR(10),
+                baggage_claim VARCHAR(20),
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                aircraft_type_norm VARCHAR(10) AS (NULLIF(TRIM(aircraft_type), '')) STORED,
+                row_fingerprint CHAR(32)
+            );
+            CREATE INDEX IF NOT EXISTS idx_flights_flight_direction ON flights (flight_direction);
+            CREATE INDEX IF NOT EXISTS idx_flights_date_dir_airline
+                ON flights (schedule_date, flight_direction, airline_code, on_time, delay_minutes, actual_time);
+            CREATE INDEX IF NOT EXISTS idx_flights_airline_date
+                ON flights (airline_code, schedule_date, actual_time, on_time, delay_minutes);
+            CREATE INDEX IF NOT EXISTS idx_flights_airline_date_time
+                ON flights (airline_code, schedule_date, schedule_time, id);
+            CREATE INDEX IF NOT EXISTS idx_flights_dir_date_dest
+                ON flights (flight_direction, schedule_date, destinations);
+            CREATE INDEX IF NOT EXISTS idx_flights_date_aircraft ON flights (schedule_date, aircraft_type_norm);
+            CREATE INDEX IF NOT EXISTS idx_flights_aircraft_date
+                ON flights (aircraft_type_norm, schedule_date, airline_code);
+
+            CREATE TABLE IF NOT EXISTS flight_destinations (
+                flight_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                iata_code VARCHAR(10) NOT NULL,
+                PRIMARY KEY (flight_id, seq)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_flight_destinations_iata_code
+                ON flight_destinations (iata_code, flight_id);
+
+            CREATE TABLE IF NOT EXISTS airline_daily_stats (
+                airline_code VARCHAR(10) NOT NULL,
+                schedule_date DATE NOT NULL,
+                flight_direction CHAR(1) NOT NULL,
+                flights INTEGER NOT NULL DEFAULT 0,
+                on_time INTEGER NOT NULL DEFAULT 0,
+                sum_delay DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                delay_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (airline_code, schedule_date, flight_direction)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_airline_daily_stats_date_direction
+                ON airline_daily_stats (schedule_date, flight_direction);
+
+            CREATE TABLE IF NOT EXISTS airline_statistics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                airline_code VARCHAR(10) NOT NULL,
+                date_range_start DATE NOT NULL,
+                date_range_end DATE NOT NULL,
+                flight_direction CHAR(1),
+                total_flights INTEGER,
+                on_time_flights INTEGER,
+                avg_delay_minutes DECIMAL(10, 2),
+                median_delay_minutes DECIMAL(10, 2),
+                std_delay_minutes DECIMAL(10, 2),
+                min_delay_minutes DECIMAL(10, 2),
+                max_delay_minutes DECIMAL(10, 2),
+                on_time_percentage DECIMAL(5, 2),
+                reliability_score DECIMAL(10, 2),
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                UNIQUE (airline_code, date_range_start, date_range_end, flight_direction)
+            );
+            CREATE INDEX IF NOT EXISTS idx_airline_statistics_airline_code ON airline_statistics (airline_code);
+            CREATE INDEX IF NOT EXISTS idx_airline_statistics_date_range
+                ON airline_statistics (date_range_start, date_range_end);
+
+            CREATE TABLE IF NOT EXISTS data_collection_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                operation_type VARCHAR(20) NOT NULL,
+                flight_direction CHAR(1),
+                date_range_start DATE NOT NULL,
+                date_range_end DATE NOT NULL,
+                records_collected INTEGER DEFAULT 0,
+                records_processed INTEGER DEFAULT 0,
+                status VARCHAR(20) DEFAULT 'success',
+                error_message TEXT,
+                execution_time_seconds DECIMAL(10, 2),
+                api_pages_fetched INTEGER,
+                notes TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_data_collection_log_collection_date
+                ON data_collection_log (collection_date);
+            CREATE INDEX IF NOT EXISTS idx_data_collection_log_date_range
+                ON data_collection_log (date_range_start, date_range_end);
+            CREATE INDEX IF NOT EXISTS idx_data_collection_log_operation ON data_collection_log (operation_type);
+            CREATE INDEX IF NOT EXISTS idx_data_collection_log_status ON data_collection_log (status);
+
+            CREATE TABLE IF NOT EXISTS data_versions (
+                channel VARCHAR(50) PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+            ) WITHOUT ROWID;
+        """)
+        print("Database tables created/verified successfully")
+
+    def create_reference_tables(self):
+        """Create the continents, countries, airports and aircraft_types tables if needed"""
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS continents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(255) UNIQUE NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS countries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(255) NOT NULL,
+                continent_id INTEGER REFERENCES continents(id),
+                code VARCHAR(10),
+                UNIQUE (name, continent_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_countries_continent_id ON countries (continent_id);
+
+            CREATE TABLE IF NOT EXISTS airports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                iata_code VARCHAR(10) UNIQUE,
+                name VARCHAR(255),
+                city VARCHAR(255),
+                country_id INTEGER REFERENCES countries(id),
+                latitude DECIMAL(10, 8),
+                longitude DECIMAL(11, 8),
+                destinations TEXT,
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+            );
+            -- MariaDB creates these indexes implicitly for the foreign keys
+            CREATE INDEX IF NOT EXISTS idx_airports_country_id ON airports (country_id);
+
+            CREATE TABLE IF NOT EXISTS aircraft_types (
+                iata_sub VARCHAR(10) PRIMARY KEY,
+                iata_main VARCHAR(10),
+                long_description VARCHAR(255),
+                short_description VARCHAR(100),
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+            );
+        """)
+        print("Reference tables created/verified successfully")
+
+    def _create_stage_table(self, cursor, table: str):
+        """Create a staging table with the writable flights columns"""
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                flight_number VARCHAR(20) NOT NULL,
+                airline_code VARCHAR(10),
+                flight_direction CHAR(1),
+                schedule_date DATE,
+                schedule_time TIME,
+                actual_time DATETIME,
+                estimated_time DATETIME,
+                delay_minutes DECIMAL(10, 2),
+                on_time BOOLEAN,
+                flight_status VARCHAR(20),
+                destinations VARCHAR(255),
+                aircraft_type VARCHAR(10),
+                terminal VARCHAR(10),
+                gate VARCHAR(10),
+                baggage_claim VARCHAR(20),
+                row_fingerprint CHAR(32)
+            )
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_schedule_date ON {table} (schedule_date)")
+
+    def list_staged_tables(self) -> List[str]:
+        """Return the staging tables that have not been merged yet"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s ESCAPE '\\'",
+                (self.STAGE_TABLE_PREFIX.replace('_', '\\_') + '%',)
+            )
+            return sorted(row['name'] for row in cursor.fetchall())
+
+    def daily_stats_lock(self, cursor):
+        """
+        No named lock: SQLite runs one write transaction at a time, and
+        rebuild_daily_stats is a single transaction
+        """
+        return contextlib.nullcontext()
+
+    def rebuild_daily_stats(self) -> int:
+        """
+        Rebuild airline_daily_stats from all flights
+
+        Runs as one transaction; in WAL mode readers keep seeing the old
+        aggregates until it commits.
+
+        Returns:
+            Number of aggregate rows built
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("DELETE FROM airline_daily_stats")
+            cursor.execute(
+                """
+                INSERT INTO airline_daily_stats (
+                    airline_code, schedule_date, flight_direction,
+                    flights, on_time, sum_delay, delay_count
+                )
+                """ + self.DAILY_STATS_SELECT
+                + " AND schedule_date IS NOT NULL"
+                + " GROUP BY COALESCE(airline_code, ''), schedule_date, COALESCE(flight_direction, '')"
+            )
+            rows = cursor.rowcount
+            self._bump_data_version(cursor, 'flights')
+        self.connection.commit()
+
+        print(f"Rebuilt airline_daily_stats with {rows} rows")
+        return rows
+
+
+if __name__ == "__main__":
+    import config
+
+    with SQLiteDatabaseManager(config.STORAGE_SETTINGS['sqlite_path']) as db:
+        db.create_tables()
+        db.create_reference_tables()
+        print(f"\nSQLite database ready at {db.path}")
@@ -0,0 +1,158 @@
+"""
+Storage Backend Interface
+Common interface for the flight database backends and a factory that picks the
+configured one.
+
+Backends:
+    mariadb - database.DatabaseManager (MariaDB, optionally over an SSH tunnel)
+    sqlite  - sqlite_backend.SQLiteDatabaseManager (embedded, WAL mode)
+
+The backend is selected with STORAGE_BACKEND in .env (see config.STORAGE_SETTINGS).
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional
+import config
+
+
+class StorageBackend(ABC):
+    """Persistence interface used by the pipeline and the web API"""
+
+    # SQL dialect of the backend ('mariadb' or 'sqlite')
+    dialect = None
+
+    def __enter__(self):
+        """Context manager entry - establish connection"""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit - close connection"""
+        self.disconnect()
+
+    # Connection lifecycle
+
+    @abstractmethod
+    def connect(self):
+        """Open the database connection"""
+
+    @abstractmethod
+    def disconnect(self):
+        """Close the database connection"""
+
+    @abstractmethod
+    def get_connection(self):
+        """Return a live DB-API style connection whose cursors return dict rows"""
+
+    def get_read_connection(self):
+        """Return a connection for read-only queries (by default the main connection)"""
+        return self.get_connection()
+
+    @abstractmethod
+    def create_tables(self):
+        """Create the flight, statistics and log tables if they don't exist"""
+
+    # Flights
+
+    @abstractmethod
+    def save_flights(self, df, batch_size: int = 500) -> int:
+        """Insert or update processed flights; returns rows written"""
+
+    @abstractmethod
+    def get_flights(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    airline_code: Optional[str] = None):
+        """Return flights as one DataFrame"""
+
+    @abstractmethod
+    def iter_flights(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     airline_code: Optional[str] = None, flight_direction: Optional[str] = None,
+                     columns: Optional[List[str]] = None, chunk_size: int = 10000,
+                     as_frames: bool = True, destination: Optional[str] = None,
+                     connection=None) -> Iterator:
+        """Stream flights in chunks"""
+
+    @abstractmethod
+    def stage_flights(self, df, run_id: Optional[str] = None, batch_size: int = 1000) -> Optional[str]:
+        """Load flights into a staging table; returns its name"""
+
+    @abstractmethod
+    def list_staged_tables(self) -> List[str]:
+        """Return the staging tables that have not been merged yet"""
+
+    @abstractmethod
+    def merge_staged_flights(self, table: str, pause_seconds: float = 0.0,
+                             drop: bool = True) -> Dict[str, int]:
+        """Merge a staging table into flights"""
+
+    # Statistics
+
+    @abstractmethod
+    def rebuild_daily_stats(self) -> int:
+        """Rebuild airline_daily_stats from all flights"""
+
+    @abstractmethod
+    def save_airline_statistics(self, df, date_range_start: str, date_range_end: str,
+                                flight_direction: str) -> int:
+        """Insert or update airline statistics for a date range"""
+
+    @abstractmethod
+    def get_airline_statistics(self, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None):
+        """Return stored airline statistics as a DataFrame"""
+
+    # Collection log
+
+    @abstractmethod
+    def log_collection(self, operation_type: str, flight_direction: str,
+                       date_range_start: str, date_range_end: str, **kwargs) -> int:
+        """Write one data_collection_log entry; returns its ID"""
+
+    @abstractmethod
+    def log_collections(self, entries: List[Dict]) -> int:
+        """Write several data_collection_log entries"""
+
+    @abstractmethod
+    def get_collection_log(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                           operation_type: Optional[str] = None, limit: int = 100):
+        """Return data_collection_log entries as a DataFrame"""
+
+    # Data versions
+
+    @abstractmethod
+    def bump_data_version(self, channel: str):
+        """Increment the version of a data channel (e.g. 'flights')"""
+
+    @abstractmethod
+    def get_data_versions(self, connection=None) -> Dict:
+        """Return {channel: data_versions.DataVersion} for every data channel"""
+
+    # Reference tables
+
+    @abstractmethod
+    def create_reference_tables(self):
+        """Create the continents/countries/airports/aircraft_types tables"""
+
+    @abstractmethod
+    def load_reference_data(self, destinations: List[Dict], aircraft_types: List[Dict]) -> Dict[str, int]:
+        """Insert or update airports (with countries/continents) and aircraft types"""
+
+
+def create_storage_backend(backend: Optional[str] = None) -> StorageBackend:
+    """
+    Create the configured storage backend (not yet connected)
+
+    Args:
+        backend: 'mariadb' or 'sqlite' (default: config.STORAGE_SETTINGS['backend'])
+
+    Returns:
+        StorageBackend instance
+    """
+    backend = (backend or config.STORAGE_SETTINGS['backend']).lower()
+
+    if backend == 'mariadb':
+        from database import DatabaseManager
+        return DatabaseManager()
+    if backend == 'sqlite':
+        from sqlite_backend import SQLiteDatabaseManager
+        return SQLiteDatabaseManager(config.STORAGE_SETTINGS['sqlite_path'])
+
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,231 @@
+"""
+Flight Upsert Test
+Checks on a temporary SQLite database that re-collected flights are only
+written when their tracked fields changed (row fingerprints), through both
+save_flights and the staged merge, and that the incrementally refreshed
+airline_daily_stats always match a full rebuild, also when a batch lists a
+flight twice.
+
+Usage:
+    python test_flight_upserts.py
+    python -m pytest test_flight_upserts.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+from sqlite_backend import SQLiteDatabaseManager
+
+
+def flight_record(flight_id, schedule_date='2025-03-01', airline_code='KL', delay=5.0,
+                  status='DEP', direction='D'):
+    """One flight as produced by FlightDataProcessor.process_flights_to_dataframe"""
+    return {
+        'flight_id': flight_id,
+        'flight_number': f"{airline_code or 'XX'}{flight_id}",
+        'airline_code': airline_code,
+        'flight_direction': direction,
+        'schedule_date': schedule_date,
+        'schedule_time': '10:00:00',
+        'actual_time': f"{schedule_date}T10:05:00",
+        'estimated_time': None,
+        'delay_minutes': delay,
+        'on_time': delay is not None and delay <= 15,
+        'flight_status': status,
+        'destinations': 'LHR',
+        'aircraft_type': None,
+        'terminal': None,
+        'gate': 'D1',
+        'baggage_claim': None,
+    }
+
+
+def open_database():
+    """Empty SQLite database in a temporary directory; returns (db, directory)"""
+    directory = tempfile.mkdtemp(prefix='upsert-test-')
+    db = SQLiteDatabaseManager(os.path.join(directory, 'airlines.db'))
+    db.connect()
+    db.create_tables()
+    return db, directory
+
+
+def close_database(db, directory):
+    db.disconnect()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def query(db, sql, params=None):
+    with db.connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def flights_version(db):
+    rows = query(db, "SELECT version FROM data_versions WHERE channel = 'flights'")
+    return rows[0]['version'] if rows else 0
+
+
+def daily_stats(db):
+    """airline_daily_stats as a set of comparable tuples"""
+    return {
+        (row['airline_code'], str(row['schedule_date']), row['flight_direction'],
+         row['flights'], row['on_time'], round(float(row['sum_delay']), 2), row['delay_count'])
+        for row in query(db, "SELECT * FROM airline_daily_stats")
+    }
+
+
+def assert_daily_stats_match_rebuild(db):
+    """The incremental aggregates equal the ones rebuilt from all flights"""
+    incremental = daily_stats(db)
+    db.rebuild_daily_stats()
+    rebuilt = daily_stats(db)
+    assert incremental == rebuilt, f"daily stats differ from a rebuild:\n{incremental ^ rebuilt}"
+
+
+def test_save_flights_skips_unchanged_rows():
+    """A re-collected batch only writes flights whose tracked fields changed"""
+    db, directory = open_database()
+    try:
+        flights = [flight_record(flight_id) for flight_id in range(1, 6)]
+        db.save_flights(pd.DataFrame(flights))
+        assert db.last_save_counts == {'inserted': 5, 'changed': 0, 'unchanged': 0}
+        version = flights_version(db)
+        updated_at = {row['id']: row['updated_at'] for row in query(db, "SELECT id, updated_at FROM flights")}
+
+        # Same data again: nothing written, data version untouched
+        assert db.save_flights(pd.DataFrame(flights)) == 0
+        assert db.last_save_counts == {'inserted': 0, 'changed': 0, 'unchanged': 5}
+        assert flights_version(db) == version
+        assert {row['id']: row['updated_at'] for row in query(db, "SELECT id, updated_at FROM flights")} == updated_at
+        print("✓ Unchanged flights are skipped")
+
+        # One tracked field changed, one new flight
+        flights[2] = flight_record(3, delay=42.0, status='DEL')
+        flights.append(flight_record(6))
+        assert db.save_flights(pd.DataFrame(flights)) == 2
+        assert db.last_save_counts == {'inserted': 1, 'changed': 1, 'unchanged': 4}
+        assert flights_version(db) > version
+        row = query(db, "SELECT delay_minutes, flight_status FROM flights WHERE id = 3")[0]
+        assert (float(row['delay_minutes']), row['flight_status']) == (42.0, 'DEL')
+        print("✓ Changed and new flights are written")
+        assert_daily_stats_match_rebuild(db)
+        print("✓ Daily stats match a full rebuild")
+    finally:
+        close_database(db, directory)
+
+
+def test_staged_merge_skips_unchanged_rows():
+    """The staged merge classifies rows by fingerprint like save_flights"""
+    db, directory = open_database()
+    try:
+        flights = [flight_record(flight_id, schedule_date=f"2025-03-0{flight_id % 3 + 1}")
+                   for flight_id in range(1, 10)]
+        db.save_flights(pd.DataFrame(flights))
+        version = flights_version(db)
+
+        table = db.stage_flights(pd.DataFrame(flights))
+        totals = db.merge_staged_flights(table)
+        assert totals == {'inserted': 0, 'changed': 0, 'unchanged': 9}
+        assert flights_version(db) == version
+        print("✓ Unchanged staged flights are skipped")
+
+        flights[0] = flight_record(1, schedule_date='2025-03-02', delay=None, status='CNX')
+        flights.append(flight_record(10, schedule_date='2025-03-04'))
+        table = db.stage_flights(pd.DataFrame(flights))
+        totals = db.merge_staged_flights(table)
+        assert totals == {'inserted': 1, 'changed': 1, 'unchanged': 8}
+        assert db.list_staged_tables() == []
+        print("✓ Changed and new staged flights are merged")
+        assert_daily_stats_match_rebuild(db)
+        print("✓ Daily stats match a full rebuild")
+    finally:
+        close_database(db, directory)
+
+
+def test_daily_stats_follow_moved_flights_and_missing_codes():
+    """Rescheduled flights and empty or missing airline codes keep the aggregates exact"""
+    db, directory = open_database()
+    try:
+        flights = [
+            flight_record(1),
+            flight_record(2),
+            flight_record(3, airline_code=''),
+            flight_record(4, airline_code=None),
+            flight_record(5, direction='A'),
+        ]
+        db.save_flights(pd.DataFrame(flights))
+
+        # Flight 1 moves to the next day; the '' and NULL codes change delay
+        flights[0] = flight_record(1, schedule_date='2025-03-02')
+        flights[2] = flight_record(3, airline_code='', delay=30.0)
+        flights[3] = flight_record(4, airline_code=None, delay=1.0)
+        db.save_flights(pd.DataFrame(flights))
+        assert db.last_save_counts == {'inserted': 0, 'changed': 3, 'unchanged': 2}
+        assert query(db, "SELECT COUNT(*) as n FROM flights WHERE id = 1")[0]['n'] == 1
+        assert_daily_stats_match_rebuild(db)
+        print("✓ save_flights keeps daily stats exact")
+
+        # Same through the staged merge: flight 2 moves, only '' codes change on a day
+        flights[1] = flight_record(2, schedule_date='2025-03-03')
+        flights[2] = flight_record(3, airline_code='', delay=2.0)
+        totals = db.merge_staged_flights(db.stage_flights(pd.DataFrame(flights)))
+        assert totals == {'inserted': 0, 'changed': 2, 'unchanged': 3}
+        assert query(db, "SELECT COUNT(*) as n FROM flights WHERE id = 2")[0]['n'] == 1
+        assert_daily_stats_match_rebuild(db)
+        print("✓ Staged merge keeps daily stats exact")
+    finally:
+        close_database(db, directory)
+
+
+def test_duplicate_ids_in_a_batch():
+    """A flight listed twice in one batch is written and counted once, with its last row"""
+    db, directory = open_database()
+    try:
+        flights = [flight_record(1), flight_record(2), flight_record(1, delay=42.0, status='DEL')]
+        assert db.save_flights(pd.DataFrame(flights)) == 2
+        assert db.last_save_counts == {'inserted': 2, 'changed': 0, 'unchanged': 0}
+        row = query(db, "SELECT delay_minutes, flight_status FROM flights WHERE id = 1")[0]
+        assert (float(row['delay_minutes']), row['flight_status']) == (42.0, 'DEL')
+        print("✓ Duplicate new flights are inserted once")
+
+        flights = [flight_record(2, delay=30.0), flight_record(2, delay=31.0),
+                   flight_record(1, delay=42.0, status='DEL')]
+        assert db.save_flights(pd.DataFrame(flights)) == 1
+        assert db.last_save_counts == {'inserted': 0, 'changed': 1, 'unchanged': 1}
+        assert float(query(db, "SELECT delay_minutes FROM flights WHERE id = 2")[0]['delay_minutes']) == 31.0
+        print("✓ Duplicate changed flights are updated once")
+        assert_daily_stats_match_rebuild(db)
+        print("✓ Daily stats match a full rebuild")
+    finally:
+        close_database(db, directory)
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("save_flights skips unchanged rows", test_save_flights_skips_unchanged_rows),
+        ("Staged merge skips unchanged rows", test_staged_merge_skips_unchanged_rows),
+        ("Daily stats of moved flights and missing codes", test_daily_stats_follow_moved_flights_and_missing_codes),
+        ("Duplicate flight ids in a batch", test_duplicate_ids_in_a_batch),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print("\n" + "=" * 60)
+        print(test_name)
+        print("=" * 60)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"✗ FAIL: {e}")
+
+    print(f"\nResults: {passed}/{len(tests)} tests passed")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
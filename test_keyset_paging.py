@@ -0,0 +1,132 @@
+"""
+Keyset Paging Test
+Pages through /api/airlines/<code>/flights on a temporary SQLite database and
+checks that every flight is returned exactly once and in order, also when many
+flights share the same (schedule_date, schedule_time) boundary or have no
+schedule time.
+
+Usage:
+    python test_keyset_paging.py
+    python -m pytest test_keyset_paging.py
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import config
+
+# Serve web_api from a throwaway SQLite file; must be set before it is imported
+DB_DIR = tempfile.mkdtemp(prefix='keyset-test-')
+atexit.register(shutil.rmtree, DB_DIR, True)
+config.STORAGE_SETTINGS['backend'] = 'sqlite'
+config.STORAGE_SETTINGS['sqlite_path'] = os.path.join(DB_DIR, 'airlines.db')
+
+import web_api
+
+
+def create_flights():
+    """
+    Insert flights of one airline over three days with many equal sort keys
+
+    Returns:
+        Flight numbers in the expected page order
+        (schedule_date DESC, schedule_time DESC NULLS LAST, id DESC)
+    """
+    db = web_api.db
+    db.get_connection()
+    db.create_tables()
+
+    today = date.today()
+    rows = []
+    flight_id = 1000
+    for day_offset in range(3):
+        schedule_date = today - timedelta(days=day_offset)
+        # Several flights per time slot, so page boundaries fall inside a slot
+        for schedule_time in ('08:00:00', '08:00:00', '08:00:00', '12:30:00', '12:30:00', None, None):
+            flight_id += 7
+            rows.append((flight_id, f"KL{flight_id}", 'KL', 'D', schedule_date, schedule_time))
+    # Another airline on the same slots must not leak into the pages
+    rows.append((99999, 'HV1', 'HV', 'D', today, '08:00:00'))
+
+    with db.connection.cursor() as cursor:
+        cursor.execute("DELETE FROM flights")
+        cursor.executemany("""
+            INSERT INTO flights (id, flight_number, airline_code, flight_direction,
+                                 schedule_date, schedule_time)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, rows)
+        db._bump_data_version(cursor, 'flights')
+    db.connection.commit()
+
+    kl_rows = [row for row in rows if row[2] == 'KL']
+    # NULL times sort after every time of the same day
+    kl_rows.sort(key=lambda row: (row[4], row[5] is not None, row[5] or '', row[0]), reverse=True)
+    return [row[1] for row in kl_rows]
+
+
+def fetch_all_pages(client, limit):
+    """Follow nextCursor until the last page; returns the flight numbers in page order"""
+    numbers = []
+    page_cursor = None
+    for _ in range(100):
+        params = {'days': 3, 'limit': limit}
+        if page_cursor:
+            params['cursor'] = page_cursor
+        response = client.get('/api/airlines/KL/flights', query_string=params)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        payload = response.get_json()
+        assert len(payload['flights']) <= limit
+        numbers.extend(flight['flightNumber'] for flight in payload['flights'])
+        page_cursor = payload.get('nextCursor')
+        if not page_cursor:
+            return numbers
+    raise AssertionError("Paging did not end after 100 pages")
+
+
+def test_pages_are_complete_and_unique():
+    """Every page size returns all flights once, in keyset order"""
+    expected = create_flights()
+    client = web_api.app.test_client()
+    for limit in (1, 2, 3, 4, 5, 7, len(expected), len(expected) + 1):
+        numbers = fetch_all_pages(client, limit)
+        assert len(numbers) == len(set(numbers)), f"limit={limit}: duplicate flights {numbers}"
+        assert numbers == expected, f"limit={limit}: got {numbers}, expected {expected}"
+        print(f"✓ limit={limit}: {len(numbers)} flights, no gaps or duplicates")
+
+
+def test_invalid_cursor_is_rejected():
+    """A malformed cursor is a 400, not a server error"""
+    create_flights()
+    response = web_api.app.test_client().get('/api/airlines/KL/flights',
+                                               query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+    print("✓ Invalid cursor rejected with 400")
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Complete and unique pages", test_pages_are_complete_and_unique),
+        ("Invalid cursor", test_invalid_cursor_is_rejected),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print("\n" + "=" * 60)
+        print(test_name)
+        print("=" * 60)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"✗ FAIL: {e}")
+
+    print(f"\nResults: {passed}/{len(tests)} tests passed")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+// Airlines Betrouwbaarheid - API helpers
+// Conditional GET requests: the server answers 304 when the data did not change
+// Change notifications: /api/events pushes an event when new data arrives
+// Batches: /api/batch answers several GET requests in one round trip
+
+const validatorCache = new Map();  // url -> { etag, lastModified, data }
+
+// Fetch JSON, sending the ETag / Last-Modified of the previous response.
+// Returns { data, notModified }; on 304 the previous data is returned.
+async function fetchJSON(url) {
+    const cached = validatorCache.get(url);
+    const headers = {};
+    if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+    if (cached && cached.lastModified) headers['If-Modified-Since'] = cached.lastModified;
+
+    // no-store: let the 304 reach us instead of the browser cache answering it
+    const response = await fetch(url, { headers, cache: 'no-store' });
+
+    if (response.status === 304 && cached) {
+        return { data: cached.data, notModified: true };
+    }
+    if (!response.ok) throw new Error(`Request failed (${response.status})`);
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    const lastModified = response.headers.get('Last-Modified');
+    if (etag || lastModified) {
+        validatorCache.set(url, { etag, lastModified, data });
+    }
+    return { data, notModified: false };
+}
+
+// Run several GET requests in one round trip.
+// requests: { name: { path, params } }; resolves to { name: { status, body } }
+async function fetchBatch(requests) {
+    const response = await fetch('/api/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ requests })
+    });
+    if (!response.ok) throw new Error(`Batch request failed (${response.status})`);
+    const data = await response.json();
+    return data.responses;
+}
+
+// Call onChange(changedChannels) when one of the data channels changes.
+// Uses the /api/events stream; falls back to polling every fallbackMs when the
+// browser or the server does not support it (the server refuses streams on sync workers).
+function subscribeToChanges(channels, onChange, fallbackMs) {
+    let pollTimer = null;
+    const startPolling = () => {
+        if (!pollTimer) pollTimer = setInterval(() => onChange(channels), fallbackMs);
+    };
+
+    if (!window.EventSource) {
+        startPolling();
+        return null;
+    }
+
+    const source = new EventSource(`/api/events?channels=${encodeURIComponent(channels.join(','))}`);
+    source.addEventListener('versions', (event) => {
+        const { changed } = JSON.parse(event.data);
+        if (changed.length) onChange(changed);
+    });
+    source.addEventListener('open', () => {
+        if (pollTimer) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    });
+    source.addEventListener('error', () => {
+        // CLOSED: the stream was refused and the browser will not retry
+        if (source.readyState === EventSource.CLOSED) startPolling();
+    });
+    return source;
+}
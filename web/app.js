@@ -4,13 +4,14 @@
 // Configuration
 const CONFIG = {
     apiEndpoint: '/api/rankings',  // Flask API endpoint
-    refreshInterval: 300000,  // 5 minutes (auto-refresh)
+    refreshInterval: 300000,  // 5 minutes (polling fallback without the event stream)
     mockData: false  // Use real data from API (set to true for demo mode)
 };
 
 // State
 let currentData = null;
 let destinationsData = null;  // Add destinations data variable
+let destinationsLoading = false;  // Destinations request in flight
 let filters = {
     flightType: 'all',
     dateRange: 30,
@@ -23,12 +24,12 @@ let filters = {
 
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
+    loadInitialData();
     initializeEventListeners();
-    loadData();
     updateLastUpdateTime();
 
-    // Auto-refresh
-    setInterval(() => {
+    // Reload when the collector stored new flights
+    subscribeToChanges(['flights'], () => {
         loadData();
         updateLastUpdateTime();
     }, CONFIG.refreshInterval);
@@ -82,9 +83,6 @@ function initializeEventListeners() {
         loadData();
     });
 
-    // Load destinations on startup
-    loadDestinations();
-
     // Check initial visibility
     toggleDestinationFilters(filters.flightType);
 }
@@ -93,7 +91,7 @@ function toggleDestinationFilters(type) {
     const group = document.getElementById('destinationFilterGroup');
     if (type === 'departures' || type === 'all') { // Allowing for 'all' too as it might be useful
         group.style.display = 'block';
-        if (!destinationsData) {
+        if (!destinationsData && !destinationsLoading) {
             loadDestinations();
         }
     } else {
@@ -109,6 +107,67 @@ function toggleDestinationFilters(type) {
 
 
 // Data Loading
+
+// Query parameters of the rankings request for the current filters
+function rankingsParams() {
+    const params = new URLSearchParams({
+        days: filters.dateRange,
+        flight_type: filters.flightType,
+        min_flights: filters.minFlights
+    });
+
+    if (filters.airport) {
+        params.append('destination', filters.airport);
+    } else if (filters.country) {
+        params.append('country', filters.country);
+    } else if (filters.continent) {
+        params.append('continent', filters.continent);
+    }
+    return params;
+}
+
+// First paint: rankings and destinations in one /api/batch request
+async function loadInitialData() {
+    if (CONFIG.mockData) {
+        loadData();
+        loadDestinations();
+        return;
+    }
+
+    showLoading();
+    destinationsLoading = true;
+
+    let responses;
+    try {
+        responses = await fetchBatch({
+            rankings: { path: CONFIG.apiEndpoint, params: Object.fromEntries(rankingsParams()) },
+            destinations: { path: '/api/destinations' }
+        });
+    } catch (error) {
+        // Fall back to the separate requests
+        console.error('Batch request failed:', error);
+        destinationsLoading = false;
+        loadData();
+        loadDestinations();
+        return;
+    }
+
+    destinationsLoading = false;
+    if (responses.destinations.status === 200) {
+        destinationsData = responses.destinations.body;
+        populateContinentSelect();
+    } else {
+        loadDestinations();
+    }
+
+    if (responses.rankings.status === 200) {
+        showRankings(responses.rankings.body);
+        hideLoading();
+    } else {
+        showError(responses.rankings.body.message || 'Failed to fetch airline rankings');
+    }
+}
+
 async function loadData() {
     showLoading();
 
@@ -119,40 +178,16 @@ async function loadData() {
             // Use mock data for demonstration
             data = await generateMockData();
         } else {
-            // Fetch from API with filters
-            const params = new URLSearchParams({
-                days: filters.dateRange,
-                flight_type: filters.flightType,
-                min_flights: filters.minFlights
-            });
-
-            if (filters.airport) {
-                params.append('destination', filters.airport);
-            } else if (filters.country) {
-                params.append('country', filters.country);
-            } else if (filters.continent) {
-                params.append('continent', filters.continent);
+            // Conditional request: 304 when the rankings did not change since the last load
+            const result = await fetchJSON(`${CONFIG.apiEndpoint}?${rankingsParams().toString()}`);
+            if (result.notModified && currentData === result.data) {
+                hideLoading();
+                return;
             }
-
-
-            const response = await fetch(`${CONFIG.apiEndpoint}?${params.toString()}`);
-            if (!response.ok) throw new Error('Failed to fetch data');
-            data = await response.json();
+            data = result.data;
         }
 
-        currentData = data;
-
-        // Update First Update Metadata
-        if (data.firstUpdate) {
-            const firstDate = new Date(data.firstUpdate);
-            document.getElementById('firstUpdate').textContent = firstDate.toLocaleString('nl-NL', {
-                day: '2-digit',
-                month: '2-digit',
-                year: 'numeric'
-            });
-        }
-
-        applyFilters();
+        showRankings(data);
         hideLoading();
 
     } catch (error) {
@@ -160,6 +195,22 @@ async function loadData() {
     }
 }
 
+function showRankings(data) {
+    currentData = data;
+
+    // Update First Update Metadata
+    if (data.firstUpdate) {
+        const firstDate = new Date(data.firstUpdate);
+        document.getElementById('firstUpdate').textContent = firstDate.toLocaleString('nl-NL', {
+            day: '2-digit',
+            month: '2-digit',
+            year: 'numeric'
+        });
+    }
+
+    applyFilters();
+}
+
 // Apply Filters (Client-side sorting only)
 function applyFilters() {
     if (!currentData) return;
@@ -247,10 +298,14 @@ window.onclick = function (event) {
     }
 }
 
+// Flight list currently shown in the modal (for "Meer laden")
+const flightPages = { airlineCode: null, params: null, nextCursor: null };
+
 async function showFlightDetails(airlineCode) {
     modal.style.display = "block";
     document.getElementById('modalLoading').style.display = 'block';
     document.getElementById('modalFlightTableContainer').style.display = 'none';
+    document.getElementById('modalLoadMore').style.display = 'none';
     document.getElementById('modalAirlineName').textContent = 'Loading...';
 
     try {
@@ -271,9 +326,7 @@ async function showFlightDetails(airlineCode) {
 
         console.log('Flight details request:', `flight_type=${filters.flightType}`, `destination=${filters.destination}`);
 
-        const response = await fetch(`/api/airlines/${airlineCode}/flights?${params.toString()}`);
-        if (!response.ok) throw new Error('Failed to fetch details');
-        const data = await response.json();
+        const { data } = await fetchJSON(`/api/airlines/${airlineCode}/flights?${params.toString()}`);
 
         console.log(`Received ${data.flights.length} flights for ${airlineCode}`);
         if (data.flights.length > 0) {
@@ -282,6 +335,7 @@ async function showFlightDetails(airlineCode) {
 
         document.getElementById('modalAirlineName').textContent = data.airline.name;
         renderFlightTable(data.flights);
+        setFlightPage(airlineCode, params, data.nextCursor);
 
         document.getElementById('modalLoading').style.display = 'none';
         document.getElementById('modalFlightTableContainer').style.display = 'block';
@@ -293,9 +347,45 @@ async function showFlightDetails(airlineCode) {
     }
 }
 
-function renderFlightTable(flights) {
+function setFlightPage(airlineCode, params, nextCursor) {
+    flightPages.airlineCode = airlineCode;
+    flightPages.params = params;
+    flightPages.nextCursor = nextCursor;
+    document.getElementById('modalLoadMore').style.display = nextCursor ? 'inline-block' : 'none';
+}
+
+// Append the next page of flights to the modal table
+async function loadMoreFlights() {
+    const { airlineCode, params, nextCursor } = flightPages;
+    if (!nextCursor) return;
+
+    const button = document.getElementById('modalLoadMore');
+    button.disabled = true;
+    button.textContent = 'Laden...';
+
+    try {
+        const pageParams = new URLSearchParams(params);
+        pageParams.set('cursor', nextCursor);
+        const { data } = await fetchJSON(`/api/airlines/${airlineCode}/flights?${pageParams.toString()}`);
+
+        // Ignore the page if another airline was opened in the meantime
+        if (flightPages.airlineCode !== airlineCode) return;
+
+        renderFlightTable(data.flights, true);
+        setFlightPage(airlineCode, params, data.nextCursor);
+    } catch (error) {
+        console.error(error);
+    } finally {
+        button.disabled = false;
+        button.textContent = 'Meer laden';
+    }
+}
+
+document.getElementById('modalLoadMore').onclick = loadMoreFlights;
+
+function renderFlightTable(flights, append = false) {
     const tbody = document.getElementById('modalFlightsBody');
-    tbody.innerHTML = '';
+    if (!append) tbody.innerHTML = '';
 
     flights.forEach(flight => {
         const tr = document.createElement('tr');
@@ -527,6 +617,7 @@ window.AirlinesApp = {
 
 // Destination Drilldown Logic
 async function loadDestinations() {
+    destinationsLoading = true;
     try {
         const response = await fetch('/api/destinations');
         if (!response.ok) throw new Error('Failed to fetch destinations');
@@ -534,6 +625,8 @@ async function loadDestinations() {
         populateContinentSelect();
     } catch (error) {
         console.error('Error loading destinations:', error);
+    } finally {
+        destinationsLoading = false;
     }
 }
 
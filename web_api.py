@@ -4,12 +4,32 @@ Web API for Airlines Reliability Rankings
 Serves airline statistics from the database to the web interface
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, abort
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, RequestRedirect
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import wraps
+import base64
+import contextvars
+import hashlib
+import hmac
 import os
 import json
-from database import DatabaseManager
+import threading
+import numpy as np
+import config
+import event_stream
+import flight_export
+import metrics
+import query_stats
+import serialization
+from data_versions import DataVersionTracker
+from destination_catalog import DestinationCatalog
+from mapping_store import MappingStore, MappingView
+from response_cache import ResponseCache
+from storage import create_storage_backend
 from dotenv import load_dotenv
 import traceback
 
@@ -18,127 +38,223 @@ load_dotenv()
 
 app = Flask(__name__, static_folder='web', static_url_path='')
 CORS(app)  # Enable CORS for development
+serialization.install(app)  # Fast JSON encoding and gzip/brotli compression
 
 # Database manager
-db = DatabaseManager()
+db = create_storage_backend()
 
+# Data versions bumped by the pipeline; invalidate cached responses and ETags
+data_versions = DataVersionTracker(db.get_data_versions)
+response_cache = ResponseCache(data_versions)
 
-# Load airline mapping
-AIRLINE_MAPPING = {}
-try:
-    mapping_path = os.path.join(os.path.dirname(__file__), 'airline_mapping.json')
-    if os.path.exists(mapping_path):
-        with open(mapping_path, 'r', encoding='utf-8') as f:
-            AIRLINE_MAPPING = json.load(f)
-        print(f"Loaded {len(AIRLINE_MAPPING)} airlines from mapping file")
-    else:
-        print(f"Warning: Airline mapping file not found at {mapping_path}")
-except Exception as e:
-    print(f"Error loading airline mapping: {e}")
-
-# Load destination mapping
-DESTINATION_MAPPING = {}
-try:
-
-    dest_mapping_path = os.path.join(os.path.dirname(__file__), 'destination_mapping.json')
-    if os.path.exists(dest_mapping_path):
-        with open(dest_mapping_path, 'r', encoding='utf-8') as f:
-            DESTINATION_MAPPING = json.load(f)
-        print(f"Loaded {len(DESTINATION_MAPPING)} destinations from mapping file")
-    else:
-        print(f"Warning: Destination mapping file not found at {dest_mapping_path}")
-        
-    # Load full destination details for drilldown
-    dest_full_path = os.path.join(os.path.dirname(__file__), 'destinations_full.json')
-    if os.path.exists(dest_full_path):
-        with open(dest_full_path, 'r', encoding='utf-8') as f:
-            DESTINATIONS_FULL = json.load(f)
-        print(f"Loaded {len(DESTINATIONS_FULL)} full destinations")
-    else:
-        print(f"Warning: Full destination details not found at {dest_full_path}")
-        DESTINATIONS_FULL = []
-        
-except Exception as e:
-    print(f"Error loading destination mapping: {e}")
-    DESTINATIONS_FULL = []
+# Pushes data version changes to open dashboards (/api/events); the poll thread
+# reads on its own connection
+event_broadcaster = event_stream.VersionBroadcaster(
+    DataVersionTracker(event_stream.DedicatedVersionSource(db))
+)
 
-@app.route('/api/destinations')
-def get_destinations():
-    """Get destinations that actually have flights from Schiphol"""
-    try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
-            # 1. Get unique destination codes from actual flight data
-            query = """
-                SELECT DISTINCT destinations 
-                FROM flights 
-                WHERE destinations IS NOT NULL 
-                  AND destinations != ''
-                  AND flight_direction = 'D'
-            """
-            cursor.execute(query)
-            results = cursor.fetchall()
+# Request, query, cache and pool metrics for /metrics
+metrics.install(app, db)
+
+# Served destinations, kept in memory and refreshed when new flights arrive
+destination_catalog = DestinationCatalog(db, data_versions)
+
+# Threads for the independent queries of one request (see enable_concurrency)
+query_executor = None
+_query_thread = threading.local()
+
+# The primary connection is shared; health checks take turns when serving threaded
+primary_lock = threading.Lock()
+
+
+def read_cursor():
+    """Cursor for read-only queries; uses a healthy replica when one is configured"""
+    return db.get_read_connection().cursor()
+
+
+def enable_concurrency(max_workers):
+    """
+    Serve requests from multiple threads and run independent queries in parallel
+    
+    Gives every thread its own read connection and starts the pool that
+    run_concurrently() uses. Called by the ASGI entry point (web_asgi.py); the
+    sync gunicorn workers keep running the queries of a request one by one.
+    
+    Args:
+        max_workers: Size of the query thread pool (each thread holds a connection)
+    """
+    global query_executor
+    db.enable_thread_local_reads()
+    if query_executor is None:
+        query_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query',
+                                            initializer=_mark_query_thread)
+        metrics.set_pool_size('query', max_workers)
+
+
+def _mark_query_thread():
+    _query_thread.active = True
+
+
+def _run_pooled(func, *args):
+    with metrics.pool_task('query'):
+        return func(*args)
+
+
+def run_concurrently(*calls):
+    """
+    Run independent calls, in parallel when concurrency is enabled
+    
+    The first call runs in the calling thread, the others in the query pool.
+    Inside the pool calls run one by one, so pool threads never wait for
+    each other.
+    
+    Args:
+        calls: (function, *args) tuples
+    
+    Returns:
+        List of the results, in the order of the calls
+    """
+    if query_executor is None or getattr(_query_thread, 'active', False):
+        return [func(*args) for func, *args in calls]
+    (first, *first_args), *others = calls
+    # Each call runs in a copy of the caller's context (per-request metrics)
+    futures = [query_executor.submit(contextvars.copy_context().run, _run_pooled, func, *args)
+               for func, *args in others]
+    results = [first(*first_args)]
+    results.extend(future.result() for future in futures)
+    return results
+
+
+def internal_only(view):
+    """
+    Restrict an endpoint to internal callers
+    
+    Allowed are loopback requests that did not pass through nginx (which sets
+    X-Real-IP / X-Forwarded-For), and requests carrying INTERNAL_API_TOKEN in
+    the X-Internal-Token header. Everyone else gets a 404.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('X-Internal-Token')
+        if config.INTERNAL_API_TOKEN and token and hmac.compare_digest(token, config.INTERNAL_API_TOKEN):
+            return view(*args, **kwargs)
+        proxied = request.headers.get('X-Real-IP') or request.headers.get('X-Forwarded-For')
+        if request.remote_addr in ('127.0.0.1', '::1') and not proxied:
+            return view(*args, **kwargs)
+        abort(404)
+    return wrapper
+
+
+def cached_response(channel='flights'):
+    """
+    Serve an endpoint from the response cache while the data version of its
+    channel is unchanged
+    
+    Only 200 responses are stored. The X-Cache header tells whether a response
+    came from the cache (HIT) or was computed (MISS).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled:
+                return view(*args, **kwargs)
             
-            # Extract all unique airport codes (handle comma-separated)
-            airport_codes = set()
-            for row in results:
-                dest_str = row['destinations']
-                if dest_str:
-                    # Split by comma and clean up
-                    codes = [code.strip() for code in str(dest_str).split(',')]
-                    airport_codes.update(codes)
-            
-            if not airport_codes:
-                return jsonify([])
-
-            # 2. Get details for these airports from relational tables
-            # Prepare placeholders for IN clause
-            placeholders = ', '.join(['%s'] * len(airport_codes))
-            # Convert set to list for params
-            params = list(airport_codes)
-            
-            query = f"""
-                SELECT 
-                    a.iata_code as code, 
-                    a.name, 
-                    c.name as country, 
-                    co.name as continent
-                FROM airports a
-                LEFT JOIN countries c ON a.country_id = c.id
-                LEFT JOIN continents co ON c.continent_id = co.id
-                WHERE a.iata_code IN ({placeholders})
-                ORDER BY a.name
-            """
+            # Read the version before computing, so data that changes meanwhile
+            # is tagged with the older version and rebuilt on the next request
+            version = response_cache.current_version(channel)
+            if version is None:
+                return view(*args, **kwargs)
             
-            cursor.execute(query, params)
-            dest_rows = cursor.fetchall()
+            key = response_cache.make_key(request.path, request.args)
+            entry = response_cache.get(key, channel, version)
+            if entry is not None:
+                response = app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
             
-            destinations = []
-            found_codes = set()
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.put(key, response.get_data(), response.status_code,
+                                   response.mimetype, channel, version)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def data_updated_at(channel='flights'):
+    """
+    When the data of a channel last changed (ISO 8601), for payloads that
+    may be served from the response cache long after they were computed
+    
+    Falls back to the current time when the versions cannot be read (such
+    responses are not cached); None if the channel was never bumped.
+    """
+    state = data_versions.get(channel)
+    if state is None:
+        return datetime.now().isoformat()
+    return state.updated_at.isoformat() if state.updated_at else None
+
+
+def conditional_response(channel='flights'):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 while the data version
+    of the channel is unchanged, without running the endpoint's queries
+    
+    The ETag is derived from the route, the sorted query parameters, today's
+    date and the channel version; Last-Modified is the time of the last bump
+    (at least the start of today, since the date windows move daily).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = data_versions.get(channel)
+            if state is None:
+                return view(*args, **kwargs)
             
-            for row in dest_rows:
-                code = row['code']
-                found_codes.add(code)
-                destinations.append({
-                    'code': code,
-                    'name': row['name'] or code,
-                    'country': row['country'] or 'Unknown',
-                    'continent': row['continent'] or 'Unknown'
-                })
+            # The date windows (days=N) move at midnight even without new data
+            today = date.today()
+            key = response_cache.make_key(request.path, request.args)
+            etag = hashlib.sha1(
+                f"{key}|{channel}|{state.version}|{today.isoformat()}".encode('utf-8')
+            ).hexdigest()[:20]
+            start_of_day = datetime.combine(today, datetime.min.time())
+            updated_at = state.updated_at.replace(tzinfo=None) if state.updated_at else start_of_day
+            last_modified = max(updated_at, start_of_day).astimezone().replace(microsecond=0)
             
-            # Add any codes that weren't found in our DB tables (fallback)
-            for code in airport_codes:
-                if code not in found_codes:
-                    # Try to look it up in the old JSON fallback if loaded, or just basic entry
-                    fallback = {'code': code, 'name': code, 'country': 'Unknown', 'continent': 'Unknown'}
-                    # If we still have DESTINATIONS_FULL loaded, maybe check there? 
-                    # But ideally the DB should be the source.
-                    destinations.append(fallback)
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(request.if_modified_since) and last_modified <= request.if_modified_since
             
-            # Sort by name
-            destinations.sort(key=lambda x: x['name'])
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
             
-            return jsonify(destinations)
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            # Let browsers keep the response but revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+# Airline and destination names, memory-mapped from the compiled mapping file
+# (shared by all workers through the page cache; see mapping_store.py)
+mapping_store = MappingStore()
+mapping_store.refresh()  # Build/map at import, so `gunicorn --preload` does it once in the master
+AIRLINE_MAPPING = MappingView(mapping_store, 'airlines')
+DESTINATION_MAPPING = MappingView(mapping_store, 'destinations')
+
+@app.route('/api/destinations')
+def get_destinations():
+    """Get destinations that actually have flights from Schiphol"""
+    try:
+        return serialization.json_array_response(destination_catalog.destinations())
             
     except Exception as e:
         print(f"Error getting destinations: {e}")
@@ -151,8 +267,7 @@ def get_destinations():
 def get_airports():
     """Get all airports from the database"""
     try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             cursor.execute("""
                 SELECT 
                     a.id, 
@@ -183,7 +298,7 @@ def get_airports():
                     'createdAt': row['created_at'].isoformat() if row['created_at'] else None
                 })
             
-            return jsonify(airports)
+            return serialization.json_array_response(airports)
             
     except Exception as e:
         print(f"Error getting airports: {e}")
@@ -220,81 +335,173 @@ def aircraft():
     return send_from_directory('web', 'aircraft.html')
 
 
+def build_destination_filter(destination=None, country=None, continent=None):
+    """
+    Build a flights filter on the normalized flight_destinations table
+    
+    A flight matches when any stop on its route is the given airport, or lies
+    in the given country/continent. The subquery is resolved through the
+    (iata_code, flight_id) index as a semi-join.
+    
+    Returns:
+        Tuple of (SQL fragment starting with ' AND', list of parameters)
+    """
+    if destination:
+        return """ AND id IN (
+                    SELECT fd.flight_id FROM flight_destinations fd
+                    WHERE fd.iata_code = %s
+                )""", [destination]
+    if country:
+        return """ AND id IN (
+                    SELECT fd.flight_id FROM flight_destinations fd
+                    JOIN airports a ON a.iata_code = fd.iata_code
+                    JOIN countries c ON a.country_id = c.id
+                    WHERE c.name = %s
+                )""", [country]
+    if continent:
+        return """ AND id IN (
+                    SELECT fd.flight_id FROM flight_destinations fd
+                    JOIN airports a ON a.iata_code = fd.iata_code
+                    JOIN countries c ON a.country_id = c.id
+                    JOIN continents co ON c.continent_id = co.id
+                    WHERE co.name = %s
+                )""", [continent]
+    return "", []
+
+
+def encode_page_cursor(row):
+    """
+    Opaque cursor token for the position after a flight row
+    
+    The position is the row's (schedule_date, schedule_time, id) keyset,
+    stored as URL-safe base64 JSON with the time in seconds.
+    """
+    schedule_time = row['schedule_time']
+    if hasattr(schedule_time, 'total_seconds'):
+        seconds = int(schedule_time.total_seconds())
+    elif schedule_time is not None:
+        seconds = schedule_time.hour * 3600 + schedule_time.minute * 60 + schedule_time.second
+    else:
+        seconds = None
+    payload = json.dumps([row['schedule_date'].isoformat(), seconds, row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_page_cursor(token):
+    """
+    Read a cursor token made by encode_page_cursor
+    
+    Returns:
+        (schedule_date, schedule_time or None, id)
+    
+    Raises:
+        ValueError: if the token is not a valid cursor
+    """
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        schedule_date, seconds, flight_id = json.loads(payload)
+        schedule_time = timedelta(seconds=int(seconds)) if seconds is not None else None
+        return date.fromisoformat(schedule_date), schedule_time, int(flight_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token[:40]}") from e
+
+def build_keyset_filter(position):
+    """
+    Filter for the flights after a cursor position in
+    ORDER BY schedule_date DESC, schedule_time DESC, id DESC
+    
+    Written out instead of a row comparison so the range can use the
+    (airline_code, schedule_date, schedule_time, id) index. NULL times sort
+    last in descending order.
+    
+    Returns:
+        SQL snippet starting with AND, and its parameters
+    """
+    schedule_date, schedule_time, flight_id = position
+    if schedule_time is None:
+        return """
+            AND (schedule_date < %s
+                 OR (schedule_date = %s AND schedule_time IS NULL AND id < %s))""", [
+            schedule_date, schedule_date, flight_id]
+    return """
+            AND (schedule_date < %s
+                 OR (schedule_date = %s AND (schedule_time < %s
+                                             OR schedule_time IS NULL
+                                             OR (schedule_time = %s AND id < %s))))""", [
+        schedule_date, schedule_date, schedule_time, schedule_time, flight_id]
+
+
 def get_airline_statistics(start_date, end_date, flight_type='all', min_flights=10, destination=None, country=None, continent=None):
     """
     Get statistics for all airlines within the date range
     """
     try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             # 1. Get aggregated stats
             params = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
             
-            query = """
-                SELECT 
-                    airline_code,
-                    COUNT(*) as total_flights,
-                    SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
-                    AVG(delay_minutes) as avg_delay
-                FROM flights
-                WHERE schedule_date BETWEEN %s AND %s
-                    AND actual_time IS NOT NULL
-            """
+            dest_filter, dest_params = build_destination_filter(destination, country, continent)
+            if dest_filter:
+                # Destination filters need the individual flights
+                query = """
+                    SELECT 
+                        airline_code,
+                        COUNT(*) as total_flights,
+                        SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
+                        AVG(delay_minutes) as avg_delay
+                    FROM flights
+                    WHERE schedule_date BETWEEN %s AND %s
+                        AND actual_time IS NOT NULL
+                """
+            else:
+                # Otherwise read the pre-aggregated per-day rows
+                query = """
+                    SELECT 
+                        NULLIF(airline_code, '') as airline_code,
+                        SUM(flights) as total_flights,
+                        SUM(on_time) as on_time_flights,
+                        SUM(sum_delay) / NULLIF(SUM(delay_count), 0) as avg_delay
+                    FROM airline_daily_stats
+                    WHERE schedule_date BETWEEN %s AND %s
+                """
             
             if flight_type == 'departures':
                 query += " AND flight_direction = 'D'"
             elif flight_type == 'arrivals':
                 query += " AND flight_direction = 'A'"
                 
-            if destination:
-                # Match exact airport code (handles comma-separated destinations)
-                query += " AND (destinations = %s OR destinations LIKE %s OR destinations LIKE %s OR destinations LIKE %s)"
-                params.extend([
-                    destination,                    # Exact match
-                    f"{destination},%",            # Start
-                    f"%,{destination}",            # End
-                    f"%,{destination},%"           # Middle
-                ])
-            elif country:
-                # Filter by country name
-                query += """ AND destinations IN (
-                    SELECT a.iata_code FROM airports a 
-                    JOIN countries c ON a.country_id = c.id 
-                    WHERE c.name = %s
-                )"""
-                params.append(country)
-            elif continent:
-                # Filter by continent name
-                query += """ AND destinations IN (
-                    SELECT a.iata_code FROM airports a 
-                    JOIN countries c ON a.country_id = c.id 
-                    JOIN continents co ON c.continent_id = co.id
-                    WHERE co.name = %s
-                )"""
-                params.append(continent)
-
+            query += dest_filter
+            params.extend(dest_params)
                 
             query += " GROUP BY airline_code HAVING total_flights >= %s"
             params.append(min_flights)
             
-            cursor.execute(query, params)
-            results = cursor.fetchall()
+            if query_executor is None:
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+                
+                # 2. Calculate the trends of all airlines in one query
+                # Use the same start date for trend calculation
+                trends = calculate_trends(cursor, [row['airline_code'] for row in results], params[0])
+            else:
+                # 2. Calculate the trends of all airlines on another connection
+                # while the aggregation runs
+                results, trends = run_concurrently(
+                    (fetch_all, cursor, query, params),
+                    (get_all_trends, params[0])
+                )
             
             airlines = []
             for row in results:
                 airline_code = row['airline_code']
                 airline_name = AIRLINE_MAPPING.get(airline_code, airline_code)
                 
-                total_flights = row['total_flights']
+                total_flights = int(row['total_flights'])
                 on_time_flights = float(row['on_time_flights']) if row['on_time_flights'] else 0
                 avg_delay = float(row['avg_delay']) if row['avg_delay'] else 0
                 
                 on_time_percentage = (on_time_flights / total_flights * 100)
                 reliability_score = on_time_percentage - (avg_delay / 10)
-                
-                # 2. Calculate trend
-                # Use the same start date for trend calculation
-                trend = calculate_trend(cursor, airline_code, params[0])
+                trend = trends.get(airline_code or '', 0.0)
                 
                 airlines.append({
                     'code': airline_code,
@@ -303,7 +510,8 @@ def get_airline_statistics(start_date, end_date, flight_type='all', min_flights=
                     'onTimePercentage': round(on_time_percentage, 1),
                     'avgDelay': round(avg_delay, 1),
                     'reliabilityScore': round(reliability_score, 1),
-                    'trend': round(trend, 2)
+                    # + 0.0 turns a rounded -0.0 into 0.0
+                    'trend': round(trend, 2) + 0.0
                 })
                 
             # Sort by reliability score desc
@@ -315,7 +523,19 @@ def get_airline_statistics(start_date, end_date, flight_type='all', min_flights=
         traceback.print_exc()
         return []
 
+def fetch_all(cursor, query, params):
+    """Execute a query and return all rows"""
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def get_all_trends(current_start_date):
+    """Trends of every airline with daily stats since the start date (own cursor)"""
+    with read_cursor() as cursor:
+        return calculate_trends(cursor, None, current_start_date)
+
 @app.route('/api/rankings')
+@conditional_response('flights')
+@cached_response('flights')
 def get_rankings():
     """
     Get airline reliability rankings
@@ -339,8 +559,11 @@ def get_rankings():
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        # Get airline statistics from database
-        airlines = get_airline_statistics(start_date, end_date, flight_type, min_flights, destination, country, continent)
+        # Get airline statistics and the first flight date from database
+        airlines, first_update = run_concurrently(
+            (get_airline_statistics, start_date, end_date, flight_type, min_flights, destination, country, continent),
+            (get_first_update_date,)
+        )
 
         
         # Calculate total flights
@@ -349,8 +572,8 @@ def get_rankings():
         return jsonify({
             'airlines': airlines,
             'totalFlights': total_flights,
-            'lastUpdate': datetime.now().isoformat(),
-            'firstUpdate': get_first_update_date(),
+            'lastUpdate': data_updated_at('flights'),
+            'firstUpdate': first_update,
             'dateRange': {
                 'start': start_date.isoformat(),
                 'end': end_date.isoformat(),
@@ -372,8 +595,7 @@ def get_rankings():
 def get_first_update_date():
     """Get the date of the earliest flight record"""
     try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             cursor.execute("SELECT MIN(schedule_date) as first_date FROM flights")
             result = cursor.fetchone()
             if result and result['first_date']:
@@ -382,85 +604,94 @@ def get_first_update_date():
         print(f"Error getting first update date: {e}")
     return None
 
-def calculate_trend(cursor, airline_iata, current_start_date, days=30):
+def calculate_trends(cursor, airline_codes, current_start_date):
     """
-    Calculate trend using linear regression slope of daily scores
-    Returns: Average daily change in score (slope)
+    Calculate the trend of several airlines using the linear regression slope of daily scores
+    
+    The daily stats of all airlines are read with one grouped query and the slopes
+    are computed for all airlines at once with NumPy.
+    
+    Args:
+        cursor: Database cursor
+        airline_codes: Airline IATA codes (None for flights without airline),
+            or None for every airline with daily stats in the period
+        current_start_date: First day of the period ('YYYY-MM-DD'), the period runs until today
+    
+    Returns:
+        Dict of airline code ('' for None) -> average daily change in score (slope)
     """
+    codes = sorted({code or '' for code in airline_codes}) if airline_codes is not None else None
+    trends = {code: 0.0 for code in codes or []}
+    if codes == []:
+        return trends
+    
     try:
-        # Get daily statistics for the period
-        end_date = datetime.now()
         # Ensure we cover the full range up to today for the trend
-        # current_start_date is passed from the main function (end_date - days)
+        end_date = datetime.now()
         
-        query = """
+        code_filter = ""
+        params = [current_start_date, end_date]
+        if codes is not None:
+            code_filter = f"airline_code IN ({', '.join(['%s'] * len(codes))}) AND"
+            params = codes + params
+        query = f"""
             SELECT 
+                airline_code,
                 schedule_date,
-                COUNT(*) as total_flights,
-                SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
-                AVG(delay_minutes) as avg_delay
-            FROM flights
-            WHERE airline_code = %s
-                AND schedule_date BETWEEN %s AND %s
-                AND actual_time IS NOT NULL
-            GROUP BY schedule_date
-            ORDER BY schedule_date ASC
+                SUM(flights) as total_flights,
+                SUM(on_time) as on_time_flights,
+                SUM(sum_delay) / NULLIF(SUM(delay_count), 0) as avg_delay
+            FROM airline_daily_stats
+            WHERE {code_filter} schedule_date BETWEEN %s AND %s
+            GROUP BY airline_code, schedule_date
         """
         
-        cursor.execute(query, (airline_iata, current_start_date, end_date))
+        cursor.execute(query, params)
         results = cursor.fetchall()
+        if not results:
+            return trends
         
-        if not results or len(results) < 2:
-            return 0.0
-            
-        x_values = [] # Days since start
-        y_values = [] # Scores
+        # Days with at least one flight; X is days since the start of the period
+        rows = [row for row in results if row['total_flights'] and row['total_flights'] >= 1]
+        if not rows:
+            return trends
         
-        start_ts = results[0]['schedule_date'].toordinal()
+        if codes is None:
+            codes = sorted({row['airline_code'] or '' for row in rows})
+        start_ts = datetime.strptime(current_start_date, '%Y-%m-%d').toordinal()
+        code_index = {code: i for i, code in enumerate(codes)}
         
-        for row in results:
-            if row['total_flights'] < 1:
-                continue
-                
-            total_flights = row['total_flights']
-            on_time_flights = float(row['on_time_flights']) if row['on_time_flights'] else 0
-            avg_delay = float(row['avg_delay']) if row['avg_delay'] else 0
-            
-            on_time_pct = (on_time_flights / total_flights * 100)
-            score = on_time_pct - (avg_delay / 10)
-            
-            # X is days relative to start of data points
-            day_idx = row['schedule_date'].toordinal() - start_ts
-            
-            x_values.append(day_idx)
-            y_values.append(score)
-            
-        if len(x_values) < 2:
-            return 0.0
-            
-        # Calculate Linear Regression Slope (m)
-        # m = (N * sum(xy) - sum(x) * sum(y)) / (N * sum(x^2) - sum(x)^2)
+        group = np.fromiter((code_index[row['airline_code'] or ''] for row in rows), dtype=np.intp, count=len(rows))
+        x = np.fromiter((row['schedule_date'].toordinal() - start_ts for row in rows), dtype=np.float64, count=len(rows))
+        total_flights = np.fromiter((row['total_flights'] for row in rows), dtype=np.float64, count=len(rows))
+        on_time_flights = np.fromiter((row['on_time_flights'] or 0 for row in rows), dtype=np.float64, count=len(rows))
+        avg_delay = np.fromiter((row['avg_delay'] or 0 for row in rows), dtype=np.float64, count=len(rows))
         
-        n = len(x_values)
-        sum_x = sum(x_values)
-        sum_y = sum(y_values)
-        sum_xy = sum(x * y for x, y in zip(x_values, y_values))
-        sum_x_sq = sum(x * x for x in x_values)
+        y = on_time_flights / total_flights * 100 - avg_delay / 10
         
-        denominator = (n * sum_x_sq - sum_x * sum_x)
+        # Linear Regression Slope (m) per airline
+        # m = (N * sum(xy) - sum(x) * sum(y)) / (N * sum(x^2) - sum(x)^2)
+        size = len(codes)
+        n = np.bincount(group, minlength=size).astype(np.float64)
+        sum_x = np.bincount(group, weights=x, minlength=size)
+        sum_y = np.bincount(group, weights=y, minlength=size)
+        sum_xy = np.bincount(group, weights=x * y, minlength=size)
+        sum_x_sq = np.bincount(group, weights=x * x, minlength=size)
         
-        if denominator == 0:
-            return 0.0
-            
-        slope = (n * sum_xy - sum_x * sum_y) / denominator
+        denominator = n * sum_x_sq - sum_x * sum_x
+        valid = (n >= 2) & (denominator != 0)
+        slopes = np.zeros(size)
+        slopes[valid] = (n * sum_xy - sum_x * sum_y)[valid] / denominator[valid]
         
-        return slope
+        return dict(zip(codes, slopes.tolist()))
         
     except Exception as e:
-        print(f"Error calculating trend: {e}")
-        return 0.0
+        print(f"Error calculating trends: {e}")
+        return trends
 
 @app.route('/api/stats')
+@conditional_response('flights')
+@cached_response('flights')
 def get_overall_stats():
     """Get overall statistics"""
     try:
@@ -468,25 +699,23 @@ def get_overall_stats():
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             
             query = """
                 SELECT 
-                    COUNT(*) as total_flights,
-                    COUNT(DISTINCT airline_code) as total_airlines,
-                    SUM(CASE WHEN on_time = 1 THEN 1 ELSE 0 END) as on_time_flights,
-                    AVG(delay_minutes) as avg_delay
-                FROM flights
+                    COALESCE(SUM(flights), 0) as total_flights,
+                    COUNT(DISTINCT NULLIF(airline_code, '')) as total_airlines,
+                    SUM(on_time) as on_time_flights,
+                    SUM(sum_delay) / NULLIF(SUM(delay_count), 0) as avg_delay
+                FROM airline_daily_stats
                 WHERE schedule_date BETWEEN %s AND %s
-                    AND actual_time IS NOT NULL
             """
             
             cursor.execute(query, (start_date, end_date))
             result = cursor.fetchone()
             
             if result:
-                total_flights = result['total_flights']
+                total_flights = int(result['total_flights'])
                 total_airlines = result['total_airlines']
                 on_time_flights = float(result['on_time_flights']) if result['on_time_flights'] else 0
                 avg_delay = float(result['avg_delay']) if result['avg_delay'] else 0
@@ -517,15 +746,19 @@ def get_overall_stats():
 def health_check():
     """Health check endpoint"""
     try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT 1")
+        with primary_lock:
+            conn = db.get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
             
-        return jsonify({
+        response = {
             'status': 'healthy',
             'database': 'connected',
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if getattr(db, 'replicas', None):
+            response['replicas'] = db.replica_status()
+        return jsonify(response)
     except Exception as e:
         return jsonify({
             'status': 'unhealthy',
@@ -534,14 +767,177 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 503
 
+# Endpoints that /api/batch may call (read-only dashboard data)
+BATCH_ENDPOINTS = {
+    'get_rankings', 'get_overall_stats', 'get_destinations', 'get_airports',
+    'get_destination_stats', 'get_aircraft_stats', 'get_aircraft_airlines',
+    'get_airline_flights', 'get_collection_logs',
+}
+
+_api_url_map = None
+
+def api_url_map():
+    """
+    URL rules under /api/ only, for resolving batch sub-requests
+    
+    The static files are served from the root (static_url_path=''), so on the
+    full url_map an unknown /api/ path would match the static catch-all rule.
+    """
+    global _api_url_map
+    if _api_url_map is None:
+        _api_url_map = Map(
+            [rule.empty() for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')],
+            converters=app.url_map.converters
+        )
+    return _api_url_map
+
+def run_batch_request(path, params):
+    """
+    Run one GET sub-request of /api/batch through the normal request handling
+    (response cache, conditional response decorators, error handlers)
+    
+    Returns:
+        (status code, JSON body bytes)
+    """
+    adapter = api_url_map().bind('localhost')
+    try:
+        endpoint, _ = adapter.match(path, method='GET')
+    except (HTTPException, RequestRedirect):
+        return 404, app.json.dumps({'error': f"Unknown route: {path}"}).encode('utf-8')
+    if endpoint not in BATCH_ENDPOINTS:
+        return 400, app.json.dumps({'error': f"Route cannot be batched: {path}"}).encode('utf-8')
+    
+    with app.test_request_context(path, method='GET', query_string=params):
+        response = app.full_dispatch_request()
+        body = response.get_data()
+    if response.mimetype != 'application/json':
+        body = app.json.dumps({'error': body.decode('utf-8', 'replace')}).encode('utf-8')
+    return response.status_code, body.strip()
+
+@app.route('/api/batch', methods=['POST'])
+def batch_requests():
+    """
+    Run several named GET requests in one round trip
+    
+    Body: {"requests": {"name": {"path": "/api/rankings", "params": {"days": 30}}, ...}}
+    Response: {"responses": {"name": {"status": 200, "body": ...}, ...}}
+    
+    Sub-requests run one after another on this request's connection, or
+    concurrently on the query pool when concurrency is enabled (web_asgi.py).
+    """
+    payload = request.get_json(silent=True)
+    sub_requests = payload.get('requests') if isinstance(payload, dict) else None
+    if not isinstance(sub_requests, dict) or not sub_requests:
+        return jsonify({'error': "Expected a JSON object with a 'requests' object"}), 400
+    if len(sub_requests) > config.BATCH_SETTINGS['max_requests']:
+        return jsonify({'error': f"At most {config.BATCH_SETTINGS['max_requests']} requests per batch"}), 400
+    
+    calls = []
+    for name, sub_request in sub_requests.items():
+        if not isinstance(sub_request, dict):
+            sub_request = {}
+        path = sub_request.get('path')
+        params = sub_request.get('params') or {}
+        if not isinstance(path, str) or not path.startswith('/api/') or not isinstance(params, dict):
+            return jsonify({'error': f"Request '{name}' needs a 'path' under /api/ and optional 'params' object"}), 400
+        params = {key: str(value) for key, value in params.items() if value is not None}
+        calls.append((run_batch_request, path, params))
+    
+    results = run_concurrently(*calls)
+    
+    # Splice the sub-responses' JSON into the combined payload without re-encoding
+    parts = [
+        app.json.dumps(name).encode('utf-8') + b':{"status":' + str(status).encode('ascii') + b',"body":' + body + b'}'
+        for name, (status, body) in zip(sub_requests, results)
+    ]
+    return app.response_class(b'{"responses":{' + b','.join(parts) + b'}}\n', mimetype='application/json')
+
+@app.route('/api/events')
+def stream_events():
+    """
+    Server-Sent Events: a 'versions' event whenever a data channel changes
+    
+    Query parameter 'channels' limits the events to some channels (comma
+    separated, e.g. 'flights'). Under web_asgi.py this path is served by the
+    event loop instead; here every open stream holds a server thread.
+    """
+    if not request.environ.get('wsgi.multithread'):
+        # A stream would occupy a single-threaded (sync) worker for good
+        return jsonify({
+            'error': 'Event stream not available on this server',
+            'message': 'Serve the API with web_asgi.py to enable /api/events'
+        }), 503
+    if event_broadcaster.streams >= config.EVENT_STREAM_SETTINGS['max_threaded_streams']:
+        return jsonify({'error': 'Too many event streams', 'message': 'Poll instead'}), 503, {'Retry-After': '60'}
+    
+    stream = event_broadcaster.stream(
+        event_stream.parse_channels(request.args.get('channels')),
+        request.headers.get('Last-Event-ID')
+    )
+    return Response(stream, headers=event_stream.STREAM_HEADERS)
+
+@app.route('/api/export/flights')
+def export_flights():
+    """
+    Stream flights as CSV or NDJSON (see flight_export.py)
+    
+    Query parameters: start / end (YYYY-MM-DD, default the last
+    EXPORT_SETTINGS['default_days'] days), airline, direction (A or D),
+    destination (IATA code), format (csv or ndjson) and gzip=true for a
+    .gz file. Single-threaded (sync) workers allow at most
+    EXPORT_SETTINGS['sync_max_days'] days instead of 'max_days'.
+    """
+    fmt = request.args.get('format', default='csv', type=str).lower()
+    if fmt not in flight_export.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(flight_export.FORMATS)}"}), 400
+    direction = request.args.get('direction', default=None, type=str)
+    if direction:
+        direction = direction.upper()
+        if direction not in ('A', 'D'):
+            return jsonify({'error': 'direction must be A or D'}), 400
+    airline = request.args.get('airline', default=None, type=str)
+    destination = request.args.get('destination', default=None, type=str)
+    
+    settings = config.EXPORT_SETTINGS
+    # Sync workers serve one request at a time and are killed after --timeout
+    max_days = settings['max_days'] if request.environ.get('wsgi.multithread') else settings['sync_max_days']
+    try:
+        end_text = request.args.get('end')
+        end = date.fromisoformat(end_text) if end_text else date.today()
+        start_text = request.args.get('start')
+        start = date.fromisoformat(start_text) if start_text else end - timedelta(days=settings['default_days'] - 1)
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates (YYYY-MM-DD)'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    if (end - start).days + 1 > max_days:
+        return jsonify({'error': f"An export covers at most {max_days} days on this server"}), 400
+    
+    body = flight_export.stream_flights(db, fmt, start, end, airline.upper() if airline else None,
+                                        direction, destination.upper() if destination else None)
+    filename = f"flights_{start.isoformat()}_{end.isoformat()}.{fmt}"
+    mimetype = flight_export.FORMATS[fmt]
+    if request.args.get('gzip', default='false', type=str).lower() == 'true':
+        # A .gz file rather than Content-Encoding, so clients save it compressed
+        body = serialization.compress_chunks(body, 'gzip')
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    response = Response(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Let nginx pass chunks on as they are produced
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.cache_control.no_store = True
+    return response
+
 @app.route('/api/logs/collection')
+@conditional_response('collection_log')
 def get_collection_logs():
     """Get recent data collection logs"""
     try:
         limit = request.args.get('limit', default=50, type=int)
         
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             
             query = """
                 SELECT 
@@ -591,27 +987,38 @@ def get_collection_logs():
         }), 500
 
 @app.route('/api/airlines/<airline_code>/flights')
+@conditional_response('flights')
 def get_airline_flights(airline_code):
     """
-    Get detailed flight list for a specific airline
+    Get detailed flight list for a specific airline, newest first
+    
+    Paged by keyset: 'limit' flights per page (at most max_page_size) and a
+    'nextCursor' token that is passed back as 'cursor' for the next page.
     """
     try:
         days = request.args.get('days', default=1, type=int)
         flight_type = request.args.get('flight_type', default='all', type=str)
-        limit = request.args.get('limit', default=100, type=int)
+        limit = request.args.get('limit', default=config.PAGINATION_SETTINGS['default_page_size'], type=int)
+        limit = max(1, min(limit, config.PAGINATION_SETTINGS['max_page_size']))
+        page_cursor = request.args.get('cursor', default=None, type=str)
         destination = request.args.get('destination', default=None, type=str)
         country = request.args.get('country', default=None, type=str)
         continent = request.args.get('continent', default=None, type=str)
         
+        try:
+            position = decode_page_cursor(page_cursor) if page_cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e), 'message': 'Invalid page cursor'}), 400
+        
         # Calculate date range
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             # Build query
             query = """
                 SELECT 
+                    id,
                     flight_number,
                     schedule_date,
                     schedule_time,
@@ -635,38 +1042,23 @@ def get_airline_flights(airline_code):
             elif flight_type == 'arrivals':
                 query += " AND flight_direction = 'A'"
                 
-            if destination:
-                # Match exact airport code (handles comma-separated destinations)
-                query += " AND (destinations = %s OR destinations LIKE %s OR destinations LIKE %s OR destinations LIKE %s)"
-                params.extend([
-                    destination,                    # Exact match
-                    f"{destination},%",            # Start
-                    f"%,{destination}",            # End
-                    f"%,{destination},%"           # Middle
-                ])
-            elif country:
-                # Filter by country name
-                query += """ AND destinations IN (
-                    SELECT a.iata_code FROM airports a 
-                    JOIN countries c ON a.country_id = c.id 
-                    WHERE c.name = %s
-                )"""
-                params.append(country)
-            elif continent:
-                # Filter by continent name
-                query += """ AND destinations IN (
-                    SELECT a.iata_code FROM airports a 
-                    JOIN countries c ON a.country_id = c.id 
-                    JOIN continents co ON c.continent_id = co.id
-                    WHERE co.name = %s
-                )"""
-                params.append(continent)
+            dest_filter, dest_params = build_destination_filter(destination, country, continent)
+            query += dest_filter
+            params.extend(dest_params)
+            
+            if position:
+                keyset_filter, keyset_params = build_keyset_filter(position)
+                query += keyset_filter
+                params.extend(keyset_params)
                 
-            query += " ORDER BY schedule_date DESC, schedule_time DESC LIMIT %s"
-            params.append(limit)
+            # One extra row tells whether there is a next page
+            query += " ORDER BY schedule_date DESC, schedule_time DESC, id DESC LIMIT %s"
+            params.append(limit + 1)
             
             cursor.execute(query, params)
             results = cursor.fetchall()
+            has_more = len(results) > limit
+            results = results[:limit]
             
             flights = []
             for row in results:
@@ -733,7 +1125,9 @@ def get_airline_flights(airline_code):
             return jsonify({
                 'airline': {'code': airline_code, 'name': airline_name},
                 'flights': flights,
-                'count': len(flights)
+                'count': len(flights),
+                'hasMore': has_more,
+                'nextCursor': encode_page_cursor(results[-1]) if has_more else None
             })
             
     except Exception as e:
@@ -747,11 +1141,12 @@ def get_airline_flights(airline_code):
         }), 500
 
 @app.route('/api/stats/destinations')
+@conditional_response('flights')
+@cached_response('flights')
 def get_destination_stats():
     """Get top destinations statistics"""
     try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             # Get period from query params (default: week)
             period = request.args.get('period', default='week', type=str)
             limit = request.args.get('limit', default=10, type=int)
@@ -823,11 +1218,12 @@ def get_destination_stats():
         }), 500
 
 @app.route('/api/stats/aircraft')
+@conditional_response('flights')
+@cached_response('flights')
 def get_aircraft_stats():
     """Get top aircraft types statistics"""
     try:
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             # Get period from query params (default: week)
             period = request.args.get('period', default='week', type=str)
             limit = request.args.get('limit', default=10, type=int)
@@ -843,15 +1239,14 @@ def get_aircraft_stats():
             # Query for top aircraft types with descriptions
             query = """
                 SELECT 
-                    f.aircraft_type,
+                    f.aircraft_type_norm as aircraft_type,
                     a.long_description,
                     COUNT(*) as flight_count
                 FROM flights f
-                LEFT JOIN aircraft_types a ON TRIM(f.aircraft_type) COLLATE utf8mb4_unicode_ci = a.iata_sub
+                LEFT JOIN aircraft_types a ON f.aircraft_type_norm = a.iata_sub
                 WHERE f.schedule_date BETWEEN %s AND %s
-                  AND f.aircraft_type IS NOT NULL
-                  AND f.aircraft_type != ''
-                GROUP BY f.aircraft_type, a.long_description
+                  AND f.aircraft_type_norm IS NOT NULL
+                GROUP BY f.aircraft_type_norm, a.long_description
                 ORDER BY flight_count DESC
                 LIMIT %s
             """
@@ -887,6 +1282,7 @@ def get_aircraft_stats():
         }), 500
 
 @app.route('/api/stats/aircraft/<aircraft_code>/airlines')
+@conditional_response('flights')
 def get_aircraft_airlines(aircraft_code):
     """Get airline distribution for a specific aircraft type"""
     try:
@@ -901,16 +1297,15 @@ def get_aircraft_airlines(aircraft_code):
         else: # week
             start_date = end_date - timedelta(days=7)
 
-        conn = db.get_connection()
-        with conn.cursor() as cursor:
+        with read_cursor() as cursor:
             # Query grouped by airline
-            # Match TRIM(aircraft_type) to handle whitespace inconsistencies
+            # aircraft_type_norm is the indexed, trimmed aircraft_type
             query = """
                 SELECT 
                     airline_code,
                     COUNT(*) as flight_count
                 FROM flights
-                WHERE TRIM(aircraft_type) = %s
+                WHERE aircraft_type_norm = %s
                   AND schedule_date BETWEEN %s AND %s
                   AND airline_code IS NOT NULL
                 GROUP BY airline_code
@@ -918,9 +1313,7 @@ def get_aircraft_airlines(aircraft_code):
                 LIMIT 20
             """
             
-            # Since aircraft_code comes from URL, we verify/trim it too? 
-            # The query uses TRIM(db_column) = param. So if param="EMJ", it matches "EMJ ".
-            cursor.execute(query, (aircraft_code, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+            cursor.execute(query, (aircraft_code.strip(), start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
             results = cursor.fetchall()
             
             stats = []
@@ -950,6 +1343,43 @@ def get_aircraft_airlines(aircraft_code):
             'message': 'Failed to fetch airline breakdown'
         }), 500
 
+@app.route('/api/internal/query-stats')
+@internal_only
+def get_query_stats():
+    """Statement timings of all web workers and pipeline runs (see query_stats.py)"""
+    sort = request.args.get('sort', default='total', type=str)
+    if sort not in query_stats.SORT_KEYS:
+        return jsonify({'error': f"sort must be one of {', '.join(query_stats.SORT_KEYS)}"}), 400
+    top = request.args.get('top', default=50, type=int)
+    
+    summary = query_stats.collect_summary(sort)
+    return jsonify({
+        'sort': sort,
+        'slowThresholdMs': config.QUERY_STATS_SETTINGS['slow_ms'],
+        'statements': len(summary),
+        'queries': summary[:top],
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/internal/cache-stats')
+@internal_only
+def get_cache_stats():
+    """Response cache hit/miss counters of the worker serving this request"""
+    return jsonify({
+        'pid': os.getpid(),
+        **response_cache.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/metrics')
+@internal_only
+def get_metrics():
+    """Prometheus metrics of all workers (see metrics.py)"""
+    body = metrics.render()
+    if body is None:
+        return jsonify({'error': 'Metrics are disabled or prometheus_client is not installed'}), 503
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     port = int(os.getenv('WEB_PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
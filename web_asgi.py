@@ -0,0 +1,150 @@
+"""
+ASGI Entry Point for the Web API
+Serves web_api.app from an ASGI server (uvicorn) instead of sync gunicorn workers.
+
+With sync workers every request occupies a whole worker process while it waits
+for MariaDB, so a few slow rankings queries stall the dashboard. Here the event
+loop accepts and parses connections and hands each request to a bounded pool of
+request threads; a request waiting on the database only holds one thread.
+Independent queries of a request (rankings: aggregation, trends and first
+flight date) run at the same time on the query pool of web_api.enable_concurrency().
+Every thread uses its own read connection. The /api/events stream is served on
+the event loop itself (see event_stream.py), so open dashboards hold no thread.
+
+Pool sizes come from config.ASYNC_SETTINGS.
+
+Usage:
+    uvicorn web_asgi:application --host 127.0.0.1 --port 5000 --workers 2
+    gunicorn -w 2 -k uvicorn.workers.UvicornWorker --preload web_asgi:application  (airlines-web.service)
+    python web_asgi.py
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import config
+import event_stream
+import metrics
+import web_api
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """One request, with the WSGI app run on the given thread pool"""
+
+    def __init__(self, wsgi_application, executor: ThreadPoolExecutor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        # asgiref runs WSGI apps on one shared thread by default (thread_sensitive)
+        await sync_to_async(self.serve, thread_sensitive=False, executor=self.executor)(body)
+
+    def serve(self, body):
+        """
+        Run the WSGI app in a request thread and send its response (what
+        WsgiToAsgiInstance.run_wsgi_app does, without the shared thread)
+        """
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400,
+                            'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request: Too many duplicate headers'})
+            return
+
+        bytes_sent = 0
+        output = self.wsgi_application(environ, self.start_response)
+        try:
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                # Never send more than a Content-Length header announced
+                if self.response_content_length is not None:
+                    chunk = chunk[:self.response_content_length - bytes_sent]
+                self.sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                bytes_sent += len(chunk)
+                if bytes_sent == self.response_content_length:
+                    break
+        finally:
+            # Runs the response's close callbacks (e.g. flight export connections)
+            if hasattr(output, 'close'):
+                output.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """ASGI adapter for a WSGI app that serves requests from a bounded thread pool"""
+
+    def __init__(self, wsgi_application, request_threads: int, query_threads: int):
+        """
+        Args:
+            wsgi_application: Flask app
+            request_threads: Requests handled at the same time
+            query_threads: Parallel queries within requests
+        """
+        super().__init__(wsgi_application)
+        self.request_threads = request_threads
+        self.query_threads = query_threads
+        self.executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and scope['path'] == '/api/events':
+            # Idle viewers wait on the event loop instead of holding a request thread
+            await event_stream.asgi_event_stream(web_api.event_broadcaster, scope, receive, send)
+            return
+        await PooledWsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """Start the pools when the server starts and close connections when it stops"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def startup(self):
+        """Create the request pool and enable per-thread connections in web_api"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.request_threads, thread_name_prefix='request')
+        web_api.enable_concurrency(self.query_threads)
+        metrics.set_pool_size('request', self.request_threads)
+        print(f"ASGI worker {os.getpid()} ready: {self.request_threads} request threads, "
+              f"{self.query_threads} query threads")
+
+    def shutdown(self):
+        """Finish running requests and close the database connections"""
+        self.executor.shutdown(wait=True)
+        if web_api.query_executor is not None:
+            web_api.query_executor.shutdown(wait=True)
+        web_api.db.disconnect()
+        metrics.mark_process_dead(os.getpid())
+
+
+application = PooledWsgiToAsgi(
+    web_api.app,
+    request_threads=config.ASYNC_SETTINGS['request_threads'],
+    query_threads=config.ASYNC_SETTINGS['query_threads'],
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('WEB_PORT', 5000))
+    print(f"Starting Airlines Reliability Web Server (ASGI) on port {port}")
+    uvicorn.run('web_asgi:application', host='0.0.0.0', port=port)